@@ -1,18 +1,21 @@
 import network
 import time
 from umqtt.simple import MQTTClient
+import config
 
-# WiFi Credentials (replace with your own)
-SSID = "Two Girls One Router"
-PASSWORD = "Pommesgesichter"
+cfg = config.get()
+
+# WiFi Credentials (config.json)
+SSID = cfg.wifi_ssid
+PASSWORD = cfg.wifi_password
 
 # MQTT Broker details (use your broker's IP address without any subnet mask)
-MQTT_BROKER = "192.168.178.113"  # Replace with your Home Assistant IP
-CLIENT_ID = "esp32-test"
-TOPIC_ADC   = b"home/esp32/adc"
-TOPIC_TEMP  = b"home/esp32/temp"
-TOPIC_HUM   = b"home/esp32/hum"
-TOPIC_STATUS = b"home/esp32/status"
+MQTT_BROKER = cfg.mqtt_broker
+CLIENT_ID = cfg.client_id
+TOPIC_ADC   = config.topic("adc")
+TOPIC_TEMP  = config.topic("temp")
+TOPIC_HUM   = config.topic("hum")
+TOPIC_STATUS = config.topic("status")
 
 def connect_wifi():
     wlan = network.WLAN(network.STA_IF)
@@ -38,7 +41,7 @@ def mqtt_connect(client):
 connect_wifi()
 
 # Setup MQTT client (no username/password required for anonymous connections)
-mqtt_client = MQTTClient(CLIENT_ID, MQTT_BROKER, port=1883, user="SmartCarpet", password="smartcarpet")
+mqtt_client = MQTTClient(CLIENT_ID, MQTT_BROKER, port=cfg.mqtt_port, user=cfg.mqtt_user, password=cfg.mqtt_password)
 mqtt_connect(mqtt_client)
 
 while True:
@@ -0,0 +1,332 @@
+# alloc_check.py
+# Fails if a hot-path function of the mat allocates heap memory.
+#
+# Everything the loop runs for each sample (SPI scan, loop logic, footstep
+# extraction, user identification, LED, display pages) is called
+# repeatedly and checked:
+#   MicroPython: the gc.mem_alloc() difference with the collector off,
+#                exact. Needs the mat's hardware:
+#                import alloc_check; alloc_check.run()
+#   CPython:     under sim_hal: python3 alloc_check.py
+#                CPython allocates where MicroPython does not (every int
+#                above 256, iterators), so allocations are not counted.
+#                Instead the lines of the mat's modules that a call
+#                executes are traced and checked for the constructs that
+#                allocate on MicroPython: f-strings and string formatting,
+#                concatenation, slices, new lists/tuples/dicts,
+#                comprehensions, lambdas, *args calls, float division and
+#                calls such as bytes(), bytearray(), memoryview() or
+#                str.format(). Memory still held after all calls is
+#                reported as retained.
+# Exit status 1 (or run() returning False) if any function allocates.
+import sys
+import time
+import gc
+from array import array
+
+_micropython = sys.implementation.name == "micropython"
+if not _micropython:
+    import ast
+    import os
+    import tracemalloc
+    import sim_hal
+    sim_hal.install()
+
+import machine
+import fsr_grid
+import identify
+from fsr_grid import FSRGrid
+from i2c_arbiter import I2CArbiter, PRIORITY_DISPLAY
+from mat_logic import MatLogic
+from mem_policy import MemoryPolicy
+from boot_stages import BootStages
+from motion import MotionSensor
+from governor import Governor
+from footstep import FootstepExtractor
+from sample_ring import SampleRing
+import sh1106
+from app.led import Led
+
+CALLS = 200
+
+
+class NoOutputs:
+    """MatLogic outputs that do nothing, so only the logic is measured."""
+
+    def set_led_color(self, red, green, blue):
+        pass
+
+    def beep(self, frequency, duration):
+        pass
+
+    def publish(self, topic, msg):
+        pass
+
+    def show(self, message):
+        pass
+
+    def blank(self):
+        pass
+
+
+def measure(fn, calls=CALLS):
+    """MicroPython: bytes allocated per call of fn."""
+    fn()  # Lazy allocations of the first calls do not count
+    fn()
+    gc.collect()
+    gc.disable()
+    before = gc.mem_alloc()
+    for _ in range(calls):
+        fn()
+    used = gc.mem_alloc() - before
+    gc.enable()
+    return used // calls
+
+
+# --- CPython: allocating constructs on the executed lines ---
+
+_HERE = os.path.dirname(os.path.abspath(__file__)) if not _micropython else ""
+_SKIPPED = ("sim_hal.py", "alloc_check.py")
+_ALLOCATING_CALLS = ("bytes", "bytearray", "memoryview", "str", "list", "tuple", "dict",
+                     "set", "sorted", "reversed", "enumerate", "zip", "map", "filter",
+                     "format", "repr", "array")
+_ALLOCATING_METHODS = ("format", "join", "encode", "decode", "split", "strip", "hex",
+                       "copy", "to_bytes")
+_trees = {}
+
+
+def _checked(path):
+    path = os.path.abspath(path)
+    return path.startswith(_HERE) and path.endswith(".py") \
+        and os.path.basename(path) not in _SKIPPED
+
+
+def _nodes_by_line(path):
+    """{line: [(node, parent), ...]} of the nodes starting on each line."""
+    if path not in _trees:
+        with open(path) as f:
+            tree = ast.parse(f.read(), path)
+        lines = {}
+        for parent in ast.walk(tree):
+            for node in ast.iter_child_nodes(parent):
+                if hasattr(node, "lineno"):
+                    lines.setdefault(node.lineno, []).append((node, parent))
+        _trees[path] = lines
+    return _trees[path]
+
+
+def _is_constant(node):
+    if isinstance(node, ast.Constant):
+        return True
+    return isinstance(node, ast.Tuple) and all(_is_constant(e) for e in node.elts)
+
+
+def allocation(node, parent):
+    """Why node allocates on MicroPython, or None."""
+    if isinstance(node, ast.JoinedStr):
+        return "f-string"
+    if isinstance(node, (ast.ListComp, ast.SetComp, ast.DictComp, ast.GeneratorExp)):
+        return "comprehension"
+    if isinstance(node, ast.Lambda):
+        return "lambda"
+    if isinstance(node, (ast.List, ast.Dict, ast.Set)):
+        return "new " + type(node).__name__.lower()
+    if isinstance(node, ast.Tuple) and isinstance(node.ctx, ast.Load) and not _is_constant(node):
+        # a, b = c, d and a, b, c = d, e, f are compiled to stack moves
+        if not (isinstance(parent, ast.Assign) and len(node.elts) <= 3
+                and isinstance(parent.targets[0], ast.Tuple)
+                and len(parent.targets[0].elts) == len(node.elts)):
+            return "new tuple"
+    if isinstance(node, ast.Subscript) and isinstance(node.slice, ast.Slice) \
+            and isinstance(node.ctx, ast.Load):
+        return "slice"
+    if isinstance(node, ast.BinOp):
+        if isinstance(node.op, ast.Div):
+            return "float division"
+        for side in (node.left, node.right):
+            if isinstance(side, ast.Constant) and isinstance(side.value, (str, bytes)):
+                return "string concatenation or formatting"
+    if isinstance(node, ast.Call):
+        if any(isinstance(a, ast.Starred) for a in node.args) or \
+                any(k.arg is None for k in node.keywords):
+            return "*args/**kwargs call"
+        func = node.func
+        if isinstance(func, ast.Name) and func.id in _ALLOCATING_CALLS:
+            return func.id + "()"
+        if isinstance(func, ast.Name) and func.id == "range" and not isinstance(parent, ast.For):
+            return "range() outside a for loop"
+        if isinstance(func, ast.Attribute) and func.attr in _ALLOCATING_METHODS:
+            return "." + func.attr + "()"
+    return None
+
+
+def executed_lines(fn):
+    """(path, line) of the mat's code executed by fn()."""
+    lines = set()
+
+    def tracer(frame, event, arg):
+        if not _checked(frame.f_code.co_filename):
+            return None
+        if event == "line":
+            lines.add((frame.f_code.co_filename, frame.f_lineno))
+        return tracer
+
+    sys.settrace(tracer)
+    try:
+        fn()
+    finally:
+        sys.settrace(None)
+    return lines
+
+
+def inspect(fn, calls=CALLS):
+    """CPython: (findings, bytes retained after calls) for fn."""
+    fn()
+    fn()
+    findings = []
+    for path, line in sorted(executed_lines(fn)):
+        for node, parent in _nodes_by_line(path).get(line, ()):
+            reason = allocation(node, parent)
+            if reason:
+                findings.append("{}:{}: {}".format(os.path.basename(path), line, reason))
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    for _ in range(calls):
+        fn()
+    retained = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return findings, retained
+
+
+def hot_paths():
+    """(name, function) of everything the loop runs per sample."""
+    spi = machine.SPI(1)
+    grid = FSRGrid(spi, [machine.Pin(4, machine.Pin.OUT)], fsr_grid.LAYOUT_2X2, fsr_grid.COLORS_2X2)
+    i2c = machine.I2C(0)
+    if not _micropython:
+        i2c.add_device(0x3C)
+    bus = I2CArbiter(i2c)
+    oled = sh1106.SH1106_I2C(128, 64, bus.device("sh1106", PRIORITY_DISPLAY), addr=0x3C)
+    led = Led(8)
+    logic = MatLogic(NoOutputs(), time.ticks_ms())
+    stages = BootStages()
+    stages.sampled()
+    memory = MemoryPolicy()
+    sensor = MotionSensor(machine.Pin(22, machine.Pin.IN))
+    governor = Governor(time.ticks_ms())
+    n = identify.N_FEATURES
+    # Far from the training data and a narrow feature: quantise must clamp, not multiply
+    model = identify.Model(("a", "b"), [0] * n, [1 << 20] * n, list(range(2 * n)))
+    step_features = [100000] * n
+    extractor = FootstepExtractor(SampleRing(capacity=4, channels=4), 2, 2)
+    lopsided = array("H", (1023, 1023, 1023, 300))
+    color = [0, 0, 0]
+    clock = [time.ticks_ms()]
+
+    def pressed(level):
+        # MCP3008 answers; only available with sim_hal's SPI
+        if not _micropython:
+            for k in range(4):
+                spi.adc[k] = level
+
+    def scan():
+        grid.scan()
+
+    def mix():
+        fsr_grid.mix_colors(grid.values, grid.colors, 900, color)
+
+    def sample_idle():
+        clock[0] = time.ticks_add(clock[0], 20)
+        logic.sample(clock[0], grid.values)
+
+    def sample_step():
+        # A long step in progress: the footstep features update every sample
+        pressed(1000)
+        grid.scan()
+        sample_idle()
+
+    def long_step():
+        # Heavy, uneven load for minutes: the step's running sums must stay small ints
+        clock[0] = time.ticks_add(clock[0], 20)
+        extractor.update(clock[0], lopsided)
+
+    def motion():
+        logic.motion(clock[0], 0)
+
+    def classify():
+        model.classify(step_features)
+
+    def tick():
+        logic.tick(clock[0])
+
+    def governed():
+        # The tier decision made for every sample
+        governor.sample(clock[0], grid.values)
+        governor.update(clock[0])
+
+    colors = ((255, 0, 0), (0, 255, 0))
+    flip = [0]
+
+    def led_color():
+        flip[0] ^= 1
+        c = colors[flip[0]]
+        led.set_color(c[0], c[1], c[2])
+
+    def display_page():
+        oled.start_show(True)
+        bus.submit(oled.show_step, PRIORITY_DISPLAY)
+        bus.service()
+
+    def first_sample():
+        stages.sampled()
+
+    def memory_idle():
+        memory.idle(time.ticks_ms(), 0)
+
+    def motion_edge():
+        # An edge as the interrupt handler queues it, and the loop draining the queue
+        sensor._push(time.ticks_ms(), sensor.level ^ 1)
+        while sensor.pending():
+            sensor.pop()
+
+    pressed(100)
+    return (
+        ("FSRGrid.scan", scan),
+        ("fsr_grid.mix_colors", mix),
+        ("MatLogic.sample (idle)", sample_idle),
+        ("MatLogic.sample (step)", sample_step),
+        ("FootstepExtractor (long)", long_step),
+        ("MatLogic.motion", motion),
+        ("MatLogic.tick", tick),
+        ("Model.classify", classify),
+        ("Led.set_color", led_color),
+        ("SH1106 page refresh", display_page),
+        ("BootStages.sampled", first_sample),
+        ("MemoryPolicy.idle", memory_idle),
+        ("MotionSensor edge", motion_edge),
+        ("Governor.sample/update", governed),
+    )
+
+
+def run(calls=CALLS):
+    """Prints the allocations of every hot path. Returns True if none allocates."""
+    ok = True
+    for name, fn in hot_paths():
+        if _micropython:
+            used = measure(fn, calls)
+            print("{:<26} {:>6} bytes/call  {}".format(name, used, "ok" if not used else "ALLOCATES"))
+            ok = ok and not used
+            continue
+        findings, retained = inspect(fn, calls)
+        # A few ints kept in attributes are CPython's; a leak grows with the calls
+        leaks = retained > 4 * calls
+        print("{:<26} {:>6} bytes retained  {}".format(
+            name, retained, "ALLOCATES" if findings or leaks else "ok"))
+        for finding in findings:
+            print("    " + finding)
+        ok = ok and not findings and not leaks
+    return ok
+
+
+if __name__ == "__main__":
+    sys.exit(0 if run() else 1)
@@ -0,0 +1,19 @@
+# app
+# The mat's application: one loop for every hardware variant.
+#
+# Which parts run is decided once at start-up from the configuration
+# (config.json, enable_* keys). A disabled feature's module is never
+# imported and its hardware is never set up, and mat_logic does no work
+# for it in the loop. main.py only calls app.run().
+#
+#   app.board    FSR grid (SPI), PIR and the shared I2C bus
+#   app.buzzer   tones per pressed zone       (enable_buzzer)
+#   app.led      RGB LED colour of the zones  (enable_led)
+#   app.display  SH1106 pages                 (enable_display)
+#   app.link     WiFi, MQTT, event log        (enable_mqtt)
+#   app.mat      start-up and the main loop
+
+
+def run():
+    from app.mat import Mat
+    Mat().run()
@@ -0,0 +1,39 @@
+# app/board.py
+# Hardware every variant of the mat has: FSR grid, PIR and the I2C bus.
+import machine
+import fsr_grid
+from fsr_grid import FSRGrid
+from i2c_arbiter import I2CArbiter
+from motion import MotionSensor
+
+
+def grid(cfg):
+    """The FSR grid on the MCP3008 (SPI)."""
+    spi = machine.SPI(
+        1,  # Using HSPI
+        baudrate=cfg.spi_baudrate,
+        polarity=0,
+        phase=0,
+        sck=machine.Pin(cfg.pin_sck),  # SPI clock
+        mosi=machine.Pin(cfg.pin_mosi),  # Master-Out Slave-In
+        miso=machine.Pin(cfg.pin_miso)   # Master-In Slave-Out
+    )
+    # One MCP3008 reading the 2x2 doormat. More MCP3008s get their own CS
+    # pin; larger mats only need another layout table.
+    return FSRGrid(spi, [machine.Pin(cfg.pin_adc_cs, machine.Pin.OUT)],
+                   fsr_grid.LAYOUT_2X2, fsr_grid.COLORS_2X2)
+
+
+def motion_sensor(cfg, on_edge=None):
+    """The PIR on its pin interrupt (motion.py)."""
+    # Using a pull-up resistor; value() == 1 means motion
+    return MotionSensor(machine.Pin(cfg.pin_pir, machine.Pin.IN, machine.Pin.PULL_UP), on_edge)
+
+
+def i2c_bus(cfg):
+    """
+    BME280 and display share the bus; the arbiter serves sensor reads first
+    and sends display refreshes one page at a time.
+    """
+    i2c = machine.I2C(0, sda=machine.Pin(cfg.pin_sda), scl=machine.Pin(cfg.pin_scl), freq=cfg.i2c_freq)
+    return I2CArbiter(i2c)
@@ -0,0 +1,31 @@
+# app/buzzer.py
+# Active speaker on a PWM pin.
+import time
+import machine
+
+
+class Buzzer:
+    """
+    beep() starts the tone and returns at once; poll(), called by the loop,
+    ends it when its time is up. A new beep replaces one still sounding.
+    """
+
+    def __init__(self, pin):
+        self.pwm = machine.PWM(machine.Pin(pin, machine.Pin.OUT))
+        self.pwm.duty(0)
+        self.sounding = False
+        self._off_at = 0
+
+    def beep(self, frequency=2000, duration=100):
+        """
+        Plays a beep sound at the given frequency for duration ms.
+        """
+        self.pwm.freq(frequency)
+        self.pwm.duty(512)  # 50% duty cycle
+        self._off_at = time.ticks_add(time.ticks_ms(), duration)
+        self.sounding = True
+
+    def poll(self, now):
+        if self.sounding and time.ticks_diff(now, self._off_at) >= 0:
+            self.pwm.duty(0)    # Turn off the buzzer
+            self.sounding = False
@@ -0,0 +1,121 @@
+# app/display.py
+# Text pages on the SH1106 OLED.
+import time
+import sh1106
+from i2c_arbiter import PRIORITY_DISPLAY
+
+WIDTH = 128
+HEIGHT = 64
+MAX_CHARS = WIDTH // 8  # 16 characters per line with the 8x8 font
+MAX_LINES = 4
+SCROLL_LENGTH = 64      # Longer messages scroll
+SCROLL_MS_PER_PX = 10   # Scroll speed: 100 px/s
+
+
+def wrap(message, max_chars=MAX_CHARS):
+    """Splits message into lines of at most max_chars, keeping words intact."""
+    lines = []
+    current_line = ""
+    for word in message.split():
+        if len(current_line) + len(word) + 1 <= max_chars:
+            current_line += " " + word if current_line else word
+        else:
+            lines.append(current_line)
+            current_line = word
+    if current_line:
+        lines.append(current_line)  # Add last line
+    return lines
+
+
+class Display:
+    """
+    show() and blank() are the display outputs of mat_logic. Until the
+    "display" boot stage has run start(), they do nothing. Long messages
+    scroll by poll(), once per loop, so scrolling never blocks the loop.
+    """
+
+    def __init__(self, bus, addr=0x3C):
+        self.bus = bus
+        self.addr = addr
+        self.oled = None
+        self.frame = None
+        self.scrolling = None  # Text being scrolled by poll()
+        self.scroll_width = 0
+        self.scroll_started = 0
+        self.scroll_offset = 0
+
+    def reserve(self, memory):
+        """Boot: the frame buffer is allocated before the loop starts."""
+        self.frame = memory.reserve("display", WIDTH * HEIGHT // 8)
+
+    def start(self):
+        """Boot stage: the driver clears the frame and switches the display on."""
+        self.oled = sh1106.SH1106_I2C(WIDTH, HEIGHT, self.bus.device("sh1106", PRIORITY_DISPLAY),
+                                      addr=self.addr, buf=self.frame)
+        return True
+
+    def refresh(self):
+        """Queues the changed display pages; bus.service() sends them."""
+        self.oled.start_show()
+        self.bus.submit(self.oled.show_step, PRIORITY_DISPLAY)
+
+    def show(self, message):
+        if self.oled is None:
+            return
+        self.scrolling = None
+        if len(message) > SCROLL_LENGTH:  # If too long, scroll it
+            self.scroll_text(message)
+        else:  # Otherwise, just display normally
+            self.update(message)
+
+    def blank(self):
+        if self.oled is None:
+            return
+        self.scrolling = None
+        self.oled.fill(0)
+        self.refresh()
+
+    def update(self, message, lines=None):
+        oled = self.oled
+        oled.fill(0)  # Clear display
+        # Ensure only 4 lines are displayed
+        for i, line in enumerate((lines or wrap(message))[:MAX_LINES]):
+            x = (WIDTH - len(line) * 8) // 2  # Centering formula
+            oled.text(line, x, i * 10)  # Draw centered text, 10 px per line
+        self.refresh()
+
+    def scroll_text(self, message):
+        """Starts scrolling long text horizontally, centered vertically; poll() moves it."""
+        lines = wrap(message)
+        # If the message fits on screen, display it normally
+        if len(lines) <= MAX_LINES:
+            self.update(message, lines)
+            return
+        self.scrolling = "  ".join(lines)  # Combine lines with space for smooth scrolling
+        self.scroll_width = len(self.scrolling) * 8  # Total width in pixels
+        self.scroll_started = time.ticks_ms()
+        self.scroll_offset = None
+        self.oled.fill(0)
+
+    def poll(self, now):
+        """Loop: moves scrolling text by the time since scroll_text(), from right to left."""
+        text = self.scrolling
+        if text is None:
+            return
+        offset = time.ticks_diff(now, self.scroll_started) // SCROLL_MS_PER_PX - WIDTH
+        if offset >= self.scroll_width:
+            self.scrolling = None  # Scrolled out
+            offset = self.scroll_width
+        if offset == self.scroll_offset:
+            return
+        self.scroll_offset = offset
+        oled = self.oled
+        y_position = (HEIGHT - 8) // 2  # Center vertically
+        # Only the text line is redrawn; only its pages go out
+        oled.fill_rect(0, y_position, WIDTH, 8, 0)
+        if offset < 0:
+            oled.text(text[:MAX_CHARS], -offset, y_position)
+        else:
+            first = offset // 8
+            oled.text(text[first:first + MAX_CHARS + 1], -(offset % 8), y_position)
+        self.refresh()
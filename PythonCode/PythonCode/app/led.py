@@ -0,0 +1,25 @@
+# app/led.py
+# The RGB LED (one NeoPixel) showing the pressed zones.
+import machine
+from neopixel import NeoPixel
+
+
+class Led:
+
+    def __init__(self, pin):
+        self.pixel = NeoPixel(machine.Pin(pin, machine.Pin.OUT), 1)
+        self.order = self.pixel.ORDER
+        self.color = -1  # 0xRRGGBB last written
+
+    def set_color(self, red, green, blue):
+        """Writes only changed colours, straight into the pixel buffer (no tuple)."""
+        color = (red << 16) | (green << 8) | blue
+        if color == self.color:
+            return
+        self.color = color
+        buf = self.pixel.buf
+        order = self.order
+        buf[order[0]] = red
+        buf[order[1]] = green
+        buf[order[2]] = blue
+        self.pixel.write()
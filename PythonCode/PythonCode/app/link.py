@@ -0,0 +1,155 @@
+# app/link.py
+# The mat's network side: WiFi, MQTT, the offline event log and raw traces.
+import time
+import config
+import event_log  # Events kept on flash while MQTT is down
+import ha_discovery  # Home Assistant MQTT discovery
+import mqtt_connection
+from mat_logic import (TOPIC_STATE, TOPIC_EVENT, TOPIC_USER, TOPIC_MOTION, TOPIC_PATTERN,
+                       TOPIC_ROUTINE)
+from trace_stream import TraceStreamer
+
+# Topics are <topic_prefix>/<name> (config.json, default home/esp32).
+# TOPIC_STATE, TOPIC_EVENT, TOPIC_USER, TOPIC_MOTION, TOPIC_PATTERN and TOPIC_ROUTINE are
+# defined in mat_logic
+TOPIC_STATUS = config.topic("status")     # Retained birth ("online") / last will ("offline")
+TOPIC_TRACE  = config.topic("trace")      # Raw pressure trace chunks (opt-in)
+TOPIC_TRACE_CTL = config.topic("trace/ctl")  # Send b"on" / b"off" to toggle streaming
+TOPIC_RECORD = config.topic("record")     # Input recording chunks (recording "mqtt")
+TOPIC_LOG    = config.topic("log")        # Bulk upload of events logged while offline
+TOPIC_CONFIG = config.topic("config")     # Retained JSON object of config changes
+TOPIC_CONFIG_STATUS = config.topic("config/status")  # Result of the last config change
+TOPIC_BOOT   = config.topic("boot")       # Boot timings (first sample, stages) in ms since reset
+TOPIC_TIERS  = config.topic("tiers")      # Time spent per sampling tier (governor.py), once a minute
+
+# Events that could not be published are logged on flash and uploaded after reconnecting
+LOGGED_TOPICS = {
+    TOPIC_EVENT: event_log.KIND_FOOTSTEP,
+    TOPIC_USER: event_log.KIND_USER,
+    TOPIC_MOTION: event_log.KIND_MOTION,
+    TOPIC_PATTERN: event_log.KIND_PIN,
+    TOPIC_ROUTINE: event_log.KIND_ROUTINE,
+}
+RECONNECT_PERIOD = 30000  # ms between MQTT reconnect attempts
+WIFI_TIMEOUT = 20000  # ms the boot waits for WiFi before leaving it to the reconnects
+UPLOAD_RECORDS = 16   # Event log records per upload message
+
+
+class Link:
+    """
+    publish() is the MQTT output of mat_logic. The boot stages (start_*,
+    wait_wifi) open the event log and connect; poll() runs once per loop.
+    """
+
+    def __init__(self, cfg):
+        self.cfg = cfg
+        self.client = None
+        self.events = None
+        self.wlan = None
+        self.trace_streamer = None
+        self.started = False  # The boot has tried to connect once
+        self._wifi_started = 0
+        self._last_reconnect = 0
+        self._upload_buf = None
+        self._send_log = lambda msg: self.send(TOPIC_LOG, msg)  # Made once, not per upload
+        # cfg.payload_format: "binary" sends the compact payload format, "json" the Home Assistant
+        # friendly fallback. The Home Assistant entities announced via discovery read the JSON state.
+        self.ha_discovery = cfg.payload_format == "json"
+        mqtt_connection.register_handler(TOPIC_CONFIG, self.handle_config)
+
+    def reserve(self, memory):
+        """Boot: the event log's upload buffer is allocated before the loop starts."""
+        self._upload_buf = memory.reserve("event log", event_log.upload_buffer_size(UPLOAD_RECORDS))
+
+    def start_event_log(self):
+        self.events = event_log.EventLog("events", upload_buf=self._upload_buf)
+        print("Event log:", self.events.pending(), "events to upload")
+        return True
+
+    def start_trace(self, ring):
+        """Raw pressure samples of ring, streamed on request."""
+        self.trace_streamer = TraceStreamer(ring, lambda msg: self.send(TOPIC_TRACE, msg))
+        if self.cfg.trace_streaming:
+            self.trace_streamer.start()
+        mqtt_connection.register_handler(TOPIC_TRACE_CTL, self.trace_streamer.handle_command)
+
+    def start_wifi(self):
+        self.wlan = mqtt_connection.start_wifi()
+        self._wifi_started = time.ticks_ms()
+        return True
+
+    def wait_wifi(self):
+        if mqtt_connection.wifi_connected(self.wlan):
+            return True
+        if time.ticks_diff(time.ticks_ms(), self._wifi_started) >= WIFI_TIMEOUT:
+            print("No WiFi yet, MQTT retries every", RECONNECT_PERIOD // 1000, "s")
+            return True
+        return False
+
+    def start_mqtt(self):
+        self.connect()
+        self.started = True
+        return True
+
+    def connect(self):
+        """Connects to the broker, announces the mat and subscribes."""
+        self._last_reconnect = time.ticks_ms()
+        self.client = mqtt_connection.mqtt_connect(will=ha_discovery.last_will(TOPIC_STATUS))
+        if self.client:
+            # Entities are announced once; the retained birth message replaces the status heartbeat
+            if self.ha_discovery:
+                ha_discovery.announce(self.client, self.cfg.device_id, TOPIC_STATE, TOPIC_STATUS)
+            else:
+                mqtt_connection.publish_data(self.client, TOPIC_STATUS, ha_discovery.PAYLOAD_ONLINE, retain=True)
+            mqtt_connection.mqtt_subscribe(self.client)
+
+    def drop(self):
+        """
+        Closes a broken connection so its socket is freed; poll() reconnects.
+        No DISCONNECT is sent, so the broker still publishes the last will.
+        """
+        client = self.client
+        self.client = None
+        if client and client.sock:
+            try:
+                client.sock.close()
+            except OSError:
+                pass
+
+    def send(self, topic, msg):
+        """Publishes msg if connected. Returns True on success."""
+        return mqtt_connection.publish_data(self.client, topic, msg)
+
+    def publish(self, topic, msg):
+        """Publishes msg, logging events on flash while MQTT is down."""
+        if self.client and mqtt_connection.publish_data(self.client, topic, msg):
+            return
+        self.drop()  # Reconnect later
+        kind = LOGGED_TOPICS.get(topic)
+        if kind and self.events:
+            self.events.append(kind, time.ticks_ms(), msg)
+
+    def handle_config(self, msg):
+        self.send(TOPIC_CONFIG_STATUS, config.handle_message(msg).encode())
+
+    def poll(self, now):
+        """Receives messages, reconnects, uploads the event log and streams traces."""
+        if self.client:
+            try:
+                self.client.check_msg()  # This checks for new messages
+            except OSError as e:
+                print("MQTT connection lost:", e)
+                self.drop()
+        elif self.started and time.ticks_diff(now, self._last_reconnect) >= RECONNECT_PERIOD:
+            self.connect()
+        events = self.events
+        if self.client:
+            # Drain the event log one bulk message per loop
+            backlog = events is not None and events.pending() > 0
+            if backlog:
+                events.upload(self._send_log)
+            # Raw traces wait while the event log is uploaded so they never delay it
+            if self.trace_streamer:
+                self.trace_streamer.poll(time.ticks_ms(), busy=backlog)
+        if events:
+            events.poll(now)
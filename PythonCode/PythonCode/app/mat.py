@@ -0,0 +1,289 @@
+# app/mat.py
+# Start-up and main loop of the mat.
+#
+# Only what the first pressure scan needs is set up in Mat(): the FSR grid,
+# the PIR, the enabled outputs and the loop logic. The BME280, the display,
+# the event log, the identification model and WiFi/MQTT are boot stages
+# that the loop runs between samples (boot_stages.py). Their buffers are
+# reserved at boot and garbage is collected while the loop sleeps
+# (mem_policy.py).
+#
+# The loop period, display pages and BME280 reads follow the governor's
+# tier (governor.py): idle, armed after motion, active while there is load
+# on the mat. While idle the board light-sleeps between samples and the PIR
+# interrupt wakes it (motion.py).
+import os
+import time
+import bme280
+import config  # Pins, thresholds, features, topics and credentials (config.json)
+import identify  # Footstep based user identification
+import pattern_lock  # Step patterns as a PIN
+from boot_stages import BootStages
+from env_sampler import EnvSampler
+from governor import Governor, TIERS, TIER_IDLE
+from i2c_arbiter import PRIORITY_SENSOR
+from mat_logic import MatLogic  # Loop logic without hardware access (replayable)
+from mem_policy import MemoryPolicy
+from app import board
+
+BOOT_BUDGET_MS = 200  # Time per loop for boot stages
+DISPLAY_BUDGET_US = 30000  # Bus time per loop for queued display pages
+TIER_REPORT_PERIOD = 60000  # ms between reports of the time spent per tier
+PATTERN_FILE = "patterns.bin"
+RECORD_FILE = "record.bin"
+RECORD_OLD = "record.{}.bin"   # Recordings of earlier boots, record.1.bin the latest
+RECORD_KEEP = 2                # Recordings kept on flash, including the current one
+RECORD_MAX_BYTES = 512 * 1024  # Flash space for one recording
+
+
+def _rotate_recordings():
+    """Keeps the recordings of the last boots: record.bin -> record.1.bin -> ..."""
+    for n in range(RECORD_KEEP - 1, 0, -1):
+        older = RECORD_OLD.format(n)
+        newer = RECORD_OLD.format(n - 1) if n > 1 else RECORD_FILE
+        try:
+            os.remove(older)
+        except OSError:
+            pass
+        try:
+            os.rename(newer, older)
+        except OSError:
+            pass
+
+
+class Outputs:
+    """
+    The `out` of MatLogic. Only enabled features get their method
+    (set_led_color, beep, publish, show, blank).
+    """
+
+
+class Mat:
+
+    def __init__(self, cfg=None):
+        self.cfg = cfg = cfg or config.get()
+        self.memory = MemoryPolicy()
+        self.stages = BootStages()
+        self.governor = Governor(time.ticks_ms(), cfg.threshold, cfg.active_timeout,
+                                 on_change=self.tier_changed)
+        self.grid = board.grid(cfg)
+        # The PIR interrupt wakes the governor from a wait
+        self.motion_sensor = board.motion_sensor(cfg, self.governor.wake)
+        self.bus = board.i2c_bus(cfg)
+        self.env = None  # Set up by the "bme280" boot stage (calibration read)
+
+        out = Outputs()
+        self.buzzer = None
+        if cfg.enable_led:
+            from app.led import Led
+            out.set_led_color = Led(cfg.pin_led).set_color
+        if cfg.enable_buzzer:
+            from app.buzzer import Buzzer
+            self.buzzer = Buzzer(cfg.pin_buzzer)
+            out.beep = self.buzzer.beep
+        self.display = None
+        if cfg.enable_display:
+            from app.display import Display
+            self.display = Display(self.bus)
+            out.show = self.display.show
+            out.blank = self.display.blank
+        self.link = None
+        if cfg.enable_mqtt:
+            from app.link import Link
+            self.link = Link(cfg)
+            out.publish = self.link.publish
+            from mat_logic import TOPIC_PATTERN_ENROLL
+            import mqtt_connection
+            mqtt_connection.register_handler(TOPIC_PATTERN_ENROLL, self.pattern_command)
+        # Buffers of the subsystems that start later, while the heap is unfragmented
+        if self.display:
+            self.display.reserve(self.memory)
+        if self.link:
+            self.link.reserve(self.memory)
+
+        grid = self.grid
+        self.logic = MatLogic(out, time.ticks_ms(), grid.rows, grid.cols, grid.colors)
+        self.logic.apply_config(cfg)
+        self.apply_tier()
+        config.on_change(self.config_changed)
+        self._last_tier_report = time.ticks_ms()
+
+        self.rec = self._start_recorder()
+        if self.link:
+            self.link.start_trace(self.logic.ring)
+
+        # Run between samples, in this order
+        stages = self.stages
+        stages.add("bme280", self.start_environment)
+        if self.display:
+            stages.add("display", self.display.start)
+        if self.link:
+            stages.add("event log", self.link.start_event_log)
+        stages.add("model", self.load_user_model)
+        stages.add("patterns", self.load_patterns)
+        if self.link:
+            stages.add("wifi", self.link.start_wifi)
+            stages.add("wifi wait", self.link.wait_wifi)
+            stages.add("mqtt", self.link.start_mqtt)
+        stages.add("memory", self.arm_memory)
+        stages.add("report", self.report_boot)
+
+    def _start_recorder(self):
+        """Input recording for replay.py (config "recording": off, file or mqtt)."""
+        recording = self.cfg.recording
+        if recording == "off" or (recording == "mqtt" and not self.link):
+            return None
+        import recorder
+        if recording == "file":
+            _rotate_recordings()
+            f = open(RECORD_FILE, "wb")
+
+            def write(chunk):
+                f.write(chunk)
+                f.flush()  # A reset loses at most the chunk being recorded
+
+            rec = recorder.Recorder(write, self.grid.zones, max_bytes=RECORD_MAX_BYTES)
+        else:
+            from app.link import TOPIC_RECORD
+            rec = recorder.Recorder(lambda chunk: self.link.send(TOPIC_RECORD, chunk), self.grid.zones)
+        rec.tier(time.ticks_ms(), self.governor.tier)  # Replay follows the display period
+        import mqtt_connection
+        mqtt_connection.inbound_hook = lambda topic, msg: rec.mqtt(time.ticks_ms(), topic, msg)
+        return rec
+
+    def start_environment(self):
+        bme = bme280.BME280(i2c=self.bus.device("bme280", PRIORITY_SENSOR))
+        # Let the sensor convert continuously so reads never wait for a conversion
+        bme.set_normal_mode(standby=bme280.BME280_STANDBY_1000, iir_filter=bme280.BME280_FILTER_4)
+        # The chip's IIR filter smooths the readings, so no extra averaging (window=1)
+        self.env = EnvSampler(bme, period_ms=self.cfg.env_period, window=1)
+        self.logic.formatter = bme.formatted
+        self.apply_tier()
+        return True
+
+    def load_user_model(self):
+        # User identification model trained on the Pi (identify_train.py); optional
+        try:
+            self.logic.user_model = identify.load("users.idm")
+            print("Identification model:", self.logic.user_model.users, "users")
+        except (OSError, ValueError) as e:
+            print("No identification model:", e)
+        return True
+
+    def load_patterns(self):
+        lock = pattern_lock.PatternLock(time.ticks_ms(), self.grid.rows, self.grid.cols,
+                                        self.cfg.pattern_length, PATTERN_FILE)
+        print("Step patterns:", bin(lock.used).count("1"), "enrolled")
+        self.logic.lock = lock
+        return True
+
+    def pattern_command(self, msg):
+        self.logic.pattern_command(time.ticks_ms(), msg)
+
+    def arm_memory(self):
+        self.memory.arm()
+        return True
+
+    def report_boot(self):
+        """Prints the boot timings and sends them on TOPIC_BOOT."""
+        report = self.stages.report()
+        print("Boot:", report)
+        if self.link:
+            from app.link import TOPIC_BOOT
+            self.link.send(TOPIC_BOOT, report)
+        return True
+
+    def config_changed(self, cfg, changed):
+        """Hot reload: hands the new runtime settings to the loop."""
+        self.cfg = cfg
+        self.logic.apply_config(cfg, changed)
+        self.governor.threshold = cfg.threshold
+        self.governor.hold_ms = cfg.active_timeout
+        self.apply_tier()
+
+    def tier_changed(self, tier):
+        self.apply_tier()
+        if self.rec:
+            self.rec.tier(time.ticks_ms(), tier)
+
+    def apply_tier(self):
+        """Display page and BME280 periods of the governor's tier."""
+        _, display_period, env_period = TIERS[self.governor.tier]
+        self.logic.display_period = display_period or self.cfg.display_period
+        if self.env:
+            self.env.period_ms = env_period or self.cfg.env_period
+
+    def step(self):
+        """One loop iteration."""
+        current_time = time.ticks_ms()
+        logic = self.logic
+        governor = self.governor
+        rec = self.rec
+        env = self.env
+        # Motion edges since the last loop, timestamped by the PIR interrupt (1 means motion)
+        sensor = self.motion_sensor
+        while sensor.pending():
+            level = sensor.pop()
+            if rec:
+                rec.pir(sensor.popped_at, level)
+            governor.motion(sensor.popped_at, level)
+            logic.motion(sensor.popped_at, level)
+
+        # Sample the BME280 every env_period only; everything else uses the cached snapshot
+        if env and env.poll(current_time):
+            if rec:
+                rec.env(current_time, env.data)
+            logic.environment(current_time, env.data)
+
+        # Read all pressure sensors of the grid (one batched SPI scan)
+        adc_values = self.grid.scan()
+        self.stages.sampled()
+        if rec:
+            rec.adc(current_time, adc_values)
+        governor.sample(current_time, adc_values, logic.routines.object_total)
+        logic.sample(current_time, adc_values)
+        # Beeps do not block the loop; the buzzer is switched off here
+        if self.buzzer:
+            self.buzzer.poll(time.ticks_ms())
+
+        if self.link:
+            self.link.poll(current_time)
+            if time.ticks_diff(current_time, self._last_tier_report) >= TIER_REPORT_PERIOD:
+                from app.link import TOPIC_TIERS
+                self.link.send(TOPIC_TIERS, governor.report(current_time))
+                self._last_tier_report = current_time
+
+        # Display pages every few seconds while there was recent motion
+        logic.tick(current_time)
+        if rec:
+            rec.tick(current_time)
+
+        # Display pages go out after this loop's sensor traffic
+        if self.display:
+            self.display.poll(current_time)  # Moves scrolling text
+            self.bus.service(DISPLAY_BUDGET_US)
+
+        # Bring up the next subsystems while the mat is already sampling
+        if not self.stages.done():
+            self.stages.run(BOOT_BUDGET_MS)
+
+        # Slower or faster sampling from the next loop on
+        governor.update(time.ticks_ms())
+
+    def run(self):
+        governor = self.governor
+        while True:
+            started = time.ticks_ms()
+            self.step()
+            now = time.ticks_ms()
+            period = governor.period()
+            # Garbage is collected here, in the time the loop would sleep anyway
+            self.memory.idle(now, period - time.ticks_diff(now, started))
+            slack = period - time.ticks_diff(time.ticks_ms(), started)
+            if slack <= 0:
+                continue
+            # No light sleep while WiFi is still coming up
+            if governor.tier == TIER_IDLE and self.cfg.light_sleep and self.stages.done():
+                self.motion_sensor.sleep(slack)  # Ends early on motion
+            else:
+                governor.wait(slack)  # Ends early on motion too
@@ -3,18 +3,21 @@ import time
 import ubinascii
 import ujson
 from umqtt.simple import MQTTClient
+import config
 
-# Wi-Fi configuration
-SSID = "Two Girls One Router"
-PASSWORD = "Pommesgesichter"
+cfg = config.get()
 
+# Wi-Fi configuration (config.json)
+SSID = cfg.wifi_ssid
+PASSWORD = cfg.wifi_password
 
-MQTT_USER = "SmartCarpet"      # If needed
-MQTT_PASS = "smartcarpet"
+
+MQTT_USER = cfg.mqtt_user
+MQTT_PASS = cfg.mqtt_password
 
 # MQTT configuration
-MQTT_BROKER = "192.168.178.113"   # Replace with your broker's IP address or hostname
-MQTT_PORT = 1883  # Default MQTT port
+MQTT_BROKER = cfg.mqtt_broker
+MQTT_PORT = cfg.mqtt_port
 MQTT_TOPIC = b"home/esp/weather"  # The topic to subscribe to
 
 
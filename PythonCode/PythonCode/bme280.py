@@ -33,7 +33,10 @@
 # THE SOFTWARE.
 
 import time
-from ustruct import unpack, unpack_from
+try:
+    from ustruct import unpack_from
+except ImportError:
+    from struct import unpack_from
 from array import array
 
 # BME280 default address.
@@ -48,6 +51,122 @@ BME280_OSAMPLE_16 = 5
 
 BME280_REGISTER_CONTROL_HUM = 0xF2
 BME280_REGISTER_CONTROL = 0xF4
+BME280_REGISTER_CONFIG = 0xF5
+
+# Power modes
+BME280_SLEEP = 0
+BME280_FORCED = 1
+BME280_NORMAL = 3
+
+# Standby time between measurements in normal mode
+BME280_STANDBY_0_5 = 0     # 0.5 ms
+BME280_STANDBY_62_5 = 1    # 62.5 ms
+BME280_STANDBY_125 = 2     # 125 ms
+BME280_STANDBY_250 = 3     # 250 ms
+BME280_STANDBY_500 = 4     # 500 ms
+BME280_STANDBY_1000 = 5    # 1000 ms
+BME280_STANDBY_10 = 6      # 10 ms
+BME280_STANDBY_20 = 7      # 20 ms
+
+# IIR filter coefficients
+BME280_FILTER_OFF = 0
+BME280_FILTER_2 = 1
+BME280_FILTER_4 = 2
+BME280_FILTER_8 = 3
+BME280_FILTER_16 = 4
+
+
+def parse_calibration(dig_88_a1, dig_e1_e7):
+    """ Parses the calibration registers.
+
+        Args:
+            dig_88_a1: 26 bytes read from register 0x88
+            dig_e1_e7: 7 bytes read from register 0xE1
+        Returns:
+            tuple (T1, T2, T3, P1, ..., P9, H1, ..., H6)
+    """
+    dig = unpack_from("<HhhHhhhhhhhhBB", dig_88_a1, 0)
+
+    dig_H2, dig_H3 = unpack_from("<hB", dig_e1_e7, 0)
+    e4_sign = unpack_from("<b", dig_e1_e7, 3)[0]
+    dig_H4 = (e4_sign << 4) | (dig_e1_e7[4] & 0xF)
+
+    e6_sign = unpack_from("<b", dig_e1_e7, 5)[0]
+    dig_H5 = (e6_sign << 4) | (dig_e1_e7[4] >> 4)
+
+    dig_H6 = unpack_from("<b", dig_e1_e7, 6)[0]
+    return dig[:12] + (dig[13], dig_H2, dig_H3, dig_H4, dig_H5, dig_H6)
+
+
+def read_calibration(i2c, address):
+    """ Reads and parses the calibration data of the sensor at address """
+    return parse_calibration(i2c.readfrom_mem(address, 0x88, 26),
+                             i2c.readfrom_mem(address, 0xE1, 7))
+
+
+class BME280Compensation:
+    """ Bosch integer compensation with the calibration folded into constants.
+
+        Shifted and combined calibration terms are computed once here, and
+        compensate() works on local variables only, instead of redoing the
+        shifts through attribute lookups for every sample.
+    """
+
+    def __init__(self, calibration):
+        T1, T2, T3, P1, P2, P3, P4, P5, P6, P7, P8, P9, \
+            H1, H2, H3, H4, H5, H6 = calibration
+        self.calibration = calibration
+        self.t = (T1, T1 << 1, T2, T3)
+        self.p = (P1, P1 << 47, P2 << 12, P3, P4 << 35, P5 << 17, P6,
+                  P7 << 4, P8, P9)
+        self.h = (H1, H2, H3, H4 << 20, H5, H6)
+
+    def compensate(self, raw_temp, raw_press, raw_hum, result):
+        """ Compensates one raw sample into result.
+
+            Args:
+                raw_temp, raw_press, raw_hum: raw ADC values
+                result: array of length 3 or alike, receives temperature
+                (0.01 C), pressure (Pa as Q24.8) and humidity (% as Q22.10)
+            Returns:
+                t_fine
+        """
+        t1, t1x2, t2, t3 = self.t
+        # temperature
+        var1 = (((raw_temp >> 3) - t1x2) * t2) >> 11
+        var2 = (raw_temp >> 4) - t1
+        var2 = (((var2 * var2) >> 12) * t3) >> 14
+        t_fine = var1 + var2
+        result[0] = (t_fine * 5 + 128) >> 8
+
+        # pressure
+        p1, p1x, p2x, p3, p4x, p5x, p6, p7x, p8, p9 = self.p
+        var1 = t_fine - 128000
+        var2 = var1 * var1 * p6 + var1 * p5x + p4x
+        var1 = p1x + (((var1 * var1 * p3) >> 8) + var1 * p2x) * p1
+        var1 >>= 33
+        if var1 == 0:
+            result[1] = 0
+        else:
+            p = 1048576 - raw_press
+            p = (((p << 31) - var2) * 3125) // var1
+            var1 = p >> 13
+            var1 = (p9 * var1 * var1) >> 25
+            var2 = (p8 * p) >> 19
+            result[1] = ((p + var1 + var2) >> 8) + p7x
+
+        # humidity
+        h1, h2, h3, h4x, h5, h6 = self.h
+        h = t_fine - 76800
+        h = ((((raw_hum << 14) - h4x - h5 * h) + 16384) >> 15) * \
+            (((((((h * h6) >> 10) * (((h * h3) >> 11) + 32768)) >> 10) +
+               2097152) * h2 + 8192) >> 14)
+        var1 = h >> 15
+        h = h - ((((var1 * var1) >> 7) * h1) >> 4)
+        h = 0 if h < 0 else h
+        h = 419430400 if h > 419430400 else h
+        result[2] = h >> 12
+        return t_fine
 
 
 class BME280:
@@ -71,34 +190,89 @@ class BME280:
         self.i2c = i2c
 
         # load calibration data
-        dig_88_a1 = self.i2c.readfrom_mem(self.address, 0x88, 26)
-        dig_e1_e7 = self.i2c.readfrom_mem(self.address, 0xE1, 7)
         self.dig_T1, self.dig_T2, self.dig_T3, self.dig_P1, \
             self.dig_P2, self.dig_P3, self.dig_P4, self.dig_P5, \
             self.dig_P6, self.dig_P7, self.dig_P8, self.dig_P9, \
-            _, self.dig_H1 = unpack("<HhhHhhhhhhhhBB", dig_88_a1)
-
-        self.dig_H2, self.dig_H3 = unpack("<hB", dig_e1_e7)
-        e4_sign = unpack_from("<b", dig_e1_e7, 3)[0]
-        self.dig_H4 = (e4_sign << 4) | (dig_e1_e7[4] & 0xF)
-
-        e6_sign = unpack_from("<b", dig_e1_e7, 5)[0]
-        self.dig_H5 = (e6_sign << 4) | (dig_e1_e7[4] >> 4)
-
-        self.dig_H6 = unpack_from("<b", dig_e1_e7, 6)[0]
+            self.dig_H1, self.dig_H2, self.dig_H3, self.dig_H4, \
+            self.dig_H5, self.dig_H6 = calibration = \
+            read_calibration(self.i2c, self.address)
+        self._compensation = BME280Compensation(calibration)
 
         self.i2c.writeto_mem(self.address, BME280_REGISTER_CONTROL,
                              bytearray([0x3F]))
         self.t_fine = 0
+        self._power_mode = BME280_FORCED
+        self._ready_at = 0  # ticks_us when a triggered conversion is done
 
         # temporary data holders which stay allocated
         self._l1_barray = bytearray(1)
         self._l8_barray = bytearray(8)
         self._l3_resultarray = array("i", [0, 0, 0])
+        self._result = array("i", [0, 0, 0])
+        # memoised human readable values, keyed on the displayed resolution
+        self._fmt_key = array("i", [0, 0, 0])
+        self._fmt = None
+
+    def measurement_time_us(self):
+        """ Maximum conversion time of one measurement in microseconds """
+
+        sleep_time = 1250 + 2300 * (1 << self._mode)
+        sleep_time = sleep_time + 2300 * (1 << self._mode) + 575
+        sleep_time = sleep_time + 2300 * (1 << self._mode) + 575
+        return sleep_time
+
+    def _write_control(self, power_mode):
+        # ctrl_hum only takes effect after the following ctrl_meas write
+        self._l1_barray[0] = self._mode
+        self.i2c.writeto_mem(self.address, BME280_REGISTER_CONTROL_HUM,
+                             self._l1_barray)
+        self._l1_barray[0] = self._mode << 5 | self._mode << 2 | power_mode
+        self.i2c.writeto_mem(self.address, BME280_REGISTER_CONTROL,
+                             self._l1_barray)
+
+    def _write_config(self, standby, iir_filter):
+        # the config register is only reliably written in sleep mode
+        self._write_control(BME280_SLEEP)
+        self._l1_barray[0] = standby << 5 | iir_filter << 2
+        self.i2c.writeto_mem(self.address, BME280_REGISTER_CONFIG,
+                             self._l1_barray)
+
+    def set_normal_mode(self, standby=BME280_STANDBY_62_5,
+                        iir_filter=BME280_FILTER_OFF):
+        """ Lets the sensor measure continuously.
+
+            The sensor converts every standby period on its own, so reads
+            only fetch the latest result and never wait for a conversion.
+
+            Args:
+                standby: one of the BME280_STANDBY_* constants
+                iir_filter: one of the BME280_FILTER_* constants
+        """
+        if not 0 <= standby <= BME280_STANDBY_20:
+            raise ValueError('Unexpected standby value {0}'.format(standby))
+        if not BME280_FILTER_OFF <= iir_filter <= BME280_FILTER_16:
+            raise ValueError('Unexpected filter value {0}'.format(iir_filter))
+        self._write_config(standby, iir_filter)
+        self._write_control(BME280_NORMAL)
+        self._power_mode = BME280_NORMAL
+        # make sure the first read returns a finished conversion
+        time.sleep_us(self.measurement_time_us())
+
+    def set_forced_mode(self, iir_filter=BME280_FILTER_OFF):
+        """ Back to one conversion per read (the default).
+
+            Args:
+                iir_filter: one of the BME280_FILTER_* constants
+        """
+        self._write_config(BME280_STANDBY_0_5, iir_filter)
+        self._power_mode = BME280_FORCED
 
     def read_raw_data(self, result):
         """ Reads the raw (uncompensated) data from the sensor.
 
+            In forced mode this triggers a conversion and waits for it, in
+            normal mode it only reads the latest conversion.
+
             Args:
                 result: array of length 3 or alike where the result will be
                 stored, in temperature, pressure, humidity order
@@ -106,18 +280,62 @@ class BME280:
                 None
         """
 
-        self._l1_barray[0] = self._mode
-        self.i2c.writeto_mem(self.address, BME280_REGISTER_CONTROL_HUM,
-                             self._l1_barray)
-        self._l1_barray[0] = self._mode << 5 | self._mode << 2 | 1
-        self.i2c.writeto_mem(self.address, BME280_REGISTER_CONTROL,
-                             self._l1_barray)
+        if self._power_mode != BME280_NORMAL:
+            self._write_control(BME280_FORCED)
+            time.sleep_us(self.measurement_time_us())  # Wait the required time
+        self._burst_read(result)
 
-        sleep_time = 1250 + 2300 * (1 << self._mode)
-        sleep_time = sleep_time + 2300 * (1 << self._mode) + 575
-        sleep_time = sleep_time + 2300 * (1 << self._mode) + 575
-        time.sleep_us(sleep_time)  # Wait the required time
+    def trigger(self):
+        """ Starts a conversion and returns immediately.
+
+            Use ready() / collect() to fetch the result later, so the
+            conversion time can be spent on other work. In normal mode the
+            sensor converts on its own and this does nothing.
+        """
+        if self._power_mode != BME280_NORMAL:
+            self._write_control(BME280_FORCED)
+            self._ready_at = time.ticks_add(time.ticks_us(),
+                                            self.measurement_time_us())
+
+    def remaining_us(self):
+        """ Microseconds until the triggered conversion is done (0 if done) """
+        if self._power_mode == BME280_NORMAL:
+            return 0
+        return max(0, time.ticks_diff(self._ready_at, time.ticks_us()))
+
+    def ready(self):
+        """ True once the triggered conversion is done. No bus access. """
+        return self.remaining_us() == 0
 
+    def collect(self, result=None):
+        """ Reads and compensates the conversion started by trigger().
+
+            Waits for the rest of the conversion time if called too early.
+
+            Args:
+                result: as for read_compensated_data()
+            Returns:
+                as read_compensated_data()
+        """
+        remaining = self.remaining_us()
+        if remaining:
+            time.sleep_us(remaining)
+        self._burst_read(self._l3_resultarray)
+        return self._compensate(result)
+
+    async def read(self, result=None):
+        """ Non-blocking read for asyncio: await bme.read() """
+        try:
+            import uasyncio as asyncio
+        except ImportError:
+            import asyncio
+        self.trigger()
+        remaining = self.remaining_us()
+        if remaining:
+            await asyncio.sleep(remaining / 1000000)
+        return self.collect(result)
+
+    def _burst_read(self, result):
         # burst readout from 0xF7 to 0xFE, recommended by datasheet
         self.i2c.readfrom_mem_into(self.address, 0xF7, self._l8_barray)
         readout = self._l8_barray
@@ -142,65 +360,62 @@ class BME280:
 
             Returns:
                 array with temperature, pressure, humidity. Will be the one from
-                the result parameter if not None
+                the result parameter if not None, otherwise an internal array
+                that is overwritten by the next read
         """
         self.read_raw_data(self._l3_resultarray)
-        raw_temp, raw_press, raw_hum = self._l3_resultarray
-        # temperature
-        var1 = ((raw_temp >> 3) - (self.dig_T1 << 1)) * (self.dig_T2 >> 11)
-        var2 = (((((raw_temp >> 4) - self.dig_T1) *
-                  ((raw_temp >> 4) - self.dig_T1)) >> 12) * self.dig_T3) >> 14
-        self.t_fine = var1 + var2
-        temp = (self.t_fine * 5 + 128) >> 8
+        return self._compensate(result)
 
-        # pressure
-        var1 = self.t_fine - 128000
-        var2 = var1 * var1 * self.dig_P6
-        var2 = var2 + ((var1 * self.dig_P5) << 17)
-        var2 = var2 + (self.dig_P4 << 35)
-        var1 = (((var1 * var1 * self.dig_P3) >> 8) +
-                ((var1 * self.dig_P2) << 12))
-        var1 = (((1 << 47) + var1) * self.dig_P1) >> 33
-        if var1 == 0:
-            pressure = 0
-        else:
-            p = 1048576 - raw_press
-            p = (((p << 31) - var2) * 3125) // var1
-            var1 = (self.dig_P9 * (p >> 13) * (p >> 13)) >> 25
-            var2 = (self.dig_P8 * p) >> 19
-            pressure = ((p + var1 + var2) >> 8) + (self.dig_P7 << 4)
+    def read_into(self, result):
+        """ Allocation-free numeric read.
 
-        # humidity
-        h = self.t_fine - 76800
-        h = (((((raw_hum << 14) - (self.dig_H4 << 20) -
-                (self.dig_H5 * h)) + 16384)
-              >> 15) * (((((((h * self.dig_H6) >> 10) *
-                            (((h * self.dig_H3) >> 11) + 32768)) >> 10) +
-                          2097152) * self.dig_H2 + 8192) >> 14))
-        h = h - (((((h >> 15) * (h >> 15)) >> 7) * self.dig_H1) >> 4)
-        h = 0 if h < 0 else h
-        h = 419430400 if h > 419430400 else h
-        humidity = h >> 12
+            Args:
+                result: array of length 3 or alike, receives temperature
+                (0.01 C), pressure (Pa as Q24.8) and humidity (% as Q22.10)
+            Returns:
+                result
+        """
+        self.read_raw_data(self._l3_resultarray)
+        return self._compensate(result)
+
+    def _compensate(self, result):
+        # compensates the raw data held in self._l3_resultarray
+        raw = self._l3_resultarray
+        if result is None:
+            result = self._result
+        self.t_fine = self._compensation.compensate(raw[0], raw[1], raw[2],
+                                                    result)
+        return result
 
-        if result:
-            result[0] = temp
-            result[1] = pressure
-            result[2] = humidity
-            return result
+    def formatted(self, t, p, h):
+        """ format_values(), regenerated only when the displayed digits change """
 
-        return array("i", (temp, pressure, humidity))
+        key = self._fmt_key
+        pk = p // 256
+        hk = h * 100 // 1024
+        if self._fmt is None or key[0] != t or key[1] != pk or key[2] != hk:
+            key[0] = t
+            key[1] = pk
+            key[2] = hk
+            self._fmt = format_values(t, p, h)
+        return self._fmt
 
     @property
     def values(self):
         """ human readable values """
 
         t, p, h = self.read_compensated_data()
+        return self.formatted(t, p, h)
+
+
+def format_values(t, p, h):
+    """ formats compensated integer data as human readable strings """
 
-        p = p // 256
-        pi = p // 100
-        pd = p - pi * 100
+    p = p // 256
+    pi = p // 100
+    pd = p - pi * 100
 
-        hi = h // 1024
-        hd = h * 100 // 1024 - hi * 100
-        return ("{}C".format(t / 100), "{}.{:02d}hPa".format(pi, pd),
-                "{}.{:02d}%".format(hi, hd))
+    hi = h // 1024
+    hd = h * 100 // 1024 - hi * 100
+    return ("{}C".format(t / 100), "{}.{:02d}hPa".format(pi, pd),
+            "{}.{:02d}%".format(hi, hd))
@@ -0,0 +1,76 @@
+# bme280_batch.py
+# Runs on the Raspberry Pi: vectorised BME280 compensation with NumPy.
+#
+# Turns raw (T, P, H) samples of many sensors into physical units in one
+# pass. The integer math is the same as BME280Compensation.compensate() on
+# the device, so results match the mat bit for bit. int64 is wide enough
+# for Bosch's 64-bit reference formulas with real calibration data.
+#
+# Usage:
+#   cal = calibration_table([bme280.parse_calibration(block_88, block_e1), ...])
+#   t, p, h = compensate(cal, device_index, raw)   # raw: (M, 3) int array
+#   celsius, hpa, percent = to_units(t, p, h)
+import numpy as np
+
+
+def calibration_table(calibrations):
+    """
+    Stacks the calibration tuples (as returned by bme280.parse_calibration)
+    of several devices into an (N, 18) int64 array.
+    """
+    return np.asarray(calibrations, dtype=np.int64).reshape(-1, 18)
+
+
+def compensate(calibration, device_index, raw):
+    """
+    Compensates raw samples of several devices at once.
+
+    Args:
+        calibration: (N, 18) array from calibration_table()
+        device_index: (M,) index into calibration for every sample
+        raw: (M, 3) raw temperature, pressure, humidity
+    Returns:
+        (temperature, pressure, humidity) as int64 arrays in the device's
+        fixed-point units: 0.01 C, Pa as Q24.8, % as Q22.10
+    """
+    raw = np.asarray(raw, dtype=np.int64)
+    c = np.asarray(calibration, dtype=np.int64)[np.asarray(device_index)]
+    (T1, T2, T3, P1, P2, P3, P4, P5, P6, P7, P8, P9,
+     H1, H2, H3, H4, H5, H6) = c.T
+    raw_temp, raw_press, raw_hum = raw[:, 0], raw[:, 1], raw[:, 2]
+
+    # temperature
+    var1 = (((raw_temp >> 3) - (T1 << 1)) * T2) >> 11
+    var2 = (raw_temp >> 4) - T1
+    var2 = (((var2 * var2) >> 12) * T3) >> 14
+    t_fine = var1 + var2
+    temperature = (t_fine * 5 + 128) >> 8
+
+    # pressure
+    var1 = t_fine - 128000
+    var2 = var1 * var1 * P6 + (var1 * P5 << 17) + (P4 << 35)
+    var1 = ((P1 << 47) + (((var1 * var1 * P3) >> 8) + (var1 * P2 << 12)) * P1) >> 33
+    valid = var1 != 0
+    divisor = np.where(valid, var1, 1)
+    p = 1048576 - raw_press
+    p = (((p << 31) - var2) * 3125) // divisor
+    var1 = p >> 13
+    var1 = (P9 * var1 * var1) >> 25
+    var2 = (P8 * p) >> 19
+    pressure = np.where(valid, ((p + var1 + var2) >> 8) + (P7 << 4), 0)
+
+    # humidity
+    h = t_fine - 76800
+    h = ((((raw_hum << 14) - (H4 << 20) - H5 * h) + 16384) >> 15) * \
+        (((((((h * H6) >> 10) * (((h * H3) >> 11) + 32768)) >> 10) +
+           2097152) * H2 + 8192) >> 14)
+    var1 = h >> 15
+    h = h - ((((var1 * var1) >> 7) * H1) >> 4)
+    humidity = np.clip(h, 0, 419430400) >> 12
+    return temperature, pressure, humidity
+
+
+def to_units(temperature, pressure, humidity):
+    """Fixed-point arrays -> (C, hPa, %) float arrays."""
+    return (np.asarray(temperature) / 100.0, np.asarray(pressure) / 25600.0,
+            np.asarray(humidity) / 1024.0)
@@ -0,0 +1,114 @@
+# bme280_group.py
+# Several BME280 sensors (0x76 / 0x77, one or more I2C buses) read as one.
+#
+# All conversions are started back-to-back, the group waits once for the
+# slowest one and then burst-reads every sensor. N sensors therefore cost
+# about one conversion time instead of N.
+from array import array
+import time
+import bme280
+
+BME280_CHIP_ID = 0x60
+BME280_REGISTER_CHIP_ID = 0xD0
+BME280_ADDRESSES = (0x76, 0x77)
+
+
+def scan(buses, mode=bme280.BME280_OSAMPLE_1):
+    """
+    Finds all BME280 sensors on the given I2C buses and returns a group.
+    Sensors are ordered by bus, then address.
+    """
+    sensors = []
+    for i2c in buses:
+        present = i2c.scan()
+        for address in BME280_ADDRESSES:
+            if address in present and \
+                    i2c.readfrom_mem(address, BME280_REGISTER_CHIP_ID, 1)[0] == BME280_CHIP_ID:
+                sensors.append(bme280.BME280(mode=mode, address=address, i2c=i2c))
+    return BME280Group(sensors)
+
+
+class BME280Group:
+    """
+    Reads a list of BME280 instances together. Results are kept in
+    `data`, a flat array with temperature, pressure, humidity per sensor.
+    """
+
+    def __init__(self, sensors):
+        self.sensors = sensors
+        self.data = array("i", [0] * (3 * len(sensors)))
+        self._result = array("i", [0, 0, 0])
+        # Reads on a bus happen one after the other, so sensors sharing a
+        # bus can share their transfer buffers.
+        shared = {}
+        for s in sensors:
+            buffers = shared.get(id(s.i2c))
+            if buffers is None:
+                shared[id(s.i2c)] = (s._l1_barray, s._l8_barray)
+            else:
+                s._l1_barray, s._l8_barray = buffers
+
+    def __len__(self):
+        return len(self.sensors)
+
+    def trigger(self):
+        """Starts the conversion of every sensor."""
+        for s in self.sensors:
+            s.trigger()
+
+    def remaining_us(self):
+        """Microseconds until the slowest conversion is done."""
+        remaining = 0
+        for s in self.sensors:
+            r = s.remaining_us()
+            if r > remaining:
+                remaining = r
+        return remaining
+
+    def ready(self):
+        return self.remaining_us() == 0
+
+    def collect(self):
+        """
+        Waits for the remaining conversion time once, then reads every
+        sensor into `data`. Returns `data`.
+        """
+        remaining = self.remaining_us()
+        if remaining:
+            time.sleep_us(remaining)
+        data = self.data
+        result = self._result
+        for i, s in enumerate(self.sensors):
+            s.collect(result)
+            data[3 * i] = result[0]
+            data[3 * i + 1] = result[1]
+            data[3 * i + 2] = result[2]
+        return data
+
+    def read(self):
+        """Blocking read of all sensors: one conversion time in total."""
+        self.trigger()
+        return self.collect()
+
+    async def read_async(self):
+        try:
+            import uasyncio as asyncio
+        except ImportError:
+            import asyncio
+        self.trigger()
+        remaining = self.remaining_us()
+        if remaining:
+            await asyncio.sleep(remaining / 1000000)
+        return self.collect()
+
+    def values(self, index):
+        """(temperature, pressure, humidity) of sensor `index`."""
+        base = 3 * index
+        data = self.data
+        return data[base], data[base + 1], data[base + 2]
+
+    def formatted(self, index):
+        """Human readable values of sensor `index`, memoised per sensor."""
+        base = 3 * index
+        data = self.data
+        return self.sensors[index].formatted(data[base], data[base + 1], data[base + 2])
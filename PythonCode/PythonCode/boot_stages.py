@@ -0,0 +1,69 @@
+# boot_stages.py
+# Staged start-up: the mat samples first, slow subsystems follow.
+#
+# The I2C devices, the display, the identification model, the event log
+# and Wi-Fi/MQTT together take seconds to come up. Only the SPI bus, the
+# pins and the loop logic are set up before the first pressure scan; the
+# rest is registered as stages that the main loop runs between samples,
+# within a time budget per loop.
+#
+# A stage is a function returning True when it is done. A stage that waits
+# for something (Wi-Fi association) returns False and is called again in
+# the next loop. time.ticks_ms() counts from reset on the ESP32, so the
+# timestamps below are times since boot.
+try:
+    import ujson as json
+except ImportError:
+    import json
+import time
+
+
+class BootStages:
+
+    def __init__(self):
+        self.stages = []          # (name, step) not run yet, in order
+        self.times = []           # (name, ms since boot when done, ms spent)
+        self.first_sample = None  # ms since boot of the first pressure scan
+        self._spent = 0           # ms spent in the current stage so far
+
+    def add(self, name, step):
+        self.stages.append((name, step))
+
+    def sampled(self):
+        """Call after each pressure scan; records the first one."""
+        if self.first_sample is None:
+            self.first_sample = time.ticks_ms()
+            print("Boot to first sample:", self.first_sample, "ms")
+
+    def run(self, budget_ms=100):
+        """
+        Runs stages until one is waiting or budget_ms is used up.
+        Returns True while stages remain.
+        """
+        start = time.ticks_ms()
+        while self.stages:
+            name, step = self.stages[0]
+            began = time.ticks_ms()
+            try:
+                done = step()
+            except Exception as e:  # A broken subsystem must not stop the mat
+                print("Boot stage", name, "failed:", e)
+                done = True
+            now = time.ticks_ms()
+            self._spent += time.ticks_diff(now, began)
+            if not done:
+                return True
+            self.stages.pop(0)
+            self.times.append((name, now, self._spent))
+            self._spent = 0
+            if time.ticks_diff(now, start) >= budget_ms:
+                break
+        return bool(self.stages)
+
+    def done(self):
+        return not self.stages
+
+    def report(self):
+        """JSON text: first sample and per-stage (done at, time spent) in ms."""
+        stages = {name: [at, spent] for name, at, spent in self.times}
+        return json.dumps({"first_sample": self.first_sample, "stages": stages})
@@ -0,0 +1,259 @@
+# config.py
+# Per-mat configuration: pins, thresholds, timings, topics and credentials.
+#
+# The values live in config.json on the mat; every key is optional and
+# falls back to DEFAULTS. The credentials have no usable defaults: they
+# come from config.json, or on a PC / the Pi from the environment
+# (ENVIRONMENT). The file is validated once. On the mat, the validated
+# values are cached in config.cache together with the size and
+# modification time of config.json, so later boots skip parsing checks
+# until the file changes. The result is an immutable namedtuple:
+# cfg = config.get(); cfg.threshold.
+#
+# Settings can be changed at runtime through a retained MQTT message with a
+# JSON object of changes (see handle_message). Changes are validated,
+# written to config.json and reported to the on_change() listeners; keys
+# not in RELOADABLE take effect after the next reboot. Credentials, the
+# broker, the topic prefix, the MQTT switch and pins (LOCAL_ONLY) cannot be
+# changed over MQTT.
+try:
+    import ujson as json
+except ImportError:
+    import json
+try:
+    from ucollections import namedtuple
+except ImportError:
+    from collections import namedtuple
+import os
+import sys
+
+SOURCE = "config.json"
+# Only the mat keeps a cache; elsewhere it would copy the credentials into the working directory
+CACHE = "config.cache" if sys.implementation.name == "micropython" else None
+
+# name, default, allowed values: (min, max) for numbers, a tuple of
+# strings for choices, None for any value of the default's type
+SCHEMA = (
+    # WiFi and MQTT
+    ("wifi_ssid", "Two Girls One Router", None),
+    ("wifi_password", "", None),
+    ("mqtt_broker", "192.168.178.113", None),  # Home Assistant IP
+    ("mqtt_port", 1883, (1, 65535)),
+    ("mqtt_user", "", None),                  # Empty: connect without user name
+    ("mqtt_password", "", None),
+    ("client_id", "esp32-test", None),
+    ("device_id", "esp32", None),             # Home Assistant unique ids
+    ("topic_prefix", "home/esp32", None),     # Topics are <prefix>/state, <prefix>/event, ...
+    ("payload_format", "json", ("json", "binary")),
+    # Pins and buses
+    ("pin_sck", 6, (0, 30)),
+    ("pin_mosi", 5, (0, 30)),
+    ("pin_miso", 7, (0, 30)),
+    ("pin_adc_cs", 4, (0, 30)),
+    ("pin_sda", 2, (0, 30)),
+    ("pin_scl", 3, (0, 30)),
+    ("pin_buzzer", 21, (0, 30)),
+    ("pin_led", 8, (0, 30)),
+    ("pin_pir", 22, (0, 30)),
+    ("spi_baudrate", 1000000, (10000, 3600000)),   # MCP3008: 3.6 MHz at 5 V
+    ("i2c_freq", 400000, (10000, 1000000)),
+    # Features (app package); a disabled feature is not imported or set up
+    ("enable_display", True, None),
+    ("enable_mqtt", True, None),
+    ("enable_buzzer", True, None),
+    ("enable_led", True, None),
+    ("recording", "off", ("off", "file", "mqtt")),  # Input recording for replay.py
+    ("trace_streaming", False, None),         # Stream raw traces from boot
+    # Behaviour
+    ("threshold", 900, (0, 1023)),            # ADC threshold for LED, sound and steps
+    ("display_timeout", 10000, (0, 3600000)), # ms the display stays on after motion
+    ("display_period", 5000, (500, 600000)),  # ms between display pages
+    ("env_period", 5000, (1000, 3600000)),    # ms between BME280 reads
+    ("active_timeout", 10000, (0, 3600000)),  # ms without motion or load before the mat goes idle
+    ("light_sleep", True, None),              # Light sleep between samples while idle
+    ("pattern_length", 4, (2, 8)),            # Steps per enrolled step pattern (PIN)
+)
+
+NAMES = tuple(entry[0] for entry in SCHEMA)
+DEFAULTS = {entry[0]: entry[1] for entry in SCHEMA}
+# Applied at runtime by the listeners; everything else needs a reboot
+RELOADABLE = ("threshold", "display_timeout", "display_period", "env_period",
+              "payload_format", "active_timeout", "light_sleep")
+# Never changed over MQTT: a retained message must not redirect or silence the mat or reveal its secrets
+LOCAL_ONLY = ("wifi_ssid", "wifi_password", "mqtt_broker", "mqtt_port", "mqtt_user",
+              "mqtt_password", "client_id", "topic_prefix", "enable_mqtt")
+# Environment variables that override config.json where there is an environment (CPython)
+ENVIRONMENT = (("wifi_password", "WIFI_PASSWORD"), ("mqtt_user", "MQTT_USER"),
+               ("mqtt_password", "MQTT_PASS"))
+
+Config = namedtuple("Config", NAMES)
+
+_current = None
+_listeners = []
+
+
+def validate(changes, base=None):
+    """
+    Checks the dict `changes` against SCHEMA and applies it on top of
+    `base` (a Config, default: DEFAULTS). Returns the new Config.
+    Raises ValueError listing every problem.
+    """
+    values = dict(DEFAULTS) if base is None else dict(zip(NAMES, base))
+    errors = []
+    if not isinstance(changes, dict):
+        raise ValueError("Configuration must be a JSON object")
+    for name in changes:
+        if name not in DEFAULTS:
+            errors.append("unknown key " + name)
+    for name, default, allowed in SCHEMA:
+        if name not in changes:
+            continue
+        value = changes[name]
+        if type(value) is not type(default):
+            errors.append("{} must be {}".format(name, type(default).__name__))
+        elif isinstance(allowed, tuple) and isinstance(allowed[0], str) and value not in allowed:
+            errors.append("{} must be one of {}".format(name, ", ".join(allowed)))
+        elif allowed is not None and not isinstance(allowed[0], str) \
+                and not allowed[0] <= value <= allowed[1]:
+            errors.append("{} must be within {}..{}".format(name, allowed[0], allowed[1]))
+        else:
+            values[name] = value
+    if errors:
+        raise ValueError("; ".join(errors))
+    return Config(*(values[name] for name in NAMES))
+
+
+def _signature(path):
+    try:
+        st = os.stat(path)
+        return [st[6], st[8]]  # size, mtime
+    except OSError:
+        return None
+
+
+def _environment(cfg):
+    environ = getattr(os, "environ", None)  # MicroPython has none
+    if not environ:
+        return cfg
+    changes = {name: environ[var] for name, var in ENVIRONMENT if var in environ}
+    return validate(changes, cfg) if changes else cfg
+
+
+def load(source=SOURCE, cache=CACHE):
+    """
+    Returns the Config for `source`. Uses the cache (None: no cache) if it
+    was made from the current source file, otherwise validates the source
+    and rewrites the cache. A missing or invalid source gives the defaults.
+    """
+    signature = _signature(source)
+    if cache:
+        try:
+            with open(cache) as f:
+                cached_signature, values = json.load(f)
+            if cached_signature == signature and len(values) == len(NAMES):
+                return Config(*values)
+        except (OSError, ValueError):
+            pass
+
+    cfg = Config(*(DEFAULTS[name] for name in NAMES))
+    if signature is not None:
+        try:
+            with open(source) as f:
+                cfg = validate(json.load(f))
+        except (OSError, ValueError) as e:
+            print("Invalid {}, using defaults: {}".format(source, e))
+            return _environment(cfg)
+    _write_cache(cfg, signature, cache)
+    return _environment(cfg)
+
+
+def _write_cache(cfg, signature, cache=CACHE):
+    if not cache:
+        return
+    try:
+        with open(cache, "w") as f:
+            json.dump([signature, list(cfg)], f)
+    except OSError as e:
+        print("Config cache not written:", e)
+
+
+def get():
+    """The current configuration, loaded on first use."""
+    global _current
+    if _current is None:
+        _current = load()
+    return _current
+
+
+def on_change(listener):
+    """Registers listener(cfg, changed_names), called after update()."""
+    _listeners.append(listener)
+
+
+def update(changes, source=SOURCE):
+    """
+    Validates and applies changes. Returns (changed names, names that need a
+    reboot). Raises ValueError if the changes are invalid.
+    """
+    global _current
+    old = get()
+    new = validate(changes, old)
+    changed = [name for name, a, b in zip(NAMES, old, new) if a != b]
+    if not changed:
+        return [], []
+    _current = new
+    # Only keys that differ from the defaults are stored, and no credentials from the environment
+    from_environment = [name for name, _ in ENVIRONMENT if name not in changes]
+    stored = {name: value for name, value in zip(NAMES, new)
+              if value != DEFAULTS[name] and name not in from_environment}
+    try:
+        with open(source) as f:
+            kept = json.load(f)
+        for name in from_environment:
+            if name in kept:
+                stored[name] = kept[name]
+    except (OSError, ValueError):
+        pass
+    with open(source, "w") as f:
+        json.dump(stored, f)
+    _write_cache(new, _signature(source))
+    for listener in _listeners:
+        listener(new, changed)
+    return changed, [name for name in changed if name not in RELOADABLE]
+
+
+def parse_message(msg):
+    """
+    The changes in a config topic message (a JSON object). Raises
+    ValueError for invalid JSON and for keys that are LOCAL_ONLY.
+    """
+    changes = json.loads(msg)
+    if isinstance(changes, dict):
+        refused = [name for name in changes
+                   if name in LOCAL_ONLY or name.startswith("pin_")]
+        if refused:
+            raise ValueError("only settable in config.json: " + ", ".join(refused))
+    return changes
+
+
+def handle_message(msg):
+    """
+    MQTT handler for the config topic: msg is a JSON object of changes.
+    Returns a short status text for the config status topic.
+    """
+    try:
+        changed, reboot = update(parse_message(msg))
+    except ValueError as e:
+        print("Config rejected:", e)
+        return "rejected: {}".format(e)
+    if not changed:
+        return "unchanged"
+    print("Config changed:", ", ".join(changed))
+    if reboot:
+        return "applied, reboot needed for " + ", ".join(reboot)
+    return "applied: " + ", ".join(changed)
+
+
+def topic(name, cfg=None):
+    """MQTT topic <topic_prefix>/<name> as bytes."""
+    return "{}/{}".format((cfg or get()).topic_prefix, name).encode()
@@ -0,0 +1,96 @@
+# env_sampler.py
+# Rate-limited BME280 sampling with a cached, smoothed snapshot.
+#
+# Temperature, pressure and humidity change over minutes, so the sensor is
+# read every `period_ms` only. Display, MQTT and automation code use the
+# cached snapshot and its age instead of talking to the sensor themselves.
+import time
+from array import array
+
+
+class EnvSampler:
+    """
+    Reads the BME280 at a fixed cadence using the split-phase API: poll()
+    triggers a conversion when one is due and collects it on a later poll()
+    once it is ready, so the main loop never waits for the sensor.
+
+    Smoothing: with window > 1 a moving average over the last `window`
+    samples is kept. With window=1 the raw readings are used, which is the
+    right choice when the chip's own IIR filter is enabled
+    (bme.set_normal_mode(iir_filter=...)).
+    """
+
+    def __init__(self, bme, period_ms=5000, window=1):
+        self.bme = bme
+        self.period_ms = period_ms
+        self.window = window
+        self.data = array("i", [0, 0, 0])   # smoothed temperature, pressure, humidity
+        self._sample = array("i", [0, 0, 0])
+        self._history = array("i", [0] * (3 * window))
+        self._sums = [0, 0, 0]
+        self._count = 0       # samples in the history (up to window)
+        self._next = 0        # history slot for the next sample
+        self._pending = False
+        self._due = time.ticks_ms()
+        self.timestamp = 0    # ticks_ms of the last sample
+        self.samples = 0      # samples taken since start
+
+    def poll(self, now):
+        """
+        Call once per loop. Returns True when a new sample was taken.
+        """
+        if self._pending:
+            if not self.bme.ready():
+                return False
+            self.bme.collect(self._sample)
+            self._pending = False
+            self._add(self._sample)
+            self.timestamp = now
+            self.samples += 1
+            return True
+        if time.ticks_diff(now, self._due) >= 0:
+            self._due = time.ticks_add(now, self.period_ms)
+            self.bme.trigger()
+            self._pending = True
+            # In normal mode the data is ready at once
+            return self.poll(now)
+        return False
+
+    def _add(self, sample):
+        data = self.data
+        if self.window == 1:
+            data[0] = sample[0]
+            data[1] = sample[1]
+            data[2] = sample[2]
+            return
+        hist = self._history
+        sums = self._sums
+        base = self._next * 3
+        if self._count == self.window:
+            for i in range(3):
+                sums[i] -= hist[base + i]
+        else:
+            self._count += 1
+        for i in range(3):
+            hist[base + i] = sample[i]
+            sums[i] += sample[i]
+            data[i] = sums[i] // self._count
+        self._next = (self._next + 1) % self.window
+
+    def has_data(self):
+        return self.samples > 0
+
+    def age_ms(self, now):
+        """Age of the snapshot in ms, or -1 if nothing was sampled yet."""
+        if not self.samples:
+            return -1
+        return time.ticks_diff(now, self.timestamp)
+
+    def is_stale(self, now, max_age_ms):
+        age = self.age_ms(now)
+        return age < 0 or age > max_age_ms
+
+    def formatted(self):
+        """Human readable (temperature, pressure, humidity) of the snapshot."""
+        data = self.data
+        return self.bme.formatted(data[0], data[1], data[2])
@@ -0,0 +1,248 @@
+# event_log.py
+# Append-only event log on the ESP32's flash, for events MQTT could not take.
+#
+# Events are fixed-size records in segment files (events/<first seq>.seg).
+# A full segment is closed and a new one started; beyond max_segments the
+# oldest segment is deleted, so the log is a ring buffer of bounded size
+# that writes every flash block in turn. Records are collected in RAM and
+# written in batches, which saves flash wear and write latency; a power
+# loss costs at most the unwritten batch.
+#
+# Record, little-endian (RECORD_SIZE bytes):
+#   seq (I) | timestamp in ms (I) | boot (H) | kind (B) | length (B) | body
+#
+# Records are numbered without gaps, so the upload cursor (the seq of the
+# first record not yet uploaded, kept in events/index) maps straight to a
+# segment and a file offset. upload() sends the records from there in bulk
+# messages: boot (H) | ticks_ms at upload (I) | records. The cursor is
+# written to flash when the log is drained, or every index_every messages
+# while it drains, not after every message. A power loss in between sends
+# up to index_every messages again; their seqs show the receiver they are
+# repeats.
+try:
+    from ustruct import pack_into, unpack_from
+except ImportError:
+    from struct import pack_into, unpack_from
+import os
+import time
+
+RECORD_SIZE = 40
+_RECORD = "<IIHBB"
+RECORD_HEADER_SIZE = 12
+MAX_BODY = RECORD_SIZE - RECORD_HEADER_SIZE
+_INDEX = "<IH"  # upload cursor, boot number
+_UPLOAD = "<HI"
+UPLOAD_HEADER_SIZE = 6
+
+KIND_FOOTSTEP = 1   # payload.TYPE_FOOTSTEP message
+KIND_USER = 2       # identified user name
+KIND_MOTION = 3     # b"ON" / b"OFF"
+KIND_PIN = 4        # PIN / pattern attempt
+KIND_SNAPSHOT = 5   # payload snapshot (binary or JSON)
+KIND_ROUTINE = 6    # b"enter", b"leave", b"linger", b"object", ... (routine.py)
+
+
+def upload_buffer_size(records):
+    return UPLOAD_HEADER_SIZE + records * RECORD_SIZE
+
+
+class EventLog:
+
+    def __init__(self, directory="events", segment_records=128, max_segments=8,
+                 batch_records=8, flush_ms=10000, upload_records=16, upload_buf=None,
+                 index_every=8):
+        self.directory = directory
+        self.segment_records = segment_records
+        self.max_segments = max_segments
+        self.flush_ms = flush_ms
+        self.batch = bytearray(batch_records * RECORD_SIZE)
+        self.batch_mv = memoryview(self.batch)
+        self.batch_records = batch_records
+        self.batched = 0        # records in the batch buffer
+        self._batch_time = 0
+        self.lost = 0           # records deleted before they were uploaded
+        self.uploaded = 0       # records uploaded since boot
+        self.index_every = index_every
+        self._unsaved = 0       # upload messages since the cursor was last written
+        self._file = None
+        # Allocated once: here or, as upload_buf, at boot (mem_policy)
+        if upload_buf is None:
+            upload_buf = bytearray(upload_buffer_size(upload_records))
+        self.upload_records = (len(upload_buf) - UPLOAD_HEADER_SIZE) // RECORD_SIZE
+        self._upload_buf = upload_buf
+        self._index_buf = bytearray(6)
+
+        try:
+            os.mkdir(directory)
+        except OSError:
+            pass  # exists
+        # Segment first seqs, oldest first
+        self.segments = sorted(int(name[:-4]) for name in os.listdir(directory)
+                               if name.endswith(".seg"))
+        self.next_seq = 0
+        if self.segments:
+            first = self.segments[-1]
+            size = os.stat(self._path(first))[6]
+            # A record cut short by a power loss is overwritten
+            count = size // RECORD_SIZE
+            self.next_seq = first + count
+            if count * RECORD_SIZE != size:
+                self._truncate(first, count)
+            if count < segment_records:
+                self._file = open(self._path(first), "ab")
+        self.cursor, self.boot = self._read_index()
+        self.boot = (self.boot + 1) & 0xFFFF
+        if self.segments and self.cursor < self.segments[0]:
+            self.cursor = self.segments[0]
+        if self.cursor > self.next_seq:
+            self.cursor = self.next_seq
+        self._write_index()
+
+    def _path(self, first):
+        return "{}/{:010d}.seg".format(self.directory, first)
+
+    def _truncate(self, first, count):
+        with open(self._path(first), "rb") as f:
+            data = f.read(count * RECORD_SIZE)
+        with open(self._path(first), "wb") as f:
+            f.write(data)
+
+    def _read_index(self):
+        try:
+            with open(self.directory + "/index", "rb") as f:
+                return unpack_from(_INDEX, f.read(6), 0)
+        except (OSError, ValueError):
+            return 0, 0
+
+    def _write_index(self):
+        buf = self._index_buf
+        pack_into(_INDEX, buf, 0, self.cursor, self.boot)
+        with open(self.directory + "/index", "wb") as f:
+            f.write(buf)
+        self._unsaved = 0
+
+    def append(self, kind, timestamp, body=b""):
+        """
+        Queues one event (body: at most MAX_BODY bytes, longer is cut).
+        Returns its sequence number.
+        """
+        if self.batched == self.batch_records:
+            self.flush()
+        if not self.batched:
+            self._batch_time = time.ticks_ms()
+        n = min(len(body), MAX_BODY)
+        pos = self.batched * RECORD_SIZE
+        seq = self.next_seq + self.batched
+        pack_into(_RECORD, self.batch, pos, seq, timestamp & 0xFFFFFFFF, self.boot, kind, n)
+        pos += RECORD_HEADER_SIZE
+        self.batch[pos:pos + n] = body[:n]
+        for i in range(pos + n, pos + MAX_BODY):
+            self.batch[i] = 0
+        self.batched += 1
+        return seq
+
+    def poll(self, now):
+        """Writes a partly filled batch once it is flush_ms old."""
+        if self.batched and time.ticks_diff(now, self._batch_time) >= self.flush_ms:
+            self.flush()
+
+    def flush(self):
+        """Writes the batched records to flash."""
+        done = 0
+        while done < self.batched:
+            in_segment = self.next_seq - self.segments[-1] if self.segments else self.segment_records
+            if in_segment >= self.segment_records:
+                self._rotate()
+                in_segment = 0
+            n = min(self.batched - done, self.segment_records - in_segment)
+            self._file.write(self.batch_mv[done * RECORD_SIZE:(done + n) * RECORD_SIZE])
+            done += n
+            self.next_seq += n
+        if self._file:
+            self._file.flush()
+        self.batched = 0
+
+    def _rotate(self):
+        """Closes the current segment, starts a new one and drops the oldest."""
+        if self._file:
+            self._file.close()
+        self.segments.append(self.next_seq)
+        self._file = open(self._path(self.next_seq), "wb")
+        while len(self.segments) > self.max_segments:
+            oldest = self.segments.pop(0)
+            os.remove(self._path(oldest))
+            if self.cursor < self.segments[0]:
+                self.lost += self.segments[0] - self.cursor
+                self.cursor = self.segments[0]
+
+    def pending(self):
+        """Records not uploaded yet, including the unwritten batch."""
+        return self.next_seq + self.batched - self.cursor
+
+    def read(self, seq, buf):
+        """
+        Reads whole records from seq on into buf, stopping at the end of
+        the segment. Returns the number of records read.
+        """
+        first = None
+        for s in self.segments:
+            if s <= seq:
+                first = s
+        if first is None or seq >= self.next_seq:
+            return 0
+        count = min(len(buf) // RECORD_SIZE, self.next_seq - seq,
+                    self.segment_records - (seq - first))
+        with open(self._path(first), "rb") as f:
+            f.seek((seq - first) * RECORD_SIZE)
+            return f.readinto(memoryview(buf)[:count * RECORD_SIZE]) // RECORD_SIZE
+
+    def upload(self, publish, max_records=None):
+        """
+        Sends up to max_records (at most upload_records) records as one
+        message via publish(msg), which returns True on success. The cursor
+        only moves on success, and is saved as described above. Returns the
+        number of records uploaded.
+        """
+        if self.batched:
+            self.flush()
+        max_records = min(max_records or self.upload_records, self.upload_records)
+        buf = self._upload_buf
+        records = memoryview(buf)[UPLOAD_HEADER_SIZE:]
+        n = self.read(self.cursor, records[:max_records * RECORD_SIZE])
+        if not n:
+            return 0
+        pack_into(_UPLOAD, buf, 0, self.boot, time.ticks_ms() & 0xFFFFFFFF)
+        if not publish(memoryview(buf)[:UPLOAD_HEADER_SIZE + n * RECORD_SIZE]):
+            if self._unsaved:
+                self._write_index()  # The drain stops here for now
+            return 0
+        self.cursor += n
+        self.uploaded += n
+        self._unsaved += 1
+        if self._unsaved >= self.index_every or self.cursor >= self.next_seq:
+            self._write_index()
+        return n
+
+    def close(self):
+        self.flush()
+        if self._unsaved:
+            self._write_index()
+        if self._file:
+            self._file.close()
+            self._file = None
+
+
+def decode_upload(msg):
+    """
+    Decodes an upload message.
+    Returns (boot, ticks at upload, [(seq, timestamp, boot, kind, body), ...]).
+    """
+    if len(msg) < UPLOAD_HEADER_SIZE or (len(msg) - UPLOAD_HEADER_SIZE) % RECORD_SIZE:
+        raise ValueError("Bad event log upload of {} bytes".format(len(msg)))
+    boot, now = unpack_from(_UPLOAD, msg, 0)
+    records = []
+    for pos in range(UPLOAD_HEADER_SIZE, len(msg), RECORD_SIZE):
+        seq, timestamp, rec_boot, kind, n = unpack_from(_RECORD, msg, pos)
+        body = bytes(msg[pos + RECORD_HEADER_SIZE:pos + RECORD_HEADER_SIZE + n])
+        records.append((seq, timestamp, rec_boot, kind, body))
+    return boot, now, records
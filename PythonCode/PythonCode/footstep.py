@@ -0,0 +1,242 @@
+# footstep.py
+# Streaming footstep feature extraction over the SampleRing.
+#
+# Every new sample updates the running features of the current step in
+# constant time (one pass over the zones, independent of the step length):
+# onset / offset time, peak load, impulse, pressed zones and the centre of
+# pressure (COP). When the step ends, the finished Footstep is handed to a
+# callback. Only these features leave the mat, not the raw samples.
+import time
+from array import array
+import payload
+
+# Centre of pressure coordinates are per mille of the mat: -1000 at the
+# left / front edge, 1000 at the right / back edge.
+COP_SCALE = 1000
+# Zones in the pressed-zone mask (32-bit in the payload); bit 30 and up would
+# make it a big integer on the ESP32. A 2 x 15 runner still fits.
+MASK_ZONES = 30
+# Limits that keep the running sums small integers (31 bits on the ESP32):
+# the impulse saturates, and the COP sums are halved once the load weight
+# exceeds WEIGHT_MAX (|x| <= COP_SCALE keeps the coordinate sums below
+# 2^29 + one sample). Only steps of several seconds reach them.
+IMPULSE_MAX = (1 << 30) - 1
+WEIGHT_MAX = 1 << 19
+
+
+def zone_centres(rows, cols):
+    """x and y of every zone's centre in COP units (row-major)."""
+    zones = rows * cols
+    xs = array("h", [((2 * (k % cols) + 1) * COP_SCALE) // cols - COP_SCALE
+                     for k in range(zones)])
+    ys = array("h", [((2 * (k // cols) + 1) * COP_SCALE) // rows - COP_SCALE
+                     for k in range(zones)])
+    return xs, ys
+
+
+class Footstep:
+    """
+    Features of one step. A single instance is reused by the extractor, so
+    copy what you need to keep before the next step completes.
+    """
+
+    def __init__(self, max_points):
+        self.onset = 0        # ticks_ms of the first sample above the threshold
+        self.offset = 0       # ticks_ms of the first sample below the release level
+        self.duration = 0     # ms
+        self.peak = 0         # highest total load (sum of ADC values)
+        self.peak_time = 0    # ms after onset
+        self.impulse = 0      # total load integrated over time (ADC * ms)
+        self.mask = 0         # bit k set if zone k was pressed during the step
+        self.cop_x = 0        # load-weighted mean COP
+        self.cop_y = 0
+        # COP trajectory: x, y pairs, at most max_points of them
+        self.trajectory = array("h", [0] * (2 * max_points))
+        self.points = 0
+
+    def encode(self, buf, seq):
+        """Packs the step as a payload.TYPE_FOOTSTEP message into buf."""
+        return payload.encode_footstep(buf, seq, self.onset, self.mask,
+                                       min(self.peak, 0xFFFF),
+                                       min(self.duration, 0xFFFF), self.impulse,
+                                       self.cop_x, self.cop_y)
+
+
+class FootstepExtractor:
+    """
+    Consumes samples from a SampleRing (one channel per zone, row-major
+    as in FSRGrid) and detects steps with hysteresis:
+      - a step starts when any zone reaches on_threshold,
+      - it ends when every zone has dropped below off_threshold.
+    Readings below `floor` count as noise and are ignored for load,
+    impulse and COP. Steps shorter than min_duration_ms are discarded.
+    `baseline` holds a static load per zone (an object on the mat, see
+    routine.py) that is subtracted from every sample, so it neither keeps
+    a step going nor adds to it.
+
+    The trajectory keeps every sample until max_points are stored; then
+    every second point is dropped and only every second sample is kept
+    from there on, and so on. That compaction is rare, so the cost per
+    sample stays constant on average and the buffer never grows.
+    """
+
+    def __init__(self, ring, rows, cols, on_step=None, on_threshold=900,
+                 off_threshold=None, floor=20, min_duration_ms=50,
+                 max_points=32):
+        if rows * cols != ring.channels:
+            raise ValueError("{}x{} grid needs {} ring channels, ring has {}".format(
+                rows, cols, rows * cols, ring.channels))
+        self.ring = ring
+        self.zones = rows * cols
+        self.on_step = on_step
+        self.on_threshold = on_threshold
+        self.off_threshold = on_threshold // 2 if off_threshold is None else off_threshold
+        self.floor = floor
+        self.min_duration_ms = min_duration_ms
+        self.max_points = max_points
+        self._x, self._y = zone_centres(rows, cols)
+        self.baseline = array("H", [0] * self.zones)
+        self.step = Footstep(max_points)
+        self.active = False
+        self.cursor = ring.written
+        self.steps = 0       # steps reported
+        self.rejected = 0    # steps shorter than min_duration_ms
+        self.dropped = 0     # samples lost to ring overruns
+        self._last = 0       # timestamp of the previous sample
+        self._wx = 0         # load-weighted COP sums over the step
+        self._wy = 0
+        self._w = 0
+        self._stride = 1     # trajectory keeps every _stride-th sample
+        self._skip = 0
+
+    def poll(self):
+        """
+        Processes every sample pushed since the last call.
+        Returns the number of steps completed.
+        """
+        ring = self.ring
+        if ring.available(self.cursor) > ring.capacity:
+            oldest = ring.oldest()
+            self.dropped += oldest - self.cursor
+            self.cursor = oldest
+            self.active = False  # the step is incomplete
+        done = 0
+        values = ring.values
+        zones = self.zones
+        while self.cursor < ring.written:
+            base = ring.slot(self.cursor) * zones
+            if self.update(ring.timestamp(self.cursor), values, base):
+                done += 1
+            self.cursor += 1
+        return done
+
+    def update(self, timestamp, values, base=0):
+        """
+        Adds one sample (values[base:base + zones]). Returns True if it
+        completed a step.
+        """
+        zones = self.zones
+        baseline = self.baseline
+        highest = 0
+        for k in range(zones):
+            v = values[base + k] - baseline[k]
+            if v > highest:
+                highest = v
+
+        if not self.active:
+            if highest < self.on_threshold:
+                return False
+            self._start(timestamp)
+        elif highest < self.off_threshold:
+            return self._finish(timestamp)
+
+        step = self.step
+        floor = self.floor
+        load = 0
+        sx = 0
+        sy = 0
+        xs = self._x
+        ys = self._y
+        for k in range(zones):
+            v = values[base + k] - baseline[k]
+            if v >= floor:
+                load += v
+                sx += v * xs[k]
+                sy += v * ys[k]
+                if v >= self.on_threshold and k < MASK_ZONES:
+                    step.mask |= 1 << k
+
+        dt = time.ticks_diff(timestamp, self._last)
+        self._last = timestamp
+        if load > step.peak:
+            step.peak = load
+            step.peak_time = time.ticks_diff(timestamp, step.onset)
+        if load:
+            if dt < (IMPULSE_MAX - step.impulse) // load:
+                step.impulse += load * dt
+            else:
+                step.impulse = IMPULSE_MAX
+            self._wx += sx
+            self._wy += sy
+            self._w += load
+            if self._w > WEIGHT_MAX:
+                # Halving keeps the mean; later samples weigh a little more
+                self._wx >>= 1
+                self._wy >>= 1
+                self._w >>= 1
+            self._add_point(sx // load, sy // load)
+        return False
+
+    def _start(self, timestamp):
+        step = self.step
+        step.onset = timestamp
+        step.offset = 0
+        step.duration = 0
+        step.peak = 0
+        step.peak_time = 0
+        step.impulse = 0
+        step.mask = 0
+        step.points = 0
+        self._last = timestamp
+        self._wx = self._wy = self._w = 0
+        self._stride = 1
+        self._skip = 0
+        self.active = True
+
+    def _finish(self, timestamp):
+        self.active = False
+        step = self.step
+        step.offset = timestamp
+        step.duration = time.ticks_diff(timestamp, step.onset)
+        if step.duration < self.min_duration_ms:
+            self.rejected += 1
+            return False
+        if self._w:
+            step.cop_x = self._wx // self._w
+            step.cop_y = self._wy // self._w
+        else:
+            step.cop_x = step.cop_y = 0
+        self.steps += 1
+        if self.on_step:
+            self.on_step(step)
+        return True
+
+    def _add_point(self, x, y):
+        if self._skip:
+            self._skip -= 1
+            return
+        step = self.step
+        traj = step.trajectory
+        if step.points == self.max_points:
+            # Keep every second point and halve the sampling rate
+            half = step.points // 2
+            for i in range(half):
+                traj[2 * i] = traj[4 * i]
+                traj[2 * i + 1] = traj[4 * i + 1]
+            step.points = half
+            self._stride *= 2
+        i = 2 * step.points
+        traj[i] = x
+        traj[i + 1] = y
+        step.points += 1
+        self._skip = self._stride - 1
@@ -0,0 +1,113 @@
+# fsr_grid.py
+# Pressure sensor (FSR) grids read through one or more MCP3008 ADCs.
+#
+# A layout table maps every zone of an NxM grid to (chip, channel); chip is
+# the index into the list of chip-select pins, one MCP3008 per pin on a
+# shared SPI bus. The MCP3008 has no daisy-chain mode, so several chips are
+# always addressed through their own CS line.
+#
+# All SPI buffers are allocated once: scan() does one 3 byte transfer per
+# zone through preallocated memoryviews, so its time grows linearly with
+# the number of zones and it allocates nothing.
+from array import array
+
+# The doormat: four FSRs in a 2x2 matrix on channels 0-3 of one MCP3008
+LAYOUT_2X2 = (
+    ((0, 0), (0, 1)),
+    ((0, 2), (0, 3)),
+)
+
+# LED colour per zone of the doormat (row-major). A zone lights its colour
+# when pressed; several pressed zones mix.
+COLORS_2X2 = ((255, 0, 0), (0, 255, 0), (0, 0, 255), (255, 255, 0))
+
+
+def runner_layout(length):
+    """
+    Layout for a hallway runner: 2 rows x `length` columns, wired channel
+    by channel across as many MCP3008s (8 channels each) as needed.
+    """
+    rows = ([], [])
+    for i in range(2 * length):
+        rows[i % 2].append((i // 8, i % 8))
+    return tuple(tuple(r) for r in rows)
+
+
+class FSRGrid:
+
+    def __init__(self, spi, cs_pins, layout, colors=None):
+        self.spi = spi
+        self.cs_pins = cs_pins
+        self.rows = len(layout)
+        self.cols = len(layout[0])
+        self.zones = self.rows * self.cols
+        self.values = array("H", [0] * self.zones)  # row-major, 10-bit
+        self.colors = colors
+        self._color = [0, 0, 0]
+
+        for pin in cs_pins:
+            pin.value(1)  # Deselect every MCP3008
+
+        n = self.zones
+        self._tx = bytearray(3 * n)
+        self._rx = bytearray(3 * n)
+        tx = memoryview(self._tx)
+        rx = memoryview(self._rx)
+        self._transfers = []
+        for i, row in enumerate(layout):
+            if len(row) != self.cols:
+                raise ValueError("Row {} has {} zones, expected {}".format(i, len(row), self.cols))
+            for chip, channel in row:
+                if not 0 <= chip < len(cs_pins):
+                    raise ValueError("No CS pin for chip {}".format(chip))
+                if not 0 <= channel < 8:
+                    raise ValueError("MCP3008 channel must be 0-7, got {}".format(channel))
+                k = len(self._transfers)
+                self._tx[3 * k] = 0x01  # Start bit
+                self._tx[3 * k + 1] = (0x08 + channel) << 4  # Single-ended + channel
+                self._transfers.append((cs_pins[chip], tx[3 * k:3 * k + 3], rx[3 * k:3 * k + 3]))
+        self._transfers = tuple(self._transfers)
+
+    def scan(self):
+        """Reads every zone into `values` and returns it."""
+        spi = self.spi
+        for cs, tx, rx in self._transfers:
+            cs.value(0)
+            spi.write_readinto(tx, rx)
+            cs.value(1)
+        rx = self._rx
+        values = self.values
+        for k in range(self.zones):
+            values[k] = ((rx[3 * k + 1] & 0x03) << 8) | rx[3 * k + 2]
+        return values
+
+    def value(self, row, col):
+        return self.values[row * self.cols + col]
+
+    def pressed_mask(self, threshold):
+        """Bit k is set if zone k (row-major) is at or above threshold."""
+        mask = 0
+        values = self.values
+        for k in range(self.zones):
+            if values[k] >= threshold:
+                mask |= 1 << k
+        return mask
+
+    def color(self, threshold):
+        """Mixed LED colour [r, g, b] of the pressed zones (reused list)."""
+        return mix_colors(self.values, self.colors, threshold, self._color)
+
+
+def mix_colors(values, colors, threshold, out):
+    """
+    Mixes the colours of all zones at or above threshold into out [r, g, b]
+    and returns it.
+    """
+    out[0] = out[1] = out[2] = 0
+    for k in range(len(colors)):
+        if values[k] >= threshold:
+            zr, zg, zb = colors[k]
+            out[0] |= zr
+            out[1] |= zg
+            out[2] |= zb
+    return out
@@ -0,0 +1,144 @@
+# governor.py
+# Sampling tiers of the mat: idle, armed and active.
+#
+# The loop period, the display page period and the BME280 period follow
+# what is happening at the door:
+#   idle    nobody there: slow sampling, the board sleeps in between
+#   armed   the PIR sees motion: sampling fast enough to catch the first step
+#   active  load on the mat: full rate for the footstep features, display
+#           pages and BME280 reads deferred so they take no time from it
+# The PIR and the pressure samples move the governor up at once; it steps
+# down one tier after hold times without motion or load. The PIR's
+# scheduled callback (wake) also ends a wait() early, so a tier change
+# takes effect within WAIT_SLICE ms instead of after the old period.
+#
+# Deciding costs a few integer operations per sample and allocates nothing.
+# report() gives the time spent in each tier, e.g. for MQTT.
+try:
+    import ujson as json
+except ImportError:
+    import json
+from array import array
+import time
+
+TIER_IDLE = 0
+TIER_ARMED = 1
+TIER_ACTIVE = 2
+TIER_NAMES = ("idle", "armed", "active")
+
+# Per tier: ms between samples, ms between display pages, ms between
+# BME280 reads (0: the configured display_period / env_period)
+TIERS = (
+    (1000, 0, 60000),
+    (100, 0, 0),
+    (20, 10000, 30000),
+)
+
+FLOOR = 20              # ADC readings below this are noise
+ENERGY_SHIFT = 3        # Load average over about 2**3 samples
+ACTIVE_HOLD = 1000      # ms at full rate after the load has gone
+WAIT_SLICE = 5          # ms; wait() notices a PIR wake-up this fast
+
+
+class Governor:
+    """
+    threshold:   ADC value of a pressed zone (config threshold); a sample
+                 with this much total load makes the mat active
+    hold_ms:     ms without motion or load before armed drops to idle
+                 (config active_timeout)
+    on_change:   on_change(tier), called after every transition
+    """
+
+    def __init__(self, now, threshold=900, hold_ms=10000, on_change=None):
+        self.threshold = threshold
+        self.hold_ms = hold_ms
+        self.on_change = on_change
+        self.tier = TIER_ARMED  # Until the hold time has shown nobody is there
+        self.energy = 0         # Moving average of the total load
+        self.motion_level = 0
+        self.last_motion = now
+        self.last_load = now
+        self.transitions = 0
+        self.switch_ms = 0      # Longest delay from a PIR edge to its tier change
+        self.time_in = array("I", [0, 0, 0])  # ms spent per tier, up to `entered`
+        self.entered = now
+        self.woken = False      # Set by the PIR callback, ends wait()
+
+    def period(self):
+        """ms between samples in the current tier."""
+        return TIERS[self.tier][0]
+
+    def wake(self, level):
+        """PIR callback (scheduled from the interrupt): end the current wait."""
+        if level:
+            self.woken = True
+
+    def motion(self, at, level):
+        """A PIR edge, timestamped at `at`. Motion arms the mat at once."""
+        self.motion_level = level
+        self.last_motion = at
+        if level and self.tier == TIER_IDLE:
+            now = time.ticks_ms()
+            self._enter(now, TIER_ARMED)
+            delay = time.ticks_diff(now, at)
+            if delay > self.switch_ms:
+                self.switch_ms = delay
+
+    def sample(self, now, values, static=0):
+        """
+        One pressure scan. Load on the mat makes it active at once; `static`
+        is load that does not count, e.g. an object left on the mat
+        (routine.py object_total).
+        """
+        load = -static
+        for i in range(len(values)):
+            v = values[i]
+            if v >= FLOOR:
+                load += v
+        if load < 0:
+            load = 0
+        self.energy += (load - self.energy) >> ENERGY_SHIFT
+        if load >= self.threshold or self.energy >= self.threshold >> 2:
+            self.last_load = now
+            if self.tier != TIER_ACTIVE:
+                self._enter(now, TIER_ACTIVE)
+
+    def update(self, now):
+        """Once per loop: steps down after the hold times."""
+        tier = self.tier
+        if tier == TIER_ACTIVE:
+            if time.ticks_diff(now, self.last_load) >= ACTIVE_HOLD:
+                self._enter(now, TIER_ARMED)
+        elif tier == TIER_ARMED:
+            if not self.motion_level \
+                    and time.ticks_diff(now, self.last_motion) >= self.hold_ms \
+                    and time.ticks_diff(now, self.last_load) >= self.hold_ms:
+                self._enter(now, TIER_IDLE)
+        return self.tier
+
+    def wait(self, ms):
+        """Sleeps up to ms; returns early when the PIR wakes the governor."""
+        self.woken = False
+        end = time.ticks_add(time.ticks_ms(), ms)
+        while not self.woken:
+            left = time.ticks_diff(end, time.ticks_ms())
+            if left <= 0:
+                return
+            time.sleep_ms(WAIT_SLICE if left > WAIT_SLICE else left)
+
+    def _enter(self, now, tier):
+        self.time_in[self.tier] += time.ticks_diff(now, self.entered)
+        self.entered = now
+        self.tier = tier
+        self.transitions += 1
+        if self.on_change:
+            self.on_change(tier)
+
+    def report(self, now):
+        """JSON text: current tier, ms per tier, transitions, slowest PIR switch."""
+        spent = {}
+        for tier in range(len(TIERS)):
+            spent[TIER_NAMES[tier]] = self.time_in[tier]
+        spent[TIER_NAMES[self.tier]] += time.ticks_diff(now, self.entered)
+        return json.dumps({"tier": TIER_NAMES[self.tier], "time_ms": spent,
+                           "transitions": self.transitions, "switch_ms": self.switch_ms})
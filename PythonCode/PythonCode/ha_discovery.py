@@ -0,0 +1,82 @@
+# ha_discovery.py
+# Home Assistant MQTT discovery for the Smart Carpet.
+#
+# Home Assistant learns the mat's entities from retained config messages
+# published once after connecting. Availability uses a birth message
+# ("online", retained) and a last will ("offline", retained) on the status
+# topic, so no periodic heartbeat is needed.
+try:
+    import ujson as json
+except ImportError:
+    import json
+
+DISCOVERY_PREFIX = "homeassistant"
+PAYLOAD_ONLINE = b"online"
+PAYLOAD_OFFLINE = b"offline"
+
+# object id, name, device class, unit, key in the JSON state
+SENSORS = (
+    ("temperature", "Temperature", "temperature", "°C", "temperature"),
+    ("humidity", "Humidity", "humidity", "%", "humidity"),
+    ("pressure", "Pressure", "atmospheric_pressure", "hPa", "pressure"),
+)
+
+
+def last_will(status_topic):
+    """(topic, message) to register with client.set_last_will() before connect."""
+    return status_topic, PAYLOAD_OFFLINE
+
+
+def _device(device_id):
+    return {
+        "identifiers": [device_id],
+        "name": "Smart Carpet",
+        "model": "ESP32-C6 Smart Carpet",
+        "manufacturer": "Sketching with Hardware",
+    }
+
+
+def discovery_configs(device_id, state_topic, status_topic):
+    """
+    Yields (config topic, config payload) for every entity of the mat.
+    The sensors read the JSON state published on state_topic.
+    """
+    state = state_topic.decode() if isinstance(state_topic, bytes) else state_topic
+    status = status_topic.decode() if isinstance(status_topic, bytes) else status_topic
+    device = _device(device_id)
+    for object_id, name, device_class, unit, key in SENSORS:
+        config = {
+            "name": name,
+            "unique_id": "{}_{}".format(device_id, object_id),
+            "state_topic": state,
+            "value_template": "{{{{ value_json.{} }}}}".format(key),
+            "device_class": device_class,
+            "unit_of_measurement": unit,
+            "state_class": "measurement",
+            "availability_topic": status,
+            "device": device,
+        }
+        topic = "{}/sensor/{}/{}/config".format(DISCOVERY_PREFIX, device_id, object_id)
+        yield topic.encode(), json.dumps(config).encode()
+
+    config = {
+        "name": "Connectivity",
+        "unique_id": "{}_connectivity".format(device_id),
+        "state_topic": status,
+        "payload_on": PAYLOAD_ONLINE.decode(),
+        "payload_off": PAYLOAD_OFFLINE.decode(),
+        "device_class": "connectivity",
+        "device": device,
+    }
+    topic = "{}/binary_sensor/{}/connectivity/config".format(DISCOVERY_PREFIX, device_id)
+    yield topic.encode(), json.dumps(config).encode()
+
+
+def announce(client, device_id, state_topic, status_topic):
+    """
+    Publishes the retained discovery configs and the retained birth message.
+    Call once after every (re)connect.
+    """
+    for topic, config in discovery_configs(device_id, state_topic, status_topic):
+        client.publish(topic, config, retain=True)
+    client.publish(status_topic, PAYLOAD_ONLINE, retain=True)
@@ -0,0 +1,143 @@
+# i2c_arbiter.py
+# Shared I2C bus arbiter for the BME280 and the SH1106 display.
+#
+# Both devices sit on the same machine.I2C(0) at 400 kHz. A full display
+# frame (8 pages of 128 bytes) keeps the bus busy for ~25 ms. The arbiter
+#   - hands every driver an ArbitratedI2C stand-in for machine.I2C, which
+#     runs short transactions (sensor reads) at once and measures them,
+#   - queues long jobs (display refreshes) and runs them one step (one
+#     page) at a time from service(), highest priority first, within a
+#     time budget, so sensor reads always get the bus between pages,
+#   - keeps per-device bus time statistics.
+import time
+
+PRIORITY_SENSOR = 0
+PRIORITY_DISPLAY = 1
+PRIORITY_LOW = 2
+_PRIORITIES = 3
+
+
+class ArbitratedI2C:
+    """
+    Drop-in for machine.I2C used by one driver. Every transaction is
+    timed and counted for that device.
+    """
+
+    def __init__(self, arbiter, name, priority):
+        self.arbiter = arbiter
+        self.name = name
+        self.priority = priority
+        self.i2c = arbiter.i2c
+        self.calls = 0
+        self.bytes = 0
+        self.bus_us = 0
+        self.max_us = 0
+
+    def _account(self, start, nbytes):
+        elapsed = time.ticks_diff(time.ticks_us(), start)
+        self.calls += 1
+        self.bytes += nbytes
+        self.bus_us += elapsed
+        if elapsed > self.max_us:
+            self.max_us = elapsed
+
+    def scan(self):
+        return self.i2c.scan()
+
+    def readfrom_mem(self, addr, memaddr, nbytes):
+        start = time.ticks_us()
+        data = self.i2c.readfrom_mem(addr, memaddr, nbytes)
+        self._account(start, nbytes)
+        return data
+
+    def readfrom_mem_into(self, addr, memaddr, buf):
+        start = time.ticks_us()
+        self.i2c.readfrom_mem_into(addr, memaddr, buf)
+        self._account(start, len(buf))
+
+    def writeto_mem(self, addr, memaddr, buf):
+        start = time.ticks_us()
+        self.i2c.writeto_mem(addr, memaddr, buf)
+        self._account(start, len(buf))
+
+    def readfrom_into(self, addr, buf):
+        start = time.ticks_us()
+        self.i2c.readfrom_into(addr, buf)
+        self._account(start, len(buf))
+
+    def writeto(self, addr, buf):
+        start = time.ticks_us()
+        n = self.i2c.writeto(addr, buf)
+        self._account(start, len(buf))
+        return n
+
+    def writevto(self, addr, vector):
+        start = time.ticks_us()
+        n = self.i2c.writevto(addr, vector)
+        nbytes = 0
+        for buf in vector:
+            nbytes += len(buf)
+        self._account(start, nbytes)
+        return n
+
+
+class I2CArbiter:
+
+    def __init__(self, i2c):
+        self.i2c = i2c
+        self.devices = []
+        self._queues = [[] for _ in range(_PRIORITIES)]
+        self.steps = 0      # job steps executed
+        self.deferred = 0   # service() calls that ran out of budget
+
+    def device(self, name, priority=PRIORITY_SENSOR):
+        """Returns the I2C stand-in to pass to a driver."""
+        dev = ArbitratedI2C(self, name, priority)
+        self.devices.append(dev)
+        return dev
+
+    def submit(self, step, priority=PRIORITY_DISPLAY):
+        """
+        Queues a job. `step` is called repeatedly from service() and does
+        one bounded piece of bus work per call, returning True while more
+        work remains (e.g. SH1106.show_step). A job already queued is not
+        added twice.
+        """
+        queue = self._queues[priority]
+        if step not in queue:
+            queue.append(step)
+
+    def pending(self):
+        for queue in self._queues:
+            if queue:
+                return True
+        return False
+
+    def service(self, budget_us=None):
+        """
+        Runs queued job steps, highest priority first, until the queues are
+        empty or budget_us has been used. A step is only started while
+        budget remains, so one step may overrun it.
+        Returns True if work is still pending.
+        """
+        start = time.ticks_us()
+        for queue in self._queues:
+            while queue:
+                if budget_us is not None and \
+                        time.ticks_diff(time.ticks_us(), start) >= budget_us:
+                    self.deferred += 1
+                    return True
+                step = queue[0]
+                self.steps += 1
+                if not step():
+                    queue.pop(0)
+        return False
+
+    def stats(self):
+        """{device name: (calls, bytes, bus time us, longest transaction us)}"""
+        return {d.name: (d.calls, d.bytes, d.bus_us, d.max_us) for d in self.devices}
+
+    def reset_stats(self):
+        for d in self.devices:
+            d.calls = d.bytes = d.bus_us = d.max_us = 0
+        self.steps = self.deferred = 0
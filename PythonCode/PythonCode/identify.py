@@ -0,0 +1,175 @@
+# identify.py
+# User identification from footstep features: a nearest-centroid model.
+#
+# The model is trained on the Raspberry Pi (identify_train.py) and stored
+# in a small binary file that the mat loads into arrays once. Classifying
+# a step quantises its features to int16 and compares them with every
+# user's centroid: bounded time (users x features) and no allocation.
+#
+# Model file, little-endian:
+#   magic "IDM1" | features (B) | users (B) | shift (B) | pad (B) | reject (I)
+#   offsets (i * features) | scales (i * features)
+#   centroids (h * users * features) | user names, utf-8, "\n" separated
+try:
+    from ustruct import pack, unpack_from
+except ImportError:
+    from struct import pack, unpack_from
+from array import array
+
+MAGIC = b"IDM1"
+_HEADER = "<4sBBBxI"
+_HEADER_SIZE = 12
+
+# Feature vector of one step, see features()
+FEATURES = ("duration", "peak", "peak_time", "impulse", "cop_x", "cop_y",
+            "start_x", "start_y", "end_x", "end_y")
+N_FEATURES = len(FEATURES)
+IMPULSE_SHIFT = 8  # impulse is used in units of 256 ADC * ms
+
+# Quantisation: z = (x - offset) * scale >> SHIFT, one standard deviation
+# of a feature maps to Q. Quantised values are clamped to +-Q_MAX so that
+# squared distances stay small integers on the ESP32. An x - offset outside
+# the range that gives a z within +-Q_MAX is clamped before multiplying, so
+# the product never becomes a big integer (an allocation) either.
+SHIFT = 12
+Q = 32
+Q_MAX = 2047
+
+UNKNOWN = -1
+
+
+def features(step, out):
+    """
+    Fills out (N_FEATURES values) with the features of a footstep.Footstep
+    and returns it. start / end are the first and last point of the centre
+    of pressure trajectory, i.e. the direction the foot rolls.
+    """
+    out[0] = step.duration
+    out[1] = step.peak
+    out[2] = step.peak_time
+    out[3] = step.impulse >> IMPULSE_SHIFT
+    out[4] = step.cop_x
+    out[5] = step.cop_y
+    if step.points:
+        traj = step.trajectory
+        last = 2 * step.points - 2
+        out[6] = traj[0]
+        out[7] = traj[1]
+        out[8] = traj[last]
+        out[9] = traj[last + 1]
+    else:
+        out[6] = out[8] = step.cop_x
+        out[7] = out[9] = step.cop_y
+    return out
+
+
+class Model:
+    """
+    Nearest-centroid classifier on quantised features.
+
+    names: user names; offsets / scales: per feature quantisation;
+    centroids: users x features quantised centroids (row-major);
+    reject: squared distance above which a step is UNKNOWN (0: never).
+    """
+
+    def __init__(self, names, offsets, scales, centroids, reject=0, shift=SHIFT):
+        self.names = list(names)
+        self.users = len(self.names)
+        self.n_features = len(offsets)
+        if len(scales) != self.n_features or len(centroids) != self.users * self.n_features:
+            raise ValueError("Model arrays do not match {} users x {} features".format(
+                self.users, self.n_features))
+        if any(scale < 0 for scale in scales):
+            raise ValueError("Model scales must not be negative")
+        self.offsets = array("i", offsets)
+        self.scales = array("i", scales)
+        self.centroids = array("h", centroids)
+        self.reject = reject
+        self.shift = shift
+        # Largest |x - offset| per feature whose z is within +-Q_MAX
+        self.limits = array("i", [(Q_MAX << shift) // scale if scale else 0x3FFFFFFF
+                                  for scale in self.scales])
+        self._q = array("i", [0] * self.n_features)
+        self.distance = -1         # Of the last classify()
+
+    def quantise(self, x, out=None):
+        """Quantised feature vector of x (into out, default: internal buffer)."""
+        if out is None:
+            out = self._q
+        offsets = self.offsets
+        scales = self.scales
+        limits = self.limits
+        shift = self.shift
+        for i in range(self.n_features):
+            d = x[i] - offsets[i]
+            limit = limits[i]
+            if d > limit:
+                out[i] = Q_MAX
+            elif d < -limit:
+                out[i] = -Q_MAX
+            else:
+                out[i] = (d * scales[i]) >> shift
+        return out
+
+    def classify(self, x):
+        """
+        Returns the user index or UNKNOWN for the raw feature vector x. The
+        squared distance to the nearest centroid is left in self.distance.
+        """
+        q = self.quantise(x)
+        centroids = self.centroids
+        n = self.n_features
+        best = UNKNOWN
+        best_dist = -1
+        for u in range(self.users):
+            base = u * n
+            dist = 0
+            for i in range(n):
+                d = q[i] - centroids[base + i]
+                dist += d * d
+            if best < 0 or dist < best_dist:
+                best = u
+                best_dist = dist
+        self.distance = best_dist
+        if self.reject and best_dist > self.reject:
+            return UNKNOWN
+        return best
+
+    def name(self, index):
+        return "unknown" if index == UNKNOWN else self.names[index]
+
+    def to_bytes(self):
+        n = self.n_features
+        return (pack(_HEADER, MAGIC, n, self.users, self.shift, self.reject) +
+                pack("<{}i".format(n), *self.offsets) +
+                pack("<{}i".format(n), *self.scales) +
+                pack("<{}h".format(self.users * n), *self.centroids) +
+                "\n".join(self.names).encode())
+
+
+def from_bytes(data):
+    """Parses a model file. Raises ValueError if it is not one."""
+    if len(data) < _HEADER_SIZE:
+        raise ValueError("Model file too short")
+    magic, n, users, shift, reject = unpack_from(_HEADER, data, 0)
+    if magic != MAGIC:
+        raise ValueError("Not an identification model")
+    pos = _HEADER_SIZE
+    offsets = unpack_from("<{}i".format(n), data, pos)
+    pos += 4 * n
+    scales = unpack_from("<{}i".format(n), data, pos)
+    pos += 4 * n
+    centroids = unpack_from("<{}h".format(users * n), data, pos)
+    pos += 2 * users * n
+    names = bytes(data[pos:]).decode().split("\n") if users else []
+    return Model(names, offsets, scales, centroids, reject, shift)
+
+
+def load(path):
+    with open(path, "rb") as f:
+        return from_bytes(f.read())
+
+
+def save(path, model):
+    with open(path, "wb") as f:
+        f.write(model.to_bytes())
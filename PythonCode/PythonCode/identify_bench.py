@@ -0,0 +1,114 @@
+# identify_bench.py
+# Accuracy and latency benchmark for the identification model.
+#
+# Runs unchanged on the Raspberry Pi (CPython) and on the mat (MicroPython),
+# so the numbers of both sides are comparable:
+#   Pi:  python3 identify_bench.py users.idm test_features.csv
+#   Mat: import identify_bench; identify_bench.run("users.idm", "test_features.csv")
+#
+# Feature files are CSV with a header line "user,duration,peak,...", one
+# labelled step per line (see identify.FEATURES).
+import time
+import identify
+
+try:
+    _ticks_us = time.ticks_us
+    _ticks_diff = time.ticks_diff
+except AttributeError:
+    def _ticks_us():
+        return time.perf_counter_ns() // 1000
+
+    def _ticks_diff(a, b):
+        return a - b
+
+
+def load_rows(path):
+    """Reads a feature CSV. Returns (labels, rows)."""
+    labels = []
+    rows = []
+    with open(path) as f:
+        header = f.readline().strip().split(",")
+        if header[1:] != list(identify.FEATURES):
+            raise ValueError("{}: expected columns user,{}".format(
+                path, ",".join(identify.FEATURES)))
+        for line in f:
+            parts = line.strip().split(",")
+            if len(parts) != identify.N_FEATURES + 1:
+                continue
+            labels.append(parts[0])
+            rows.append([int(v) for v in parts[1:]])
+    return labels, rows
+
+
+def write_rows(path, labels, rows):
+    with open(path, "w") as f:
+        f.write("user,{}\n".format(",".join(identify.FEATURES)))
+        for label, row in zip(labels, rows):
+            f.write("{},{}\n".format(label, ",".join(str(v) for v in row)))
+
+
+def evaluate(model, labels, rows):
+    """
+    Classifies every row. Returns a dict with accuracy, the share of steps
+    rejected as unknown, per-user accuracy and the latency per step (us).
+    Users the model does not know count as correct when rejected.
+    """
+    correct = 0
+    unknown = 0
+    per_user = {}
+    total_us = 0
+    max_us = 0
+    for label, row in zip(labels, rows):
+        start = _ticks_us()
+        index = model.classify(row)
+        elapsed = _ticks_diff(_ticks_us(), start)
+        total_us += elapsed
+        if elapsed > max_us:
+            max_us = elapsed
+        predicted = model.name(index)
+        if index == identify.UNKNOWN:
+            unknown += 1
+        hit = predicted == label or (index == identify.UNKNOWN and label not in model.names)
+        stats = per_user.setdefault(label, [0, 0])
+        stats[1] += 1
+        if hit:
+            correct += 1
+            stats[0] += 1
+    n = len(rows)
+    return {
+        "steps": n,
+        "accuracy": correct / n if n else 0,
+        "unknown": unknown / n if n else 0,
+        "per_user": {u: s[0] / s[1] for u, s in per_user.items()},
+        "mean_us": total_us / n if n else 0,
+        "max_us": max_us,
+    }
+
+
+def report(result):
+    print("steps: {}  accuracy: {:.1f}%  rejected as unknown: {:.1f}%".format(
+        result["steps"], 100 * result["accuracy"], 100 * result["unknown"]))
+    for user in sorted(result["per_user"]):
+        print("  {:<16} {:.1f}%".format(user, 100 * result["per_user"][user]))
+    print("latency per step: mean {:.0f} us, max {} us".format(
+        result["mean_us"], result["max_us"]))
+
+
+def run(model_path, features_path):
+    model = identify.load(model_path)
+    labels, rows = load_rows(features_path)
+    result = evaluate(model, labels, rows)
+    report(result)
+    return result
+
+
+def main():
+    import sys
+    if len(sys.argv) != 3:
+        print("usage: identify_bench.py MODEL FEATURES_CSV")
+        sys.exit(2)
+    run(sys.argv[1], sys.argv[2])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+# identify_train.py
+# Runs on the Raspberry Pi: trains the user identification model.
+#
+# Input is labelled steps, either
+#   - raw traces recorded with trace_receiver.py, sorted into one
+#     directory per user (traces/<user>/*.csv); the steps are extracted
+#     with the same footstep.py code the mat runs, or
+#   - feature CSV files as read by identify_bench.load_rows().
+# The model (identify.Model) is written in the binary format the mat loads;
+# copy it to the mat as users.idm.
+#
+# Usage: python3 identify_train.py --traces traces --out users.idm --holdout 0.2
+import os
+import random
+
+import identify
+import identify_bench
+
+
+def features_from_trace(path, rows=2, cols=2, **extractor_args):
+    """Runs a trace CSV through footstep.FootstepExtractor. Returns feature rows."""
+    import sim_hal
+    sim_hal.install()  # ticks_diff for footstep.py
+    from footstep import FootstepExtractor
+    from sample_ring import SampleRing
+
+    ring = SampleRing(capacity=64, channels=rows * cols)
+    found = []
+
+    def on_step(step):
+        found.append(list(identify.features(step, [0] * identify.N_FEATURES)))
+
+    extractor = FootstepExtractor(ring, rows, cols, on_step=on_step, **extractor_args)
+    with open(path) as f:
+        f.readline()  # header
+        for line in f:
+            parts = line.strip().split(",")
+            if len(parts) != rows * cols + 1:
+                continue
+            ring.push(int(parts[0]), [int(v) for v in parts[1:]])
+            extractor.poll()
+    return found
+
+
+def load_traces(directory, rows=2, cols=2, **extractor_args):
+    """Extracts the steps of directory/<user>/*.csv. Returns (labels, rows)."""
+    labels = []
+    data = []
+    for user in sorted(os.listdir(directory)):
+        user_dir = os.path.join(directory, user)
+        if not os.path.isdir(user_dir):
+            continue
+        for name in sorted(os.listdir(user_dir)):
+            if name.endswith(".csv"):
+                steps = features_from_trace(os.path.join(user_dir, name), rows, cols,
+                                            **extractor_args)
+                labels.extend([user] * len(steps))
+                data.extend(steps)
+    return labels, data
+
+
+def train(labels, rows, reject_quantile=0.99, reject_margin=1.5):
+    """
+    Fits a nearest-centroid model. Features are standardised with the
+    mean and standard deviation over all steps; each user's centroid is
+    the mean of their quantised steps. The reject distance is the given
+    quantile of the training distances to the own centroid, times a margin
+    (reject_quantile=None: never reject).
+    """
+    if not rows:
+        raise ValueError("No steps to train on")
+    n = identify.N_FEATURES
+    count = len(rows)
+    offsets = []
+    scales = []
+    for i in range(n):
+        column = [r[i] for r in rows]
+        mean = sum(column) / count
+        std = (sum((v - mean) ** 2 for v in column) / count) ** 0.5
+        offsets.append(int(round(mean)))
+        scales.append(max(1, int(round((1 << identify.SHIFT) * identify.Q / std))) if std else 0)
+
+    names = sorted(set(labels))
+    model = identify.Model(names, offsets, scales, [0] * (len(names) * n))
+    quantised = [list(model.quantise(r, [0] * n)) for r in rows]
+    centroids = []
+    for name in names:
+        members = [q for q, label in zip(quantised, labels) if label == name]
+        centroids.extend(int(round(sum(m[i] for m in members) / len(members)))
+                         for i in range(n))
+    model = identify.Model(names, offsets, scales, centroids)
+
+    if reject_quantile is not None:
+        dists = []
+        for q, label in zip(quantised, labels):
+            base = names.index(label) * n
+            dists.append(sum((q[i] - centroids[base + i]) ** 2 for i in range(n)))
+        dists.sort()
+        quantile = dists[min(len(dists) - 1, int(reject_quantile * len(dists)))]
+        model.reject = min(0xFFFFFFFF, int(quantile * reject_margin))
+    return model
+
+
+def split(labels, rows, holdout, seed=1):
+    """Deterministic random train / test split."""
+    order = list(range(len(rows)))
+    random.Random(seed).shuffle(order)
+    cut = int(len(order) * (1 - holdout))
+    pick = lambda idx: ([labels[i] for i in idx], [rows[i] for i in idx])
+    return pick(order[:cut]), pick(order[cut:])
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Train the Smart Carpet user identification model")
+    parser.add_argument("--traces", help="directory with one subdirectory of trace CSVs per user")
+    parser.add_argument("--features", nargs="*", default=[], help="labelled feature CSV files")
+    parser.add_argument("--grid", default="2x2", help="rows x cols of the mat")
+    parser.add_argument("--threshold", type=int, default=900, help="step onset level (THRESHOLD on the mat)")
+    parser.add_argument("--holdout", type=float, default=0.2, help="share of steps kept for testing")
+    parser.add_argument("--no-reject", action="store_true", help="never answer unknown")
+    parser.add_argument("--out", default="users.idm")
+    parser.add_argument("--test-out", help="write the held-out steps as a feature CSV (for the mat benchmark)")
+    args = parser.parse_args()
+
+    grid_rows, grid_cols = (int(v) for v in args.grid.split("x"))
+    labels, rows = [], []
+    if args.traces:
+        labels, rows = load_traces(args.traces, grid_rows, grid_cols,
+                                   on_threshold=args.threshold)
+    for path in args.features:
+        more_labels, more_rows = identify_bench.load_rows(path)
+        labels += more_labels
+        rows += more_rows
+    print("{} steps of {} users".format(len(rows), len(set(labels))))
+
+    (train_labels, train_rows), (test_labels, test_rows) = split(labels, rows, args.holdout)
+    model = train(train_labels, train_rows, None if args.no_reject else 0.99)
+    identify.save(args.out, model)
+    print("Model written to {} ({} bytes)".format(args.out, len(model.to_bytes())))
+
+    print("Training set:")
+    identify_bench.report(identify_bench.evaluate(model, train_labels, train_rows))
+    if test_rows:
+        print("Held-out set:")
+        identify_bench.report(identify_bench.evaluate(model, test_labels, test_rows))
+        if args.test_out:
+            identify_bench.write_rows(args.test_out, test_labels, test_rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+# manifest.py
+# MicroPython freeze manifest: builds the mat's modules into the firmware.
+#
+# Frozen modules are compiled to bytecode at build time and run from flash,
+# so the ESP32 neither parses .py files nor copies their bytecode to RAM at
+# boot. main.py and config.json stay on the file system, so configuration
+# and the entry script can change without a rebuild. See the Makefile.
+
+# ESP32 port defaults (neopixel, network, umqtt.simple, asyncio, ...)
+include("$(PORT_DIR)/boards/manifest.py")
+
+# Drivers
+module("sh1106.py")
+module("bme280.py")
+module("i2c_arbiter.py")
+module("env_sampler.py")
+module("fsr_grid.py")
+module("motion.py")
+
+# Connectivity and payloads
+module("config.py")
+module("mqtt_connection.py")
+module("ha_discovery.py")
+module("payload.py")
+module("trace_stream.py")
+module("event_log.py")
+module("recorder.py")
+
+# Application logic
+package("app")
+module("boot_stages.py")
+module("mem_policy.py")
+module("governor.py")
+module("sample_ring.py")
+module("footstep.py")
+module("routine.py")
+module("identify.py")
+module("pattern_lock.py")
+module("identify_bench.py")
+module("mat_logic.py")
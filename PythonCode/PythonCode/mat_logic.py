@@ -0,0 +1,263 @@
+# mat_logic.py
+# The decision logic of the mat's main loop, free of hardware access.
+#
+# MatLogic gets its inputs (pressure samples, PIR level, BME280 readings,
+# clock) as method arguments and acts only through an `out` object, so the
+# same code runs on the ESP32 and, fed from a recording, on the Raspberry
+# Pi or a PC (replay.py). `out` provides:
+#
+#   set_led_color(red, green, blue)
+#   beep(frequency, duration)  - duration in ms; must not block
+#   publish(topic, msg)
+#   show(message)      - show a text on the display
+#   blank()            - turn the display off
+#
+# Each of them is optional. An output missing from `out` (a feature switched
+# off in the configuration) costs no work in the loop: without
+# set_led_color no colour is mixed, without publish nothing is encoded.
+#
+# Received MQTT messages reach the logic through mqtt_connection.
+import time
+from array import array
+import bme280
+import config
+import fsr_grid
+import identify
+import mqtt_connection
+import payload
+from footstep import FootstepExtractor
+from routine import RoutineClassifier, OBJECT
+from sample_ring import SampleRing
+
+TOPIC_STATE  = config.topic("state")   # One snapshot instead of one topic per metric
+TOPIC_EVENT  = config.topic("event")   # Footstep events
+TOPIC_USER   = config.topic("user")    # Name of the user identified from a footstep
+TOPIC_MOTION = config.topic("motion")  # b"ON" / b"OFF" when the PIR level changes
+TOPIC_PATTERN = config.topic("pattern")  # Step pattern results: b"unlock", b"deny", ... (pattern_lock.py)
+TOPIC_PATTERN_ENROLL = config.topic("pattern/enroll")  # b"start" / b"clear" step patterns (pattern_command)
+TOPIC_ROUTINE = config.topic("routine")  # b"enter", b"leave", b"linger", b"object", ... (routine.py)
+
+THRESHOLD = config.DEFAULTS["threshold"]              # ADC threshold for LED control
+DISPLAY_TIMEOUT = config.DEFAULTS["display_timeout"]  # Display remains on after motion stops (in ms)
+DISPLAY_PERIOD = config.DEFAULTS["display_period"]    # ms between display pages
+BEEP_MS = 300             # Tone when a zone is pressed
+DISPLAY_PAGES = 5         # Temperature, humidity, pressure, outside temperature, transport
+
+
+# Checks what the outside Temp is and give a Hint for the User
+def process_received_temperature():
+    temp = mqtt_connection.received_temperature
+    if temp is not None:
+        if temp > 25:
+            return f"Outside Temperature: {temp}C It's sunny, take your sunglasses!"
+        elif temp < 10:
+            return f"Outside Temperature: {temp}C It's a cold day, wear a warm coat!"
+        else:
+            return f"It's {temp}C Outside, enjoy your day!"
+    else:
+        return "No temperature data received yet."
+
+
+def process_received_transport_info():
+    """Formats the next transport departure message."""
+    transport_info = mqtt_connection.received_transport_info
+
+    if transport_info is not None:
+        return "Next Bus: " + transport_info
+    else:
+        return "No transport data received yet."
+
+
+class MatLogic:
+    """
+    One instance runs the mat. Call per loop iteration, in this order:
+    environment() when the BME280 sampler has a new reading, motion(),
+    sample() with the pressure scan, then tick().
+    """
+
+    def __init__(self, out, now, rows=2, cols=2, colors=fsr_grid.COLORS_2X2,
+                 threshold=THRESHOLD, payload_format="json", user_model=None,
+                 formatter=bme280.format_values, ring_capacity=256, lock=None,
+                 display_timeout=DISPLAY_TIMEOUT, display_period=DISPLAY_PERIOD,
+                 verbose=False):
+        self.out = out
+        self.verbose = verbose  # Print every sample (allocates; debugging only)
+        self._led = getattr(out, "set_led_color", None)
+        self._beep = getattr(out, "beep", None)
+        self._publish = getattr(out, "publish", None)
+        self._show = getattr(out, "show", None)
+        self.colors = colors
+        self.zones = rows * cols
+        self.threshold = threshold
+        self.payload_format = payload_format
+        self.display_timeout = display_timeout
+        self.display_period = display_period
+        self.user_model = user_model
+        self.lock = lock  # pattern_lock.PatternLock, steps are checked against the enrolled patterns
+        self.formatter = formatter  # (t, p, h) -> display strings, e.g. bme.formatted
+
+        # Raw pressure samples, shared with the trace streamer
+        self.ring = SampleRing(capacity=ring_capacity, channels=self.zones)
+        # Footsteps are detected from the sample ring; a step starts when a zone reaches threshold
+        self.footsteps = FootstepExtractor(self.ring, rows, cols, on_step=self._on_step,
+                                           on_threshold=threshold)
+        # Entering, leaving, lingering and objects left on the mat, from the same samples and
+        # steps; an object's load is taken out of the footstep extractor's samples (baseline)
+        self.routines = RoutineClassifier(rows, cols, on_event=self._on_routine,
+                                          baseline=self.footsteps.baseline)
+        self.step_features = [0] * identify.N_FEATURES
+        self.payload_buf = bytearray(max(payload.SNAPSHOT_SIZE, payload.FOOTSTEP_SIZE))
+        self.payload_seq = 0
+        self._color = [0, 0, 0]
+        self._pressed = 0  # Bit k set while zone k is pressed (released below threshold / 2)
+
+        self.env = array("i", [0, 0, 0])  # Latest BME280 temperature, pressure, humidity
+        self.display_state = 0  # 0: Temperature, 1: Humidity, 2: Pressure, 3: Outside, 4: Transport
+        self.last_display_update = now
+        self.last_motion_time = 0  # Timestamp of the last motion event
+        self.motion_level = 0
+        self.display_blank = True  # Display has been cleared and needs no further refresh
+
+    def apply_config(self, cfg, changed=None):
+        """Takes over the runtime settings of a config.Config (hot reload)."""
+        self.threshold = cfg.threshold
+        self.footsteps.on_threshold = cfg.threshold
+        self.footsteps.off_threshold = cfg.threshold // 2
+        self.payload_format = cfg.payload_format
+        self.display_timeout = cfg.display_timeout
+        self.display_period = cfg.display_period
+
+    def environment(self, now, data):
+        """A new BME280 reading: keep it and publish one snapshot."""
+        env = self.env
+        env[0] = data[0]
+        env[1] = data[1]
+        env[2] = data[2]
+        print("BME280 Values:", *self.formatter(env[0], env[1], env[2]))
+        if not self._publish:
+            return
+        self.payload_seq = (self.payload_seq + 1) & 0xFFFF
+        if self.payload_format == "binary":
+            size = payload.encode_snapshot(self.payload_buf, self.payload_seq, now, *env)
+            self._publish(TOPIC_STATE, memoryview(self.payload_buf)[:size])
+        else:
+            self._publish(TOPIC_STATE, payload.snapshot_json(*env))
+
+    def motion(self, now, level):
+        """
+        PIR level; 1 means motion. Called for every edge (motion.py) or, from
+        older recordings, once per loop. Changes are published.
+        """
+        if level == 1 or self.motion_level == 1:
+            self.last_motion_time = now  # Motion lasts until the falling edge
+            self.routines.motion(now, level)
+        if level != self.motion_level:
+            self.motion_level = level
+            if level:
+                print("Motion detected!")
+            if self._publish:
+                self._publish(TOPIC_MOTION, b"ON" if level else b"OFF")
+
+    def sample(self, now, values):
+        """One scan of all pressure zones. Allocates nothing unless verbose."""
+        if self.verbose:
+            print("ADC Values:", *values)
+        self.ring.push(now, values)
+
+        # Calculate LED color based on the pressed zones
+        if self._led:
+            color = fsr_grid.mix_colors(values, self.colors, self.threshold, self._color)
+            self._led(color[0], color[1], color[2])
+
+        # Play a unique sound for each zone when it becomes pressed
+        if self._beep:
+            pressed = self._pressed
+            release = self.threshold >> 1
+            for zone in range(self.zones):
+                bit = 1 << zone
+                v = values[zone]
+                if v >= self.threshold:
+                    if not pressed & bit:
+                        pressed |= bit
+                        self._beep(1000 + 200 * zone, BEEP_MS)  # Sound for this zone
+                elif v < release:
+                    pressed &= ~bit
+            self._pressed = pressed
+
+        # Update the step features with the new sample; finished steps are published
+        self.footsteps.poll()
+        self.routines.sample(now, values)
+
+    def tick(self, now):
+        """Routine events and display handling, once per loop."""
+        self.routines.tick(now)
+        if not self._show:
+            return
+        # Check if the display should remain on (i.e. motion now or within the last 10 seconds)
+        if self.motion_level or time.ticks_diff(now, self.last_motion_time) < self.display_timeout:
+            if time.ticks_diff(now, self.last_display_update) >= self.display_period:
+                self._show(self.display_message())
+                self.display_state = (self.display_state + 1) % DISPLAY_PAGES
+                self.last_display_update = now
+                self.display_blank = False
+        elif not self.display_blank:
+            # No recent motion: clear the display (turn it off) once
+            self.out.blank()
+            self.display_blank = True
+
+    def display_message(self):
+        state = self.display_state
+        if state == 3:
+            return process_received_temperature()
+        if state == 4:
+            return process_received_transport_info()
+        # The strings are regenerated only when the digits change (bme.formatted)
+        temperature, pressure, humidity = self.formatter(*self.env)
+        if state == 0:
+            return f"Inside Temperature: {temperature}"
+        if state == 1:
+            return "Inside Humidity: " + humidity
+        return "Inside Pressure: " + pressure
+
+    def pattern_command(self, now, msg):
+        """MQTT: b"start" enrolls a new step pattern, b"clear" removes all of them."""
+        if not self.lock:
+            return
+        if msg == b"start":
+            self._pattern_result(self.lock.start(now))
+        elif msg == b"clear":
+            self._pattern_result(self.lock.clear())
+
+    def _pattern_result(self, result):
+        print("Pattern:", result.decode())
+        if self._publish:
+            self._publish(TOPIC_PATTERN, result)
+
+    def _on_routine(self, now, event):
+        if event == OBJECT:
+            self.footsteps.active = False  # The "step" in progress was the object being put down
+        print("Routine:", event.decode())
+        if self._publish:
+            self._publish(TOPIC_ROUTINE, event)
+
+    def _on_step(self, step):
+        """
+        Checks the step against the enrolled patterns first, so an unlock
+        goes out right after the final step. Then publishes its features
+        (onset, peak, duration, impulse, centre of pressure) as one footstep
+        event, followed by the identified user if a model is loaded.
+        """
+        if self.lock:
+            result = self.lock.step(step.offset, step.cop_x, step.cop_y, step.duration)
+            if result:
+                self._pattern_result(result)
+        self.routines.step(step)
+        if self._publish:
+            self.payload_seq = (self.payload_seq + 1) & 0xFFFF
+            size = step.encode(self.payload_buf, self.payload_seq)
+            self._publish(TOPIC_EVENT, memoryview(self.payload_buf)[:size])
+        if self.user_model:
+            user = self.user_model.classify(identify.features(step, self.step_features))
+            print("Step by", self.user_model.name(user))
+            if self._publish:
+                self._publish(TOPIC_USER, self.user_model.name(user).encode())
@@ -0,0 +1,99 @@
+# mem_policy.py
+# Memory budget of the mat: buffers allocated once at boot, garbage
+# collection only in idle time.
+#
+# MicroPython collects when an allocation finds no free block. With a
+# fragmented heap that costs several ms at whatever point of the loop the
+# allocation happens, e.g. in the middle of a pressure scan. The policy:
+#   - the working buffers are reserved at boot, largest first, while the
+#     heap is still one free block (reserve()),
+#   - the hot path (scan, logic, LED, display pages) allocates nothing;
+#     alloc_check.py verifies this,
+#   - idle() is called by the loop when it is about to sleep and collects
+#     when enough garbage may have built up and the loop has time for the
+#     pause. gc.threshold() makes an automatic collection a safety net.
+#
+# Runs under CPython too (sim_hal), where gc has no mem_alloc/threshold
+# and idle() only collects on the max_interval_ms timer.
+import gc
+import time
+
+_micropython = hasattr(gc, "mem_alloc")
+
+
+def allocated():
+    """Heap bytes in use (0 where the port cannot tell)."""
+    return gc.mem_alloc() if _micropython else 0
+
+
+def free():
+    return gc.mem_free() if _micropython else 0
+
+
+class MemoryPolicy:
+    """
+    collect_bytes:    collect in idle() once this much was allocated since
+                      the last collection
+    max_interval_ms:  collect in idle() at least this often
+    safety_bytes:     gc.threshold(): automatic collection after this much
+                      allocation, should idle() not get to run
+    """
+
+    def __init__(self, collect_bytes=4096, max_interval_ms=60000, safety_bytes=16384):
+        self.collect_bytes = collect_bytes
+        self.max_interval_ms = max_interval_ms
+        self.safety_bytes = safety_bytes
+        self.pools = {}        # name -> buffer reserved at boot
+        self.reserved = 0      # bytes in pools
+        self.collections = 0   # idle collections
+        self.pause_us = 0      # duration of the last collection
+        self.max_pause_us = 0
+        self._after_collect = 0  # allocated() right after the last collection
+        self._last_collect = time.ticks_ms()
+        gc.collect()
+
+    def reserve(self, name, size):
+        """
+        Allocates a buffer now, for a subsystem that starts later (a boot
+        stage) and would otherwise allocate it in a fragmented heap.
+        """
+        buf = bytearray(size)
+        self.pools[name] = buf
+        self.reserved += size
+        return buf
+
+    def arm(self):
+        """End of boot: collect and hand automatic collection the safety net."""
+        self._collect()
+        if _micropython:
+            gc.threshold(self.safety_bytes)
+        print("Memory: {} bytes reserved, {} free".format(self.reserved, free()))
+
+    def idle(self, now, slack_ms):
+        """
+        Call when the loop is about to sleep for slack_ms. Collects if due
+        and the last pause fits into the slack. Returns True if it collected.
+        """
+        if slack_ms * 1000 < self.pause_us:
+            return False
+        due = time.ticks_diff(now, self._last_collect) >= self.max_interval_ms
+        if not due and _micropython:
+            due = allocated() - self._after_collect >= self.collect_bytes
+        if not due:
+            return False
+        self._collect()
+        self.collections += 1
+        return True
+
+    def _collect(self):
+        start = time.ticks_us()
+        gc.collect()
+        self.pause_us = time.ticks_diff(time.ticks_us(), start)
+        if self.pause_us > self.max_pause_us:
+            self.max_pause_us = self.pause_us
+        self._after_collect = allocated()
+        self._last_collect = time.ticks_ms()
+
+    def stats(self):
+        """(idle collections, last pause us, max pause us, free bytes)."""
+        return self.collections, self.pause_us, self.max_pause_us, free()
@@ -0,0 +1,120 @@
+# mini_broker.py
+# Self-contained local MQTT broker stand-in for tests and load generation.
+# Not a replacement for Mosquitto / the Home Assistant add-on: QoS 0 only,
+# no persistence, no authentication (credentials are accepted as sent).
+#
+# Usage: python3 mini_broker.py --port 1883
+import asyncio
+import mqtt_wire
+
+
+class Broker:
+
+    def __init__(self):
+        self.sessions = {}   # client id -> writer
+        self.subs = {}       # writer -> set of topic filters
+        self.retained = {}   # topic -> message
+        self.received = 0    # PUBLISH packets received
+        self.delivered = 0   # PUBLISH packets sent to subscribers
+        self.server = None
+
+    async def start(self, host="127.0.0.1", port=1883):
+        self.server = await asyncio.start_server(self._handle, host, port)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        if self.server:
+            self.server.close()
+            await self.server.wait_closed()
+        for writer in list(self.subs):
+            writer.close()
+
+    def route(self, topic, msg, retain=False):
+        """Delivers a message to all matching subscribers."""
+        self.received += 1
+        if retain:
+            if msg:
+                self.retained[topic] = msg
+            else:
+                self.retained.pop(topic, None)
+        data = None
+        for writer, filters in self.subs.items():
+            for f in filters:
+                if mqtt_wire.topic_matches(f, topic):
+                    if data is None:
+                        data = mqtt_wire.publish(topic, msg)
+                    writer.write(data)
+                    self.delivered += 1
+                    break
+
+    async def _handle(self, reader, writer):
+        client_id = None
+        will = None
+        try:
+            ptype, flags, body = await mqtt_wire.read_packet(reader)
+            if ptype != mqtt_wire.CONNECT:
+                return
+            client_id, will = mqtt_wire.parse_connect(body)
+            old = self.sessions.get(client_id)
+            if old is not None:
+                old.close()  # session takeover, as a real broker does
+            self.sessions[client_id] = writer
+            self.subs[writer] = set()
+            writer.write(mqtt_wire.packet(mqtt_wire.CONNACK, b"\x00\x00"))
+            while True:
+                ptype, flags, body = await mqtt_wire.read_packet(reader)
+                if ptype == mqtt_wire.PUBLISH:
+                    topic, msg, qos, pid, retain = mqtt_wire.parse_publish(flags, body)
+                    if qos:
+                        writer.write(mqtt_wire.packet(mqtt_wire.PUBACK, pid.to_bytes(2, "big")))
+                    self.route(topic, msg, retain)
+                elif ptype == mqtt_wire.SUBSCRIBE:
+                    pid, topics = mqtt_wire.parse_subscribe(body)
+                    self.subs[writer].update(topics)
+                    writer.write(mqtt_wire.packet(
+                        mqtt_wire.SUBACK, pid.to_bytes(2, "big") + bytes(len(topics))))
+                    for topic, msg in self.retained.items():
+                        if any(mqtt_wire.topic_matches(f, topic) for f in topics):
+                            writer.write(mqtt_wire.publish(topic, msg, retain=True))
+                elif ptype == mqtt_wire.UNSUBSCRIBE:
+                    self.subs[writer].difference_update(mqtt_wire.parse_unsubscribe(body)[1])
+                    writer.write(mqtt_wire.packet(mqtt_wire.UNSUBACK, body[:2]))
+                elif ptype == mqtt_wire.PINGREQ:
+                    writer.write(mqtt_wire.packet(mqtt_wire.PINGRESP))
+                elif ptype == mqtt_wire.DISCONNECT:
+                    will = None
+                    break
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError, OSError):
+            pass
+        finally:
+            self.subs.pop(writer, None)
+            if client_id is not None and self.sessions.get(client_id) is writer:
+                del self.sessions[client_id]
+            if will:
+                self.route(*will)
+            writer.close()
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Local MQTT broker stand-in")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=1883)
+    args = parser.parse_args()
+
+    async def serve():
+        broker = Broker()
+        port = await broker.start(args.host, args.port)
+        print("Broker listening on port", port)
+        await broker.server.serve_forever()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
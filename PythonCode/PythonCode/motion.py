@@ -0,0 +1,116 @@
+# motion.py
+# PIR motion sensor on a pin interrupt, with wake-on-motion light sleep.
+#
+# The interrupt handler only takes the timestamp and level of each edge and
+# stores them in a preallocated queue (no allocation, so it may run as a
+# hard IRQ). Anything else - the on_edge callback, e.g. switching the loop
+# to fast sampling - is run by micropython.schedule() once the interrupted
+# code reaches a safe point. The loop drains the queue with pending() /
+# pop(), so pulses shorter than a loop period are not lost either.
+#
+# sleep() puts the board into light sleep and arms the PIR as a wake
+# source where the port supports it (Pin.irq(wake=machine.SLEEP)).
+# Otherwise the sleep ends on its timer and motion that started meanwhile
+# is noticed, with the wake-up time, right after it.
+from array import array
+import time
+import machine
+import micropython
+
+QUEUE = 8  # Edges kept between two loop iterations; a power of two
+
+
+class MotionSensor:
+    """
+    pin:      the PIR input; value() == 1 means motion
+    on_edge:  on_edge(level), scheduled after every edge
+    """
+
+    def __init__(self, pin, on_edge=None):
+        self.pin = pin
+        self.on_edge = on_edge
+        self.level = 0
+        self.edges = 0    # edges seen by the interrupt handler
+        self.dropped = 0  # edges lost to a full queue or scheduler
+        self.wakes = 0    # light sleeps ended by motion
+        self.popped_at = 0  # ticks_ms of the edge returned by pop()
+        self._times = array("i", [0] * QUEUE)
+        self._levels = bytearray(QUEUE)
+        self._write = 0  # Only changed by the interrupt handler
+        self._read = 0   # Only changed by pop()
+        self._scheduled = self._run_on_edge  # Bound once: the handler must not allocate
+        self._wake = None  # Pin trigger that wakes the board from light sleep, if supported
+        if hasattr(machine, "SLEEP") and hasattr(machine.Pin, "WAKE_HIGH"):
+            self._wake = machine.Pin.WAKE_HIGH
+        if pin.value():  # Motion already at start-up
+            self._push(time.ticks_ms(), 1)
+        self.listen()
+
+    def listen(self):
+        """Interrupt on both edges."""
+        try:
+            self.pin.irq(self._irq, machine.Pin.IRQ_RISING | machine.Pin.IRQ_FALLING, hard=True)
+        except TypeError:  # Port without hard interrupts
+            self.pin.irq(self._irq, machine.Pin.IRQ_RISING | machine.Pin.IRQ_FALLING)
+
+    def _irq(self, pin):
+        level = pin.value()
+        if level == self.level:  # Bounce, or the level trigger of the wake source
+            return
+        self._push(time.ticks_ms(), level)
+        if self.on_edge:
+            try:
+                micropython.schedule(self._scheduled, level)
+            except RuntimeError:  # Scheduler queue full
+                self.dropped += 1
+
+    def _push(self, now, level):
+        self.level = level
+        self.edges += 1
+        write = self._write
+        if ((write - self._read) & 0xFFFF) >= QUEUE:
+            self.dropped += 1
+            return
+        slot = write & (QUEUE - 1)
+        self._times[slot] = now
+        self._levels[slot] = level
+        self._write = (write + 1) & 0xFFFF
+
+    def _run_on_edge(self, level):
+        self.on_edge(level)
+
+    def pending(self):
+        """Number of queued edges."""
+        return (self._write - self._read) & 0xFFFF
+
+    def pop(self):
+        """The level of the oldest queued edge; its time is in popped_at."""
+        slot = self._read & (QUEUE - 1)
+        self.popped_at = self._times[slot]
+        level = self._levels[slot]
+        self._read = (self._read + 1) & 0xFFFF
+        return level
+
+    def sleep(self, ms):
+        """
+        Light sleep for at most ms, ended early by motion where the port can
+        wake on the PIR pin. Returns True if motion was seen on waking.
+        """
+        if self._wake is not None:
+            try:
+                self.pin.irq(self._irq, self._wake, wake=machine.SLEEP)
+            except (TypeError, ValueError, OSError):  # Pin is no wake source on this chip
+                self._wake = None
+                self.listen()
+        machine.lightsleep(ms)
+        if self._wake is not None:
+            self.listen()
+        # Edges during the sleep raised no interrupt; queue the change now
+        level = self.pin.value()
+        if level != self.level:
+            self._push(time.ticks_ms(), level)
+            if self.on_edge:
+                self.on_edge(level)
+        if level:
+            self.wakes += 1
+        return level == 1
@@ -1,81 +1,104 @@
 # mqtt_connection.py
-import network
+# network and umqtt are imported on first use: mat_logic reads the received
+# messages below, and a mat without MQTT (enable_mqtt false) never loads them.
 import time
-from umqtt.simple import MQTTClient
+import config
 
-# WiFi Credentials
-SSID = "Two Girls One Router"
-PASSWORD = "Pommesgesichter"
+# WiFi credentials and MQTT broker details come from config.json (config.py)
+_cfg = config.get()
+SSID = _cfg.wifi_ssid
+PASSWORD = _cfg.wifi_password
+MQTT_BROKER = _cfg.mqtt_broker
+CLIENT_ID = _cfg.client_id
+MQTT_PORT = _cfg.mqtt_port
+MQTT_USER = _cfg.mqtt_user
+MQTT_PASS = _cfg.mqtt_password
 
-# MQTT Broker details
-MQTT_BROKER = "192.168.178.113"  # Replace with your Home Assistant IP
-CLIENT_ID = "esp32-test"
-MQTT_PORT = 1883
-MQTT_USER = "SmartCarpet"      # If needed
-MQTT_PASS = "smartcarpet"      # If needed
 
 
 
 
 
-
-def connect_wifi():
+def start_wifi():
+    """Starts connecting to WiFi without waiting; see wifi_connected()."""
+    import network
     wlan = network.WLAN(network.STA_IF)
     wlan.active(True)
     if not wlan.isconnected():
         print("Connecting to WiFi...")
         wlan.connect(SSID, PASSWORD)
-        while not wlan.isconnected():
-            time.sleep(0.5)
-    print("WiFi connected. IP:", wlan.ifconfig()[0])
     return wlan
 
-def mqtt_connect():
+def wifi_connected(wlan):
+    if wlan.isconnected():
+        print("WiFi connected. IP:", wlan.ifconfig()[0])
+        return True
+    return False
+
+def connect_wifi():
+    wlan = start_wifi()
+    while not wifi_connected(wlan):
+        time.sleep(0.5)
+    return wlan
+
+def mqtt_connect(will=None, client_id=CLIENT_ID, broker=MQTT_BROKER, port=MQTT_PORT):
     """
     Creates and connects an MQTT client.
+    will: optional (topic, message) last will, published retained by the
+    broker if the connection is lost.
     Returns the connected client or None if connection fails.
     """
-    client = MQTTClient(CLIENT_ID, MQTT_BROKER, port=MQTT_PORT, user=MQTT_USER, password=MQTT_PASS)
+    from umqtt.simple import MQTTClient
+    client = MQTTClient(client_id, broker, port=port, user=MQTT_USER or None,
+                        password=MQTT_PASS or None)
+    if will:
+        client.set_last_will(will[0], will[1], retain=True)
     try:
         client.connect()
-        print("Connected to MQTT broker:", MQTT_BROKER)
+        print("Connected to MQTT broker:", broker)
     except Exception as e:
         print("MQTT connection failed:", e)
         client = None
     return client
 
-def publish_data(client, topic, payload):
+def publish_data(client, topic, payload, retain=False):
     """
     Publishes data to a given topic using the provided MQTT client.
     Topics and payloads are passed from the main file.
+    Returns True if the message was handed to the broker connection.
     """
     if client:
         try:
-            client.publish(topic, payload)
+            client.publish(topic, payload, retain)
             # Uncomment the following line for debugging if desired:
             # print("Published to topic:", topic, "Payload:", payload)
+            return True
         except Exception as e:
             print("Failed to publish:", e)
     else:
         print("MQTT client is not connected. Data not published.")
+    return False
 
 # This part is for getting the Information back from SmartHome
 received_temperature = None
 received_transport_info = None
 
+# Additional topics registered by other modules: topic (bytes) -> handler(msg)
+extra_handlers = {}
+
+
+def register_handler(topic, handler):
+    """
+    Registers a handler for an extra topic. The handler receives the raw
+    message bytes. Call before mqtt_subscribe().
+    """
+    extra_handlers[topic] = handler
+
 
 def mqtt_subscribe(client):
     """Subscribe to Home Assistant topics and handle received messages."""
     topics = [b"esp32c6/wetter", b"esp32c6/transport"]  # Added transport topic
-
-    def message_callback(topic, msg):
-        topic_str = topic.decode()
-        msg_decoded = msg.decode()
-
-        if topic_str == "esp32c6/wetter":
-            process_temperature_message(msg_decoded)
-        elif topic_str == "esp32c6/transport":
-            process_transport_message(msg_decoded)
+    topics.extend(extra_handlers)
 
     client.set_callback(message_callback)
 
@@ -84,6 +107,27 @@ def mqtt_subscribe(client):
         print("Subscribed to topic:", topic.decode())
 
 
+# Called with (topic, msg) for every received message before it is handled,
+# e.g. by the input recorder (recorder.py)
+inbound_hook = None
+
+
+def message_callback(topic, msg):
+    if inbound_hook:
+        inbound_hook(topic, msg)
+    handler = extra_handlers.get(topic)
+    if handler:
+        handler(msg)
+        return
+    topic_str = topic.decode()
+    msg_decoded = msg.decode()
+
+    if topic_str == "esp32c6/wetter":
+        process_temperature_message(msg_decoded)
+    elif topic_str == "esp32c6/transport":
+        process_transport_message(msg_decoded)
+
+
 
 def process_temperature_message(msg):
     """Process received MQTT messages and store the temperature."""
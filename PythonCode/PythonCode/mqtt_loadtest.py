@@ -0,0 +1,202 @@
+# mqtt_loadtest.py
+# Fleet-scale MQTT load generator for sizing the Raspberry Pi.
+#
+# Simulates N virtual mats, each running the real mqtt_connection and
+# payload code under the simulated HAL. Every mat publishes telemetry
+# snapshots and footstep events and receives the weather / transport
+# messages Home Assistant sends. A monitor client measures end-to-end
+# latency and throughput. By default a local broker stand-in is started;
+# use --broker to measure a real broker (e.g. Mosquitto on the Pi) instead.
+#
+# Usage: python3 mqtt_loadtest.py --mats 1 10 50 100 --duration 10
+import asyncio
+import contextlib
+import os
+import select
+import threading
+import time
+
+import sim_hal
+sim_hal.install()
+
+import mini_broker
+import mqtt_connection
+import payload
+
+TOPIC_PING = b"loadtest/ping"  # inbound message carrying its send time
+
+
+class Stats:
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.sent = 0
+        self.delivered = 0
+        self.latencies = []
+        self.inbound = 0
+        self.inbound_latencies = []
+
+    def add(self, name, value):
+        with self.lock:
+            setattr(self, name, getattr(self, name) + value)
+
+
+def percentile(values, p):
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+def run_broker(port):
+    """Starts the broker stand-in in a background thread. Returns its port."""
+    ready = threading.Event()
+    result = {}
+
+    def serve():
+        loop = asyncio.new_event_loop()
+        broker = mini_broker.Broker()
+        result["port"] = loop.run_until_complete(broker.start("127.0.0.1", port))
+        ready.set()
+        loop.run_forever()
+
+    threading.Thread(target=serve, daemon=True).start()
+    ready.wait()
+    return result["port"]
+
+
+def mat(index, host, port, stats, stop, telemetry_hz, event_hz):
+    """One virtual mat, using the device's MQTT code paths."""
+    client = mqtt_connection.mqtt_connect(client_id="mat-{}".format(index),
+                                          broker=host, port=port)
+    if client is None:
+        return
+    mqtt_connection.mqtt_subscribe(client)
+    state_topic = "home/mat-{}/state".format(index).encode()
+    event_topic = "home/mat-{}/event".format(index).encode()
+    buf = bytearray(max(payload.SNAPSHOT_SIZE, payload.FOOTSTEP_SIZE))
+    seq = 0
+    sent = 0
+    next_telemetry = next_event = time.monotonic()
+    while not stop.is_set():
+        now = time.monotonic()
+        if now >= next_telemetry:
+            seq += 1
+            size = payload.encode_snapshot(buf, seq, time.ticks_ms(), 2345, 25939200, 46080)
+            mqtt_connection.publish_data(client, state_topic, bytes(buf[:size]))
+            next_telemetry += 1 / telemetry_hz
+            sent += 1
+        if now >= next_event:
+            seq += 1
+            size = payload.encode_footstep(buf, seq, time.ticks_ms(), 0x03, 950, 320, 150000, 120, -340)
+            mqtt_connection.publish_data(client, event_topic, bytes(buf[:size]))
+            next_event += 1 / event_hz
+            sent += 1
+        for _ in range(10):
+            client.check_msg()
+        time.sleep(max(0, min(next_telemetry, next_event) - time.monotonic()))
+    stats.add("sent", sent)
+    client.disconnect()
+
+
+def monitor(host, port, stats, stop):
+    """Plays the Pi side: receives all mat traffic and measures latency."""
+    client = sim_hal.MQTTClient("loadtest-monitor", host, port=port)
+
+    def on_message(topic, msg):
+        _, _, ts = payload.decode_header(msg)
+        latency = time.ticks_diff(time.ticks_ms(), ts)
+        with stats.lock:
+            stats.delivered += 1
+            stats.latencies.append(latency)
+
+    client.set_callback(on_message)
+    client.connect()
+    client.subscribe(b"home/+/state")
+    client.subscribe(b"home/+/event")
+    while not stop.is_set():
+        if select.select([client.sock], [], [], 0.2)[0]:
+            client.wait_msg()
+    client.disconnect()
+
+
+def home_assistant(host, port, stop, inbound_hz):
+    """Publishes the inbound messages Home Assistant sends to the mats."""
+    client = sim_hal.MQTTClient("loadtest-ha", host, port=port)
+    client.connect()
+    while not stop.wait(1 / inbound_hz):
+        client.publish(b"esp32c6/wetter", b"18.5")
+        client.publish(b"esp32c6/transport", b"12:34")
+        client.publish(TOPIC_PING, str(time.ticks_ms()).encode())
+    client.disconnect()
+
+
+def run_level(n, host, port, duration, telemetry_hz, event_hz, inbound_hz):
+    stats = Stats()
+    stop = threading.Event()
+
+    def on_ping(msg):
+        latency = time.ticks_diff(time.ticks_ms(), int(msg))
+        with stats.lock:
+            stats.inbound += 1
+            stats.inbound_latencies.append(latency)
+
+    mqtt_connection.register_handler(TOPIC_PING, on_ping)
+
+    threads = [threading.Thread(target=monitor, args=(host, port, stats, stop))]
+    threads[0].start()
+    time.sleep(0.2)  # let the monitor subscribe first
+    # The device code prints every received message; keep the report readable
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        start = time.monotonic()
+        for i in range(n):
+            t = threading.Thread(target=mat, args=(i, host, port, stats, stop,
+                                                   telemetry_hz, event_hz))
+            t.start()
+            threads.append(t)
+        time.sleep(0.5)
+        ha = threading.Thread(target=home_assistant, args=(host, port, stop, inbound_hz))
+        ha.start()
+        threads.append(ha)
+        time.sleep(duration)
+        stop.set()
+        for t in threads:
+            t.join()
+        elapsed = time.monotonic() - start
+    return stats, elapsed
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="MQTT fleet load generator")
+    parser.add_argument("--mats", type=int, nargs="+", default=[1, 10, 50, 100])
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--telemetry-hz", type=float, default=1)
+    parser.add_argument("--event-hz", type=float, default=5)
+    parser.add_argument("--inbound-hz", type=float, default=1)
+    parser.add_argument("--broker", help="host:port of an external broker")
+    args = parser.parse_args()
+
+    if args.broker:
+        host, _, port = args.broker.partition(":")
+        port = int(port or 1883)
+    else:
+        host, port = "127.0.0.1", run_broker(0)
+
+    print("{:>6} {:>10} {:>10} {:>7} {:>8} {:>8} {:>8} {:>10} {:>8}".format(
+        "mats", "sent/s", "recv/s", "loss%", "p50 ms", "p95 ms", "max ms",
+        "inbound/s", "in p95"))
+    for n in args.mats:
+        stats, elapsed = run_level(n, host, port, args.duration,
+                                   args.telemetry_hz, args.event_hz, args.inbound_hz)
+        loss = 100 * (1 - stats.delivered / stats.sent) if stats.sent else 0
+        print("{:>6} {:>10.1f} {:>10.1f} {:>7.2f} {:>8} {:>8} {:>8} {:>10.1f} {:>8}".format(
+            n, stats.sent / elapsed, stats.delivered / elapsed, max(0, loss),
+            percentile(stats.latencies, 50), percentile(stats.latencies, 95),
+            max(stats.latencies, default=float("nan")),
+            stats.inbound / elapsed, percentile(stats.inbound_latencies, 95)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+# mqtt_wire.py
+# Minimal MQTT 3.1.1 packet encoding for the Raspberry Pi side tools
+# (local broker stand-in, simulated device client, ingestion service).
+# Only what the mats use is supported: QoS 0 (QoS 1 publishes are
+# acknowledged but delivered at QoS 0), retained messages, last will,
+# subscriptions with + and # wildcards.
+import struct
+
+CONNECT = 1
+CONNACK = 2
+PUBLISH = 3
+PUBACK = 4
+SUBSCRIBE = 8
+SUBACK = 9
+UNSUBSCRIBE = 10
+UNSUBACK = 11
+PINGREQ = 12
+PINGRESP = 13
+DISCONNECT = 14
+
+
+def encode_length(n):
+    out = bytearray()
+    while True:
+        byte = n & 0x7F
+        n >>= 7
+        out.append(byte | 0x80 if n else byte)
+        if not n:
+            return bytes(out)
+
+
+def _string(s):
+    if isinstance(s, str):
+        s = s.encode()
+    return struct.pack("!H", len(s)) + s
+
+
+def packet(ptype, body=b"", flags=0):
+    return bytes([ptype << 4 | flags]) + encode_length(len(body)) + body
+
+
+def connect(client_id, user=None, password=None, keepalive=0, will=None,
+            clean_session=True):
+    """will: (topic, message, retain) or None"""
+    flags = 0x02 if clean_session else 0
+    payload = _string(client_id)
+    if will:
+        topic, msg, retain = will
+        flags |= 0x04 | (0x20 if retain else 0)
+        payload += _string(topic) + _string(msg)
+    if user is not None:
+        flags |= 0x80
+        payload += _string(user)
+        if password is not None:
+            flags |= 0x40
+            payload += _string(password)
+    body = _string(b"MQTT") + bytes([4, flags]) + struct.pack("!H", keepalive)
+    return packet(CONNECT, body + payload)
+
+
+def parse_connect(body):
+    """Returns (client_id, will) where will is (topic, msg, retain) or None."""
+    pos = 2 + struct.unpack_from("!H", body, 0)[0]
+    flags = body[pos + 1]
+    pos += 4
+    fields = []
+    while pos < len(body):
+        n = struct.unpack_from("!H", body, pos)[0]
+        fields.append(bytes(body[pos + 2:pos + 2 + n]))
+        pos += 2 + n
+    client_id = fields[0].decode()
+    will = None
+    if flags & 0x04:
+        will = (fields[1].decode(), fields[2], bool(flags & 0x20))
+    return client_id, will
+
+
+def publish(topic, msg, retain=False, qos=0, pid=0):
+    body = _string(topic)
+    if qos:
+        body += struct.pack("!H", pid)
+    return packet(PUBLISH, body + bytes(msg), qos << 1 | (1 if retain else 0))
+
+
+def parse_publish(flags, body):
+    """Returns (topic, message, qos, packet id, retain)."""
+    n = struct.unpack_from("!H", body, 0)[0]
+    topic = bytes(body[2:2 + n]).decode()
+    pos = 2 + n
+    qos = (flags >> 1) & 0x03
+    pid = 0
+    if qos:
+        pid = struct.unpack_from("!H", body, pos)[0]
+        pos += 2
+    return topic, bytes(body[pos:]), qos, pid, bool(flags & 0x01)
+
+
+def subscribe(pid, topics):
+    body = struct.pack("!H", pid)
+    for topic in topics:
+        body += _string(topic) + b"\x00"
+    return packet(SUBSCRIBE, body, 0x02)
+
+
+def unsubscribe(pid, topics):
+    body = struct.pack("!H", pid)
+    for topic in topics:
+        body += _string(topic)
+    return packet(UNSUBSCRIBE, body, 0x02)
+
+
+def _parse_filters(body, options):
+    """(packet id, [topic filters]); each filter is followed by `options` bytes."""
+    pid = struct.unpack_from("!H", body, 0)[0]
+    pos = 2
+    topics = []
+    while pos < len(body):
+        n = struct.unpack_from("!H", body, pos)[0]
+        topics.append(bytes(body[pos + 2:pos + 2 + n]).decode())
+        pos += 2 + n + options
+    return pid, topics
+
+
+def parse_subscribe(body):
+    """Returns (packet id, [topic filters]); the requested QoS bytes are skipped."""
+    return _parse_filters(body, 1)
+
+
+def parse_unsubscribe(body):
+    """Returns (packet id, [topic filters])."""
+    return _parse_filters(body, 0)
+
+
+def topic_matches(pattern, topic):
+    """MQTT topic filter matching with + and # wildcards."""
+    p = pattern.split("/")
+    t = topic.split("/")
+    for i, part in enumerate(p):
+        if part == "#":
+            return True
+        if i >= len(t) or (part != "+" and part != t[i]):
+            return False
+    return len(p) == len(t)
+
+
+async def read_packet(reader):
+    """Reads one packet from an asyncio StreamReader: (type, flags, body)."""
+    header = (await reader.readexactly(1))[0]
+    length = 0
+    shift = 0
+    while True:
+        byte = (await reader.readexactly(1))[0]
+        length |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            break
+        shift += 7
+    body = await reader.readexactly(length) if length else b""
+    return header >> 4, header & 0x0F, body
+
+
+def read_packet_sock(sock):
+    """Blocking variant of read_packet() for a plain socket."""
+    header = _recv_exactly(sock, 1)[0]
+    length = 0
+    shift = 0
+    while True:
+        byte = _recv_exactly(sock, 1)[0]
+        length |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            break
+        shift += 7
+    body = _recv_exactly(sock, length) if length else b""
+    return header >> 4, header & 0x0F, body
+
+
+def _recv_exactly(sock, n):
+    buf = bytearray()
+    while len(buf) < n:
+        chunk = sock.recv(n - len(buf))
+        if not chunk:
+            raise OSError("Connection closed")
+        buf += chunk
+    return buf
@@ -0,0 +1,278 @@
+# pattern_lock.py
+# Step patterns as a PIN: enrollment, verification, lockout.
+#
+# A pattern is a fixed number of footsteps (config pattern_length). Each
+# step is quantised to a symbol: the grid cell under its centre of pressure,
+# times two, plus one if the foot was held for HOLD_MS. Only a salted and
+# stretched SHA-256 of the symbols is kept, never the pattern itself.
+#
+# An attempt starts with a long press (LONG_PRESS_MS, answered with READY);
+# only the steps after it are checked, so people just walking over the mat
+# never count as attempts, cause no failures and no flash writes. The
+# attempt ends with its last step, or is dropped after a pause of
+# ATTEMPT_TIMEOUT_MS. Verification starts in the sample that ends the last
+# step. It takes the same time whatever the attempt is:
+# the hash input always has MAX_STEPS bytes, and every byte of every slot,
+# used or not, is compared without an early exit. MAX_FAILURES failures in
+# a row lock the mat for LOCKOUT_MS, doubling with every further lockout
+# up to MAX_LOCKOUT_MS. After each failure, steps are ignored for RETRY_MS.
+# Failures and lockouts are saved, so a reboot does not reset them.
+#
+# Enrollment: start() (MQTT <prefix>/pattern/enroll "start"), or a long
+# press while no pattern is enrolled yet or within ENROLL_WINDOW_MS of an
+# unlock (instead of starting an attempt). The new pattern is then stepped twice.
+#
+# Pattern file, little-endian:
+#   magic "PAT1" | length (B) | used slots (B, bit mask) | failures (H) |
+#   lockouts (H) | salt (16s) | MAX_PATTERNS digests (32s each)
+try:
+    from ustruct import pack_into, unpack_from
+except ImportError:
+    from struct import pack_into, unpack_from
+try:
+    import uhashlib as hashlib
+except ImportError:
+    import hashlib
+import os
+import time
+
+MAGIC = b"PAT1"
+_HEADER = "<4sBBHH16s"
+_HEADER_SIZE = 26
+SALT_SIZE = 16
+DIGEST_SIZE = 32
+MAX_PATTERNS = 4
+MAX_STEPS = 8
+FILE_SIZE = _HEADER_SIZE + MAX_PATTERNS * DIGEST_SIZE
+
+ROUNDS = 64                 # SHA-256 rounds per digest (a few ms on the ESP32)
+HOLD_MS = 600               # A step this long is a different symbol
+LONG_PRESS_MS = 3000        # Starts an attempt or enrollment (see above); not part of a pattern
+ATTEMPT_TIMEOUT_MS = 5000   # An attempt with a longer pause between steps is dropped
+ENROLL_TIMEOUT_MS = 60000   # Enrollment is abandoned after this
+ENROLL_WINDOW_MS = 30000    # A long press enrolls within this time after an unlock
+RETRY_MS = 2000             # Steps are ignored this long after a failure
+MAX_FAILURES = 3
+LOCKOUT_MS = 30000
+MAX_LOCKOUT_MS = 900000
+
+# Results, published as they are
+READY = b"ready"          # Attempt started: step the pattern
+UNLOCK = b"unlock"
+DENY = b"deny"
+LOCKED = b"locked"
+ENROLL = b"enroll"        # Enrollment started: step the new pattern
+CONFIRM = b"confirm"      # Step it once more
+ENROLLED = b"enrolled"
+MISMATCH = b"mismatch"    # The confirmation differed; enrollment ended
+FULL = b"full"            # No free slot
+CLEARED = b"cleared"
+
+_VERIFY = 0
+_ENROLL = 1
+_CONFIRM = 2
+
+
+class PatternLock:
+    """
+    rows, cols:  the FSR grid; cells of the centre of pressure are the symbols
+    length:      steps per pattern for new enrollments; a loaded file keeps
+                 the length its patterns were enrolled with
+    path:        pattern file, None to keep everything in RAM
+    """
+
+    def __init__(self, now, rows=2, cols=2, length=4, path=None):
+        if not 2 <= length <= MAX_STEPS:
+            raise ValueError("Pattern length must be 2..{}".format(MAX_STEPS))
+        self.rows = rows
+        self.cols = cols
+        self.length = length
+        self.path = path
+        self.salt = os.urandom(SALT_SIZE)
+        self.digests = bytearray(MAX_PATTERNS * DIGEST_SIZE)
+        self.used = 0              # Bit mask of enrolled slots
+        self.failures = 0          # Failures in a row
+        self.lockouts = 0          # Lockouts since the last unlock
+        self.locked_until = now
+        self.retry_after = now
+        self.unlocked_at = None
+        self.verify_us = 0         # Duration of the last verification
+        self._mode = _VERIFY
+        self._mode_since = now
+        self._pending = None       # Digest of the first enrollment entry
+        self._attempt = bytearray(MAX_STEPS)
+        self._count = 0
+        self._armed = False        # An attempt was started with a long press
+        self._last_step = now
+        if path:
+            self._load(now)
+
+    def enrolled(self):
+        return self.used != 0
+
+    def _load(self, now):
+        try:
+            with open(self.path, "rb") as f:
+                data = f.read()
+        except OSError:
+            return
+        if len(data) != FILE_SIZE or data[:4] != MAGIC:
+            print("Ignoring invalid pattern file", self.path)
+            return
+        _, length, self.used, self.failures, self.lockouts, self.salt = \
+            unpack_from(_HEADER, data, 0)
+        if self.used:
+            self.length = length
+        self.digests[:] = data[_HEADER_SIZE:]
+        if self.failures and self.failures % MAX_FAILURES == 0:
+            self._lock(now)  # Rebooting does not end a lockout
+
+    def _save(self):
+        if not self.path:
+            return
+        data = bytearray(FILE_SIZE)
+        pack_into(_HEADER, data, 0, MAGIC, self.length, self.used,
+                  self.failures, self.lockouts, self.salt)
+        data[_HEADER_SIZE:] = self.digests
+        with open(self.path, "wb") as f:
+            f.write(data)
+
+    def symbol(self, cop_x, cop_y, duration):
+        """Symbol of a step from its centre of pressure (-1000..1000) and duration."""
+        col = (cop_x + 1000) * self.cols // 2001
+        row = (cop_y + 1000) * self.rows // 2001
+        return (row * self.cols + col) * 2 + (1 if duration >= HOLD_MS else 0)
+
+    def _digest(self, symbols):
+        """Stretched, salted SHA-256 of MAX_STEPS symbol bytes."""
+        digest = hashlib.sha256(self.salt + symbols).digest()
+        for _ in range(ROUNDS - 1):
+            digest = hashlib.sha256(digest + self.salt).digest()
+        return digest
+
+    def _matches(self, digest):
+        """Constant time: compares every byte of every slot, used or not."""
+        found = 0
+        digests = self.digests
+        for slot in range(MAX_PATTERNS):
+            base = slot * DIGEST_SIZE
+            diff = 0
+            for i in range(DIGEST_SIZE):
+                diff |= digests[base + i] ^ digest[i]
+            found |= (diff == 0) & (self.used >> slot)
+        return found & 1 == 1
+
+    def start(self, now):
+        """Starts enrolling a new pattern. Returns ENROLL or FULL."""
+        if self.used == (1 << MAX_PATTERNS) - 1:
+            return FULL
+        self._mode = _ENROLL
+        self._mode_since = now
+        self._count = 0
+        self._armed = False
+        self._last_step = now
+        return ENROLL
+
+    def clear(self):
+        """Removes every pattern; new enrollments get a new salt."""
+        self.salt = os.urandom(SALT_SIZE)
+        self.digests[:] = bytes(len(self.digests))
+        self.used = 0
+        self.failures = 0
+        self.lockouts = 0
+        self._mode = _VERIFY
+        self._count = 0
+        self._armed = False
+        self._save()
+        return CLEARED
+
+    def step(self, now, cop_x, cop_y, duration):
+        """
+        A finished footstep. Returns a result (READY, UNLOCK, DENY, LOCKED,
+        ENROLL, CONFIRM, ENROLLED, MISMATCH, FULL) or None while the pattern
+        is incomplete or no attempt was started.
+        """
+        if self._mode != _VERIFY and time.ticks_diff(now, self._mode_since) >= ENROLL_TIMEOUT_MS:
+            self._mode = _VERIFY
+            self._count = 0
+        if duration >= LONG_PRESS_MS:
+            self._count = 0
+            self._armed = False
+            if self._mode != _VERIFY:
+                return None
+            if not self.used or (self.unlocked_at is not None
+                                 and time.ticks_diff(now, self.unlocked_at) < ENROLL_WINDOW_MS):
+                return self.start(now)
+            if time.ticks_diff(now, self.locked_until) < 0:
+                return LOCKED
+            if time.ticks_diff(now, self.retry_after) < 0:
+                return None
+            self._armed = True
+            self._last_step = now
+            return READY
+        if self._mode == _VERIFY and not self._armed:
+            return None  # Ordinary traffic
+        if time.ticks_diff(now, self._last_step) >= ATTEMPT_TIMEOUT_MS:
+            self._count = 0  # Abandoned attempt
+            if self._mode == _VERIFY:
+                self._armed = False
+                return None
+        self._last_step = now
+        self._attempt[self._count] = self.symbol(cop_x, cop_y, duration)
+        self._count += 1
+        if self._count < self.length:
+            return None
+        self._count = 0
+        self._armed = False
+        attempt = self._attempt
+        for i in range(self.length, MAX_STEPS):
+            attempt[i] = 0
+        if self._mode == _VERIFY:
+            return self._verify(now, attempt)
+        return self._enroll(now, attempt)
+
+    def _verify(self, now, attempt):
+        if time.ticks_diff(now, self.locked_until) < 0:
+            return LOCKED
+        started = time.ticks_us()
+        ok = self._matches(self._digest(attempt))
+        self.verify_us = time.ticks_diff(time.ticks_us(), started)
+        if ok:
+            if self.failures or self.lockouts:
+                self.failures = 0
+                self.lockouts = 0
+                self._save()
+            self.unlocked_at = now
+            return UNLOCK
+        self.failures += 1
+        self.retry_after = time.ticks_add(now, RETRY_MS)
+        if self.failures % MAX_FAILURES == 0:
+            self.lockouts += 1
+            self._lock(now)
+        self._save()
+        return DENY
+
+    def _lock(self, now):
+        lockout = LOCKOUT_MS << min(self.lockouts - 1, 5)
+        self.locked_until = time.ticks_add(now, min(lockout, MAX_LOCKOUT_MS))
+
+    def _enroll(self, now, attempt):
+        digest = self._digest(attempt)
+        if self._mode == _ENROLL:
+            self._pending = digest
+            self._mode = _CONFIRM
+            return CONFIRM
+        same = 0
+        for i in range(DIGEST_SIZE):
+            same |= self._pending[i] ^ digest[i]
+        self._pending = None
+        self._mode = _VERIFY
+        if same:
+            return MISMATCH
+        for slot in range(MAX_PATTERNS):
+            if not self.used & (1 << slot):
+                self.digests[slot * DIGEST_SIZE:(slot + 1) * DIGEST_SIZE] = digest
+                self.used |= 1 << slot
+                break
+        self._save()
+        return ENROLLED
@@ -0,0 +1,148 @@
+# payload.py
+# Compact, versioned payloads for Smart Carpet telemetry and events.
+#
+# The same module runs on the ESP32 (MicroPython) and on the Raspberry Pi
+# (CPython). Every binary message starts with an 8 byte header:
+#
+#   version (B) | type (B) | sequence number (H) | timestamp in ms (I)
+#
+# followed by a fixed-size body depending on the type. All integers are
+# little-endian. Sensor values stay in the fixed-point units the BME280
+# driver already produces, so the device never formats floats.
+try:
+    from ustruct import pack_into, unpack_from
+except ImportError:
+    from struct import pack_into, unpack_from
+try:
+    import ujson as json
+except ImportError:
+    import json
+
+VERSION = 2  # 2: 32-bit zone mask in footsteps (runner mats have more than 8 zones)
+
+# Message types
+TYPE_SNAPSHOT = 1
+TYPE_FOOTSTEP = 2
+TYPE_TRACE = 3  # variable length, see trace_stream.py
+
+_HEADER = "<BBHI"
+HEADER_SIZE = 8
+
+# temperature (0.01 C), pressure (Q24.8 Pa), humidity (Q22.10 %)
+_SNAPSHOT = "<hII"
+SNAPSHOT_SIZE = HEADER_SIZE + 10
+
+# zone mask, peak load (sum of ADC values), duration (ms), impulse (ADC * ms),
+# centre of pressure x / y (per mille of the mat, -1000..1000)
+_FOOTSTEP = "<IHHIhh"
+FOOTSTEP_SIZE = HEADER_SIZE + 16
+# Version 1 footsteps had an 8-bit zone mask; still decoded, e.g. from an older event log
+_FOOTSTEP_V1 = "<BHHIhh"
+FOOTSTEP_V1_SIZE = HEADER_SIZE + 13
+
+_SIZES = {TYPE_SNAPSHOT: SNAPSHOT_SIZE, TYPE_FOOTSTEP: FOOTSTEP_SIZE}
+_BODIES = {TYPE_SNAPSHOT: _SNAPSHOT, TYPE_FOOTSTEP: _FOOTSTEP}
+
+
+def encode_header(buf, msg_type, seq, timestamp):
+    """Writes the common header into buf and returns its size."""
+    pack_into(_HEADER, buf, 0, VERSION, msg_type, seq & 0xFFFF,
+              timestamp & 0xFFFFFFFF)
+    return HEADER_SIZE
+
+
+def encode_snapshot(buf, seq, timestamp, temperature, pressure, humidity):
+    """
+    Packs a BME280 snapshot into buf (at least SNAPSHOT_SIZE bytes).
+    The values are the integers returned by read_compensated_data().
+    Returns the number of bytes written.
+    """
+    encode_header(buf, TYPE_SNAPSHOT, seq, timestamp)
+    pack_into(_SNAPSHOT, buf, HEADER_SIZE, temperature, pressure, humidity)
+    return SNAPSHOT_SIZE
+
+
+def encode_footstep(buf, seq, timestamp, mask, peak, duration, impulse=0,
+                    cop_x=0, cop_y=0):
+    """
+    Packs a footstep event into buf (at least FOOTSTEP_SIZE bytes).
+    Returns the number of bytes written.
+    """
+    encode_header(buf, TYPE_FOOTSTEP, seq, timestamp)
+    pack_into(_FOOTSTEP, buf, HEADER_SIZE, mask, peak, duration,
+              min(impulse, 0xFFFFFFFF), cop_x, cop_y)
+    return FOOTSTEP_SIZE
+
+
+def decode_header(msg):
+    """
+    Decodes the common header.
+    Returns (type, seq, timestamp).
+    Raises ValueError for unknown versions or messages shorter than a header.
+    """
+    if len(msg) < HEADER_SIZE:
+        raise ValueError("Payload too short")
+    version, msg_type, seq, timestamp = unpack_from(_HEADER, msg, 0)
+    if not 1 <= version <= VERSION:
+        raise ValueError("Unsupported payload version {}".format(version))
+    return msg_type, seq, timestamp
+
+
+def decode(msg):
+    """
+    Decodes a fixed-size binary message.
+    Returns (type, seq, timestamp, fields) where fields is a tuple in the
+    order used by the matching encode function.
+    Raises ValueError for unknown versions, types or truncated messages.
+    """
+    msg_type, seq, timestamp = decode_header(msg)
+    size = _SIZES.get(msg_type)
+    if size is None:
+        raise ValueError("Unknown payload type {}".format(msg_type))
+    body = _BODIES[msg_type]
+    if msg_type == TYPE_FOOTSTEP and msg[0] == 1:
+        size, body = FOOTSTEP_V1_SIZE, _FOOTSTEP_V1
+    if len(msg) < size:
+        raise ValueError("Truncated payload")
+    return msg_type, seq, timestamp, unpack_from(body, msg, HEADER_SIZE)
+
+
+def snapshot_units(temperature, pressure, humidity):
+    """Converts fixed-point snapshot values to (C, hPa, %)."""
+    return temperature / 100, pressure / 25600, humidity / 1024
+
+
+def snapshot_json(temperature, pressure, humidity):
+    """
+    JSON fallback for consumers that cannot read the binary format, e.g.
+    Home Assistant sensors using a value_template on the state topic.
+    """
+    t, p, h = snapshot_units(temperature, pressure, humidity)
+    return json.dumps({"temperature": round(t, 2), "pressure": round(p, 2),
+                       "humidity": round(h, 2)})
+
+
+def as_dict(msg_type, seq, timestamp, fields):
+    """Turns the result of decode() into a dict with physical units."""
+    if msg_type == TYPE_SNAPSHOT:
+        t, p, h = snapshot_units(*fields)
+        data = {"temperature": t, "pressure": p, "humidity": h}
+    else:
+        mask, peak, duration, impulse, cop_x, cop_y = fields
+        data = {"mask": mask, "peak": peak, "duration": duration,
+                "impulse": impulse, "cop_x": cop_x / 1000,
+                "cop_y": cop_y / 1000}
+    data["type"] = msg_type
+    data["seq"] = seq
+    data["timestamp"] = timestamp
+    return data
+
+
+def decode_any(msg):
+    """
+    Decodes either a binary message or a JSON fallback message into a dict.
+    JSON messages are recognised by their leading '{'.
+    """
+    if msg[:1] == b"{":
+        return json.loads(msg)
+    return as_dict(*decode(msg))
@@ -0,0 +1,318 @@
+# pi_ingest.py
+# Runs on the Raspberry Pi: asyncio ingestion service for many mats.
+#
+# Subscribes to the topics of all mats (home/<mat>/state|event|trace|log
+# and the text events user|motion|pattern|routine), decodes the payloads and routes them into processing pipelines. Every
+# pipeline has a bounded queue and an overflow policy, so a slow consumer
+# costs dropped or delayed messages, never unbounded memory:
+#
+#   drop_oldest - newest data wins (telemetry: only the latest state matters)
+#   drop_new    - keep what is queued, discard the newcomer
+#   block       - stop reading from the broker until there is room; the
+#                 TCP connection pushes back to the broker
+#
+# Usage: python3 pi_ingest.py --broker 192.168.178.113 --traces traces
+import asyncio
+import json
+import os
+import time
+
+import event_log
+import mqtt_wire
+import payload
+
+DROP_OLDEST = "drop_oldest"
+DROP_NEW = "drop_new"
+BLOCK = "block"
+
+
+class Pipeline:
+    """A bounded queue with worker tasks calling `handler(mat, data)`."""
+
+    def __init__(self, name, handler, maxsize=1000, policy=DROP_OLDEST, workers=1):
+        self.name = name
+        self.handler = handler
+        self.policy = policy
+        self.workers = workers
+        self.queue = asyncio.Queue(maxsize)
+        self.enqueued = 0
+        self.processed = 0
+        self.dropped = 0
+        self.errors = 0
+        self.high_water = 0
+        self.busy_s = 0.0
+        self.blocked_s = 0.0
+        self._tasks = []
+
+    async def put(self, item):
+        queue = self.queue
+        if queue.full():
+            if self.policy == DROP_NEW:
+                self.dropped += 1
+                return
+            if self.policy == DROP_OLDEST:
+                queue.get_nowait()
+                queue.task_done()
+                self.dropped += 1
+            else:
+                start = time.monotonic()
+                await queue.put(item)
+                self.blocked_s += time.monotonic() - start
+                self._accepted()
+                return
+        queue.put_nowait(item)
+        self._accepted()
+
+    def _accepted(self):
+        self.enqueued += 1
+        if self.queue.qsize() > self.high_water:
+            self.high_water = self.queue.qsize()
+
+    def start(self):
+        self._tasks = [asyncio.ensure_future(self._work()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def _work(self):
+        while True:
+            mat, data = await self.queue.get()
+            start = time.monotonic()
+            try:
+                result = self.handler(mat, data)
+                if asyncio.iscoroutine(result):
+                    await result
+                self.processed += 1
+            except Exception as e:
+                self.errors += 1
+                print("Pipeline", self.name, "failed:", e)
+            finally:
+                self.busy_s += time.monotonic() - start
+                self.queue.task_done()
+
+    def metrics(self):
+        return {
+            "queued": self.queue.qsize(),
+            "capacity": self.queue.maxsize,
+            "enqueued": self.enqueued,
+            "processed": self.processed,
+            "dropped": self.dropped,
+            "errors": self.errors,
+            "high_water": self.high_water,
+            "busy_s": round(self.busy_s, 3),
+            "blocked_s": round(self.blocked_s, 3),
+        }
+
+
+def log_events(msg):
+    """
+    Decodes an event log upload (event_log.py) into event dicts. Each has
+    "kind", "log_seq", "boot" and the mat's "timestamp"; "age_ms" is set when
+    the event is from the mat's current boot. Footsteps also carry the
+    decoded payload fields, other events their text as "value". A record
+    that does not decode keeps its body as hex in "raw", so one bad record
+    does not cost the rest of the upload.
+    """
+    boot, now, records = event_log.decode_upload(msg)
+    kinds = {event_log.KIND_FOOTSTEP: "footstep", event_log.KIND_USER: "user",
+             event_log.KIND_MOTION: "motion", event_log.KIND_PIN: "pin",
+             event_log.KIND_SNAPSHOT: "snapshot", event_log.KIND_ROUTINE: "routine"}
+    events = []
+    for seq, timestamp, rec_boot, kind, body in records:
+        data = {"kind": kinds.get(kind, kind), "log_seq": seq, "boot": rec_boot,
+                "timestamp": timestamp, "logged": True}
+        if rec_boot == boot:
+            data["age_ms"] = (now - timestamp) & 0x3FFFFFFF  # ticks_ms wrap at 2**30
+        try:
+            if kind in (event_log.KIND_FOOTSTEP, event_log.KIND_SNAPSHOT):
+                data.update(payload.decode_any(body))
+            else:
+                data["value"] = body.decode()
+        except ValueError:  # Also UnicodeDecodeError
+            data["raw"] = body.hex()
+        events.append(data)
+    return events
+
+
+class IngestService:
+    """
+    Reads from the broker, decodes and routes messages:
+      state topics -> "telemetry" pipeline (decoded dict)
+      event topics -> "events" pipeline (decoded dict)
+      trace topics -> "traces" pipeline (raw chunk, decoded by the consumer)
+      log topics   -> "events" pipeline, one dict per event the mat logged
+                      while offline (see log_events)
+      user, motion, pattern and routine topics
+                   -> "events" pipeline, {"kind": ..., "value": text}, the
+                      kinds named as in log_events
+    """
+
+    TOPICS = ("home/+/state", "home/+/event", "home/+/trace", "home/+/log",
+              "home/+/user", "home/+/motion", "home/+/pattern", "home/+/routine")
+    # Topic name -> event kind of the text events
+    TEXT_KINDS = {"user": "user", "motion": "motion", "pattern": "pin", "routine": "routine"}
+
+    def __init__(self, host, port=1883, user=None, password=None, client_id="pi-ingest"):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.client_id = client_id
+        self.pipelines = {}
+        self.received = 0
+        self.decode_errors = 0
+        self.unrouted = 0
+        self.reconnects = 0
+        self.latest = {}  # mat -> last telemetry dict, one entry per mat
+        self._writer = None
+
+    def add_pipeline(self, kind, pipeline):
+        """kind: "telemetry", "events" or "traces"."""
+        self.pipelines[kind] = pipeline
+        return pipeline
+
+    async def route(self, topic, msg):
+        self.received += 1
+        parts = topic.split("/")
+        if len(parts) < 3:
+            self.unrouted += 1
+            return
+        mat, kind = parts[1], parts[2]
+        try:
+            if kind == "trace":
+                pipeline, data = self.pipelines.get("traces"), msg
+            elif kind == "state":
+                data = payload.decode_any(msg)
+                self.latest[mat] = data
+                pipeline = self.pipelines.get("telemetry")
+            elif kind == "event":
+                pipeline, data = self.pipelines.get("events"), payload.decode_any(msg)
+            elif kind == "log":
+                pipeline = self.pipelines.get("events")
+                if pipeline is not None:
+                    for data in log_events(msg):
+                        if "raw" in data:
+                            self.decode_errors += 1
+                        await pipeline.put((mat, data))
+                    return
+            elif kind in self.TEXT_KINDS and len(parts) == 3:
+                pipeline = self.pipelines.get("events")
+                data = {"kind": self.TEXT_KINDS[kind], "value": msg.decode()}
+            else:
+                pipeline = None
+        except ValueError:  # Also UnicodeDecodeError
+            self.decode_errors += 1
+            return
+        if pipeline is None:
+            self.unrouted += 1
+            return
+        await pipeline.put((mat, data))
+
+    def metrics(self):
+        return {
+            "received": self.received,
+            "decode_errors": self.decode_errors,
+            "unrouted": self.unrouted,
+            "reconnects": self.reconnects,
+            "mats": len(self.latest),
+            "pipelines": {name: p.metrics() for name, p in self.pipelines.items()},
+        }
+
+    async def run(self, keepalive=60):
+        """Connects and ingests forever, reconnecting with backoff."""
+        for p in self.pipelines.values():
+            p.start()
+        delay = 1
+        while True:
+            try:
+                await self._session(keepalive)
+                delay = 1
+            except (OSError, asyncio.IncompleteReadError) as e:
+                print("Broker connection lost:", e)
+            self.reconnects += 1
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 30)
+
+    async def _session(self, keepalive):
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        self._writer = writer
+        try:
+            writer.write(mqtt_wire.connect(self.client_id, self.user, self.password, keepalive))
+            ptype, _, body = await mqtt_wire.read_packet(reader)
+            if ptype != mqtt_wire.CONNACK or body[1]:
+                raise OSError("Connection refused by broker")
+            writer.write(mqtt_wire.subscribe(1, self.TOPICS))
+            print("Ingesting", ", ".join(self.TOPICS), "from", self.host)
+            pinger = asyncio.ensure_future(self._ping(writer, keepalive))
+            try:
+                while True:
+                    ptype, flags, body = await mqtt_wire.read_packet(reader)
+                    if ptype == mqtt_wire.PUBLISH:
+                        topic, msg, _, _, _ = mqtt_wire.parse_publish(flags, body)
+                        await self.route(topic, msg)
+            finally:
+                pinger.cancel()
+        finally:
+            self._writer = None
+            writer.close()
+
+    async def _ping(self, writer, keepalive):
+        while True:
+            await asyncio.sleep(keepalive / 2)
+            writer.write(mqtt_wire.packet(mqtt_wire.PINGREQ))
+
+    def publish(self, topic, msg, retain=False):
+        """Publishes on the ingestion connection, if connected."""
+        if self._writer is not None:
+            self._writer.write(mqtt_wire.publish(topic, msg, retain))
+
+
+async def report_metrics(service, interval, topic=None):
+    """Prints (and optionally publishes) the service metrics periodically."""
+    while True:
+        await asyncio.sleep(interval)
+        metrics = service.metrics()
+        print(json.dumps(metrics))
+        if topic:
+            service.publish(topic, json.dumps(metrics).encode())
+
+
+def main():
+    import argparse
+    from trace_receiver import TraceAssembler
+
+    parser = argparse.ArgumentParser(description="Smart Carpet ingestion service")
+    parser.add_argument("--broker", default="192.168.178.113")
+    parser.add_argument("--port", type=int, default=1883)
+    parser.add_argument("--user", default=os.environ.get("MQTT_USER"))
+    parser.add_argument("--password", default=os.environ.get("MQTT_PASS"))
+    parser.add_argument("--traces", help="directory for raw traces (off if not set)")
+    parser.add_argument("--queue", type=int, default=1000, help="capacity per pipeline")
+    parser.add_argument("--metrics-interval", type=float, default=30)
+    parser.add_argument("--metrics-topic", default="home/ingest/metrics")
+    args = parser.parse_args()
+
+    service = IngestService(args.broker, args.port, args.user, args.password)
+    service.add_pipeline("telemetry", Pipeline(
+        "telemetry", lambda mat, data: None, args.queue, DROP_OLDEST))
+    service.add_pipeline("events", Pipeline(
+        "events", lambda mat, data: print("Event on", mat, data), args.queue, BLOCK))
+    if args.traces:
+        assembler = TraceAssembler(args.traces)
+        service.add_pipeline("traces", Pipeline(
+            "traces", assembler.feed, args.queue, DROP_NEW))
+
+    async def run():
+        asyncio.ensure_future(report_metrics(service, args.metrics_interval, args.metrics_topic))
+        await service.run()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        print(json.dumps(service.metrics()))
+
+
+if __name__ == "__main__":
+    main()
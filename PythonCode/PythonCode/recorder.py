@@ -0,0 +1,161 @@
+# recorder.py
+# Compact binary recording of everything the mat's logic reads.
+#
+# A recording is a file header followed by records:
+#
+#   header: magic "MREC" | version (B) | channels (B)
+#   record: type (B) | body length (H) | timestamp in ms (I) | body
+#
+#   REC_ADC   one scan, channels x H
+#   REC_PIR   PIR level, B
+#   REC_ENV   BME280 reading, <iII (payload.py units)
+#   REC_MQTT  received message: topic length (B) | topic | message
+#   REC_TICK  end of one loop iteration (no body)
+#   REC_TIER  governor tier from now on, B (at the start and on every change)
+#
+# Records are collected in a preallocated buffer and handed to a sink in
+# chunks: a file on flash, or MQTT messages that concatenate to the same
+# byte stream. replay.py feeds recordings back through mat_logic.MatLogic.
+try:
+    from ustruct import pack_into, unpack_from
+except ImportError:
+    from struct import pack_into, unpack_from
+import time
+
+MAGIC = b"MREC"
+VERSION = 1
+_FILE_HEADER = "<4sBB"
+FILE_HEADER_SIZE = 6
+_RECORD = "<BHI"
+RECORD_SIZE = 7
+
+REC_ADC = 1
+REC_PIR = 2
+REC_ENV = 3
+REC_MQTT = 4
+REC_TICK = 5
+REC_TIER = 6
+
+
+class Recorder:
+    """
+    Writes records through `write(chunk)`, e.g. a file's write method or a
+    function publishing chunks via MQTT. The chunk is a memoryview of the
+    internal buffer, valid only during the call.
+
+    max_bytes limits the size of the recording (for flash); records that
+    no longer fit are counted in `dropped`.
+    """
+
+    def __init__(self, write, channels, buffer_size=512, max_bytes=None, flush_ms=5000):
+        self.write = write
+        self.channels = channels
+        self.buf = bytearray(buffer_size)
+        self.mv = memoryview(self.buf)
+        self.max_bytes = max_bytes
+        self.flush_ms = flush_ms
+        self.used = 0          # bytes in the buffer
+        self.written = 0       # bytes handed to the sink
+        self.records = 0
+        self.dropped = 0
+        self._last_flush = time.ticks_ms()
+        pack_into(_FILE_HEADER, self.buf, 0, MAGIC, VERSION, channels)
+        self.used = FILE_HEADER_SIZE
+
+    def _reserve(self, rec_type, timestamp, size):
+        """Starts a record; returns the offset of its body or -1."""
+        total = RECORD_SIZE + size
+        if self.max_bytes is not None and self.written + self.used + total > self.max_bytes:
+            self.dropped += 1
+            return -1
+        if self.used + total > len(self.buf):
+            self.flush()
+            if total > len(self.buf):
+                self.dropped += 1
+                return -1
+        pos = self.used
+        pack_into(_RECORD, self.buf, pos, rec_type, size, timestamp & 0xFFFFFFFF)
+        self.used = pos + total
+        self.records += 1
+        return pos + RECORD_SIZE
+
+    def adc(self, timestamp, values):
+        pos = self._reserve(REC_ADC, timestamp, 2 * self.channels)
+        if pos >= 0:
+            for i in range(self.channels):
+                pack_into("<H", self.buf, pos + 2 * i, values[i])
+
+    def pir(self, timestamp, level):
+        pos = self._reserve(REC_PIR, timestamp, 1)
+        if pos >= 0:
+            self.buf[pos] = level
+
+    def env(self, timestamp, data):
+        pos = self._reserve(REC_ENV, timestamp, 12)
+        if pos >= 0:
+            pack_into("<iII", self.buf, pos, data[0], data[1], data[2])
+
+    def mqtt(self, timestamp, topic, msg):
+        pos = self._reserve(REC_MQTT, timestamp, 1 + len(topic) + len(msg))
+        if pos >= 0:
+            self.buf[pos] = len(topic)
+            pos += 1
+            self.buf[pos:pos + len(topic)] = topic
+            pos += len(topic)
+            self.buf[pos:pos + len(msg)] = msg
+
+    def tier(self, timestamp, tier):
+        pos = self._reserve(REC_TIER, timestamp, 1)
+        if pos >= 0:
+            self.buf[pos] = tier
+
+    def tick(self, timestamp):
+        """Marks the end of a loop iteration; flushes every flush_ms."""
+        self._reserve(REC_TICK, timestamp, 0)
+        if time.ticks_diff(timestamp, self._last_flush) >= self.flush_ms:
+            self.flush()
+
+    def flush(self):
+        self._last_flush = time.ticks_ms()
+        if self.used:
+            self.write(self.mv[:self.used])
+            self.written += self.used
+            self.used = 0
+
+
+def read(data):
+    """
+    Parses a recording. Returns (channels, records), records being a list
+    of (type, timestamp, body) with body a bytes object.
+    Raises ValueError if data is not a recording. A truncated last record
+    (power loss while writing) is ignored.
+    """
+    if len(data) < FILE_HEADER_SIZE:
+        raise ValueError("Recording too short")
+    magic, version, channels = unpack_from(_FILE_HEADER, data, 0)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("Not a recording (version {})".format(VERSION))
+    records = []
+    pos = FILE_HEADER_SIZE
+    while pos + RECORD_SIZE <= len(data):
+        rec_type, size, timestamp = unpack_from(_RECORD, data, pos)
+        pos += RECORD_SIZE
+        if pos + size > len(data):
+            break
+        records.append((rec_type, timestamp, bytes(data[pos:pos + size])))
+        pos += size
+    return channels, records
+
+
+def adc_values(body, channels):
+    return unpack_from("<{}H".format(channels), body, 0)
+
+
+def env_values(body):
+    return unpack_from("<iII", body, 0)
+
+
+def mqtt_message(body):
+    """(topic, msg) of a REC_MQTT body."""
+    n = body[0]
+    return bytes(body[1:1 + n]), bytes(body[1 + n:])
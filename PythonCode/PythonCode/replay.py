@@ -0,0 +1,181 @@
+# replay.py
+# Runs on the Raspberry Pi or a PC: deterministic replay of mat recordings.
+#
+# Feeds a recording (recorder.py) through mat_logic.MatLogic under CPython,
+# as fast as the CPU allows. Everything the logic does (LED colours, beeps,
+# MQTT publishes, display texts) is captured with the recorded timestamp,
+# so two runs of the same recording produce the same output. Compare the
+# output with an earlier run to regression-test a change of the logic:
+#
+#   python3 replay.py record.bin --write golden.txt      # reference run
+#   python3 replay.py record.bin --expect golden.txt     # after a change
+#
+# Several files are replayed in order, e.g. months of daily recordings.
+# Recorded tier changes (governor.py) and config topic messages change the
+# display period and the runtime settings as they did on the mat.
+# With --patterns, footsteps are also checked against the step patterns of
+# a patterns.bin copied from the mat; the file itself is never changed.
+import sys
+import time
+
+import sim_hal
+
+sim_hal.install()  # network / umqtt / ticks for mqtt_connection and mat_logic
+
+import config
+import identify
+import mat_logic
+import mqtt_connection
+import pattern_lock
+import recorder
+from app.link import TOPIC_CONFIG
+from governor import TIERS
+
+
+class CaptureOutputs:
+    """The `out` of MatLogic: records every action as one line of text."""
+
+    def __init__(self):
+        self.now = 0
+        self.lines = []
+
+    def _add(self, text):
+        self.lines.append("{} {}".format(self.now, text))
+
+    def set_led_color(self, red, green, blue):
+        self._add("led {} {} {}".format(red, green, blue))
+
+    def beep(self, frequency, duration):
+        self._add("beep {} {}".format(frequency, duration))
+
+    def publish(self, topic, msg):
+        if isinstance(msg, str):
+            msg = msg.encode()
+        self._add("publish {} {}".format(bytes(topic).decode(), bytes(msg).hex()))
+
+    def show(self, message):
+        self._add("show {}".format(message))
+
+    def blank(self):
+        self._add("blank")
+
+
+def replay(records, channels, out, rows=2, cols=2, patterns=None, **logic_args):
+    """
+    Runs records (from recorder.read) through a fresh MatLogic, with a
+    PatternLock loaded from the pattern file `patterns` if given.
+    Returns (number of loop iterations, recorded duration in ms).
+    """
+    mqtt_connection.received_temperature = None
+    mqtt_connection.received_transport_info = None
+    if rows * cols != channels:
+        raise ValueError("{}x{} grid does not match {} recorded channels".format(rows, cols, channels))
+    start = records[0][1] if records else 0
+    if patterns:
+        lock = pattern_lock.PatternLock(start, rows, cols, path=patterns)
+        lock.path = None  # Enrollments and failures stay in RAM
+        logic_args["lock"] = lock
+    logic = mat_logic.MatLogic(out, start, rows, cols, **logic_args)
+    mqtt_connection.register_handler(mat_logic.TOPIC_PATTERN_ENROLL,
+                                     lambda msg: logic.pattern_command(out.now, msg))
+    # The settings the logic started with, changed by config messages as on the mat
+    state = {"cfg": config.validate({name: value for name, value in logic_args.items()
+                                     if name in config.DEFAULTS}),
+             "tier": None}  # Unknown in recordings without REC_TIER: fixed display period
+
+    def apply_tier():
+        tier = state["tier"]
+        if tier is not None:
+            logic.display_period = TIERS[tier][1] or state["cfg"].display_period
+
+    def config_message(msg):
+        old = state["cfg"]
+        try:
+            new = config.validate(config.parse_message(msg), old)
+        except ValueError:
+            return  # Rejected on the mat as well
+        state["cfg"] = new
+        logic.apply_config(new, [name for name, a, b in zip(config.NAMES, old, new) if a != b])
+        apply_tier()
+
+    mqtt_connection.register_handler(TOPIC_CONFIG, config_message)
+    loops = 0
+    for rec_type, timestamp, body in records:
+        out.now = timestamp
+        if rec_type == recorder.REC_ADC:
+            logic.sample(timestamp, recorder.adc_values(body, channels))
+        elif rec_type == recorder.REC_PIR:
+            logic.motion(timestamp, body[0])
+        elif rec_type == recorder.REC_ENV:
+            logic.environment(timestamp, recorder.env_values(body))
+        elif rec_type == recorder.REC_MQTT:
+            mqtt_connection.message_callback(*recorder.mqtt_message(body))
+        elif rec_type == recorder.REC_TICK:
+            logic.tick(timestamp)
+            loops += 1
+        elif rec_type == recorder.REC_TIER:
+            state["tier"] = body[0]
+            apply_tier()
+    duration = time.ticks_diff(records[-1][1], start) if records else 0
+    return loops, duration
+
+
+def main():
+    import argparse
+    import contextlib
+    import io
+
+    parser = argparse.ArgumentParser(description="Replay Smart Carpet recordings")
+    parser.add_argument("recordings", nargs="+")
+    parser.add_argument("--grid", default="2x2", help="rows x cols of the mat")
+    parser.add_argument("--threshold", type=int, default=mat_logic.THRESHOLD)
+    parser.add_argument("--format", default="json", choices=("json", "binary"))
+    parser.add_argument("--model", help="identification model (users.idm)")
+    parser.add_argument("--patterns", help="step pattern file (patterns.bin)")
+    parser.add_argument("--write", help="write the captured output to this file")
+    parser.add_argument("--expect", help="compare the captured output with this file")
+    parser.add_argument("--verbose", action="store_true", help="show the logic's prints")
+    args = parser.parse_args()
+
+    rows, cols = (int(v) for v in args.grid.split("x"))
+    model = identify.load(args.model) if args.model else None
+    out = CaptureOutputs()
+    total_loops = 0
+    total_ms = 0
+    elapsed = 0.0
+    for path in args.recordings:
+        with open(path, "rb") as f:
+            channels, records = recorder.read(f.read())
+        started = time.perf_counter()
+        with contextlib.redirect_stdout(sys.stdout if args.verbose else io.StringIO()):
+            loops, duration = replay(records, channels, out, rows, cols, args.patterns,
+                                     threshold=args.threshold, payload_format=args.format,
+                                     user_model=model, verbose=args.verbose)
+        elapsed += time.perf_counter() - started
+        total_loops += loops
+        total_ms += duration
+
+    print("{} recordings, {} loop iterations, {} actions".format(
+        len(args.recordings), total_loops, len(out.lines)))
+    print("recorded {:.1f} s, replayed in {:.3f} s ({:.0f}x real time, {:.0f} loops/s)".format(
+        total_ms / 1000, elapsed, total_ms / 1000 / elapsed if elapsed else 0,
+        total_loops / elapsed if elapsed else 0))
+
+    if args.write:
+        with open(args.write, "w") as f:
+            f.write("\n".join(out.lines) + "\n")
+    if args.expect:
+        with open(args.expect) as f:
+            expected = f.read().splitlines()
+        for i, (want, got) in enumerate(zip(expected, out.lines)):
+            if want != got:
+                print("Mismatch at action {}:\n  expected: {}\n  got:      {}".format(i, want, got))
+                sys.exit(1)
+        if len(expected) != len(out.lines):
+            print("Expected {} actions, got {}".format(len(expected), len(out.lines)))
+            sys.exit(1)
+        print("Output matches", args.expect)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+# routine.py
+# Movement patterns at the door: entering, leaving, lingering and objects
+# put down on the mat (package drop).
+#
+# The classifier runs alongside the footstep extractor and keeps only
+# running sums, so its cost per sample is constant and it allocates
+# nothing:
+#   - the total load of the last WINDOW samples (sum and sum of squares,
+#     one value in and one out per sample) gives mean and variance. A load
+#     that stays put for OBJECT_MS while the PIR sees nobody is an object.
+#     Its load per zone goes into `baseline` (shared with the footstep
+#     extractor) and is subtracted from later samples, so a package neither
+#     keeps the mat active nor merges the steps of the next visitor.
+#   - a visit (episode) starts with motion or a step and ends after
+#     VISIT_GAP_MS without either. Its steps are summed up as they finish:
+#     how far the centre of pressure moved from the first to the last step
+#     and the mean roll of the foot inside a step (heel to toe). Forward
+#     (towards the back edge, y > 0, inside the house) is entering, backward
+#     is leaving.
+#   - lingering: someone stands on the mat with the centre of pressure
+#     staying within LINGER_MOVE of one spot for LINGER_MS. Shifting weight
+#     is fine; walking about, or motion off the mat, is not lingering.
+# Every result is one discrete event, e.g. for Home Assistant automations.
+from array import array
+import time
+from footstep import zone_centres
+
+ENTER = b"enter"
+LEAVE = b"leave"
+LINGER = b"linger"
+OBJECT = b"object"            # Static load left on the mat
+OBJECT_REMOVED = b"object_removed"
+
+WINDOW = 32               # Samples of the load window
+FLOOR = 20                # ADC readings below this are noise
+OBJECT_MIN = 40           # Mean (scaled) load of an object
+OBJECT_MS = 5000          # The load stays put this long without motion
+VISIT_GAP_MS = 3000       # No motion and no step this long ends a visit
+LINGER_MS = 20000         # Standing this long in one spot is lingering
+LINGER_MOVE = 150         # COP travel per mille that still counts as one spot
+STAND_MIN = 200           # Load (sum of ADC values) of someone standing on the mat
+DIRECTION_MIN = 300       # COP travel per mille that counts as a direction
+
+
+class WindowStats:
+    """Mean and variance of the last `size` values, updated in constant time."""
+
+    def __init__(self, size=WINDOW):
+        self.size = size
+        self.values = array("i", [0] * size)
+        self.count = 0
+        self.total = 0
+        self.squares = 0
+        self._next = 0
+
+    def push(self, value):
+        i = self._next
+        if self.count == self.size:
+            old = self.values[i]
+            self.total -= old
+            self.squares -= old * old
+        else:
+            self.count += 1
+        self.values[i] = value
+        self.total += value
+        self.squares += value * value
+        self._next = (i + 1) % self.size
+
+    def full(self):
+        return self.count == self.size
+
+    def mean(self):
+        return self.total // self.count if self.count else 0
+
+    def variance(self):
+        if not self.count:
+            return 0
+        mean = self.total // self.count
+        return self.squares // self.count - mean * mean
+
+
+class RoutineClassifier:
+    """
+    rows, cols:  the FSR grid
+    on_event:    on_event(now, event), event one of the constants above
+    baseline:    array("H") of the object load per zone, e.g. the footstep
+                 extractor's; by default an own one
+
+    Feed it like MatLogic: motion() per PIR edge, sample() per scan,
+    step() per finished footstep, tick() once per loop.
+    """
+
+    def __init__(self, rows, cols, on_event=None, baseline=None):
+        self.zones = zones = rows * cols
+        self.on_event = on_event
+        self._x, self._y = zone_centres(rows, cols)
+        self.baseline = array("H", [0] * zones) if baseline is None else baseline
+        self.object_total = 0      # Sum of the baseline, the object's total load
+        # Loads are scaled down so that squares of a window stay small ints on the ESP32
+        self.shift = 0
+        while (1023 * zones) >> self.shift > 1023:
+            self.shift += 1
+        self.load = WindowStats(WINDOW)
+        self.motion_level = 0
+        self.stable_since = None   # First sample of the current static load
+        self.object_load = 0       # Mean load of the object on the mat, 0 if none
+        self.events = 0
+        # The current visit
+        self.visiting = False
+        self.visit_start = 0
+        self.last_activity = 0
+        self.lingered = False
+        self.still_since = None    # Standing within LINGER_MOVE of (still_x, still_y) since
+        self.still_x = 0
+        self.still_y = 0
+        self.steps = 0
+        self.first_y = 0
+        self.last_y = 0
+        self.roll = 0              # Sum of the steps' heel-to-toe COP travel
+
+    def _emit(self, now, event):
+        self.events += 1
+        if self.on_event:
+            self.on_event(now, event)
+
+    def _activity(self, now):
+        if not self.visiting:
+            self.visiting = True
+            self.visit_start = now
+            self.lingered = False
+            self.still_since = None
+            self.steps = 0
+            self.roll = 0
+        self.last_activity = now
+
+    def motion(self, now, level):
+        self.motion_level = level
+        self._activity(now)
+
+    def sample(self, now, values):
+        load = 0
+        net = 0  # Without the object
+        sx = 0
+        sy = 0
+        baseline = self.baseline
+        xs = self._x
+        ys = self._y
+        for i in range(self.zones):
+            v = values[i]
+            if v >= FLOOR:
+                load += v
+            v -= baseline[i]
+            if v >= FLOOR:
+                net += v
+                sx += v * xs[i]
+                sy += v * ys[i]
+        if self.visiting:
+            self._stand(now, net, sx, sy)
+        window = self.load
+        window.push(load >> self.shift)
+        if not window.full():
+            return
+        mean = window.mean()
+        if self.object_load:
+            if mean < self.object_load >> 1:
+                self.object_load = 0
+                for i in range(self.zones):
+                    baseline[i] = 0
+                self.object_total = 0
+                self._emit(now, OBJECT_REMOVED)
+            return
+        # Static: standard deviation within 1/8 of the mean
+        limit = mean >> 3
+        if mean < OBJECT_MIN or window.variance() > limit * limit:
+            self.stable_since = None
+        elif self.stable_since is None:
+            self.stable_since = now
+        elif not self.motion_level and time.ticks_diff(now, self.stable_since) >= OBJECT_MS \
+                and time.ticks_diff(now, self.last_activity) >= OBJECT_MS:
+            self.object_load = mean
+            for i in range(self.zones):
+                v = values[i]
+                baseline[i] = v if v >= FLOOR else 0
+            self.object_total = load
+            self._emit(now, OBJECT)
+
+    def _stand(self, now, load, sx, sy):
+        """Tracks how long the centre of pressure has stayed in one spot."""
+        if load < STAND_MIN:
+            self.still_since = None
+            return
+        x = sx // load
+        y = sy // load
+        if self.still_since is None or abs(x - self.still_x) > LINGER_MOVE \
+                or abs(y - self.still_y) > LINGER_MOVE:
+            self.still_since = now
+            self.still_x = x
+            self.still_y = y
+
+    def step(self, step):
+        """A finished footstep.Footstep."""
+        now = step.offset
+        self._activity(now)
+        if not self.steps:
+            self.first_y = step.cop_y
+        self.last_y = step.cop_y
+        if step.points:
+            traj = step.trajectory
+            self.roll += traj[2 * step.points - 1] - traj[1]
+        self.steps += 1
+
+    def tick(self, now):
+        """Lingering and the end of a visit."""
+        if not self.visiting:
+            return
+        if not self.lingered and self.still_since is not None \
+                and time.ticks_diff(now, self.still_since) >= LINGER_MS:
+            self.lingered = True
+            self._emit(now, LINGER)
+        if self.motion_level or time.ticks_diff(now, self.last_activity) < VISIT_GAP_MS:
+            return
+        self.visiting = False
+        if not self.steps:
+            return
+        direction = self.last_y - self.first_y + self.roll // self.steps
+        if direction >= DIRECTION_MIN:
+            self._emit(now, ENTER)
+        elif direction <= -DIRECTION_MIN:
+            self._emit(now, LEAVE)
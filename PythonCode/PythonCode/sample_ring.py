@@ -0,0 +1,49 @@
+# sample_ring.py
+# Fixed-size ring buffer for timestamped pressure sensor samples.
+from array import array
+
+
+class SampleRing:
+    """
+    Stores the last `capacity` samples of `channels` 10-bit ADC values
+    together with their timestamp (ms). All storage is allocated once.
+
+    Every sample gets a running index (`written` counts all samples ever
+    pushed). Consumers keep their own index as a cursor, so several readers
+    (trace streaming, feature extraction, recording) can share one ring.
+    """
+
+    def __init__(self, capacity=256, channels=4):
+        self.capacity = capacity
+        self.channels = channels
+        self.values = array("H", [0] * (capacity * channels))
+        self.timestamps = array("I", [0] * capacity)
+        self.written = 0
+
+    def push(self, timestamp, values):
+        """Appends one sample; values holds one reading per channel."""
+        slot = self.written % self.capacity
+        self.timestamps[slot] = timestamp & 0xFFFFFFFF
+        base = slot * self.channels
+        v = self.values
+        for i in range(self.channels):
+            v[base + i] = values[i]
+        self.written += 1
+
+    def oldest(self):
+        """Index of the oldest sample still held in the ring."""
+        return max(0, self.written - self.capacity)
+
+    def available(self, cursor):
+        """Number of samples written since cursor (may exceed capacity)."""
+        return self.written - cursor
+
+    def slot(self, index):
+        """Position of sample `index` in the storage arrays."""
+        return index % self.capacity
+
+    def value(self, index, channel):
+        return self.values[(index % self.capacity) * self.channels + channel]
+
+    def timestamp(self, index):
+        return self.timestamps[index % self.capacity]
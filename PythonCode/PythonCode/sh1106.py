@@ -89,7 +89,7 @@ _SET_PAGE_ADDRESS    = const(0xB0)
 
 class SH1106(framebuf.FrameBuffer):
 
-    def __init__(self, width, height, external_vcc, rotate=0):
+    def __init__(self, width, height, external_vcc, rotate=0, buf=None):
         self.width = width
         self.height = height
         self.external_vcc = external_vcc
@@ -97,8 +97,10 @@ class SH1106(framebuf.FrameBuffer):
         self.rotate90 = rotate == 90 or rotate == 270
         self.pages = self.height // 8
         self.bufsize = self.pages * self.width
-        self.renderbuf = bytearray(self.bufsize)
+        # buf: a frame buffer allocated at boot (mem_policy), else a new one
+        self.renderbuf = buf if buf is not None else bytearray(self.bufsize)
         self.pages_to_update = 0
+        self.pages_to_send = 0
 
         if self.rotate90:
             self.displaybuf = bytearray(self.bufsize)
@@ -112,6 +114,12 @@ class SH1106(framebuf.FrameBuffer):
             super().__init__(self.renderbuf, self.width, self.height,
                              framebuf.MONO_VLSB)
 
+        # One view per page of the display buffer, so sending a page copies
+        # and allocates nothing
+        mv = memoryview(self.displaybuf)
+        self.page_views = tuple(mv[self.width * p:self.width * (p + 1)]
+                                for p in range(self.pages))
+
         # flip() was called rotate() once, provide backwards compatibility.
         self.rotate = self.flip
         self.init_display()
@@ -154,25 +162,41 @@ class SH1106(framebuf.FrameBuffer):
         self.write_cmd(_SET_NORM_INV | (invert & 1))
 
     def show(self, full_update = False):
+        self.start_show(full_update)
+        while self.show_step():
+            pass
+
+    def start_show(self, full_update = False):
+        # Prepares a refresh that show_step() sends one page at a time, so
+        # other devices on the bus can be served between pages.
         # self.* lookups in loops take significant time (~4fps).
-        (w, p, db, rb) = (self.width, self.pages,
-                          self.displaybuf, self.renderbuf)
         if self.rotate90:
+            (w, p) = (self.width, self.pages)
+            (db, rb) = (self.displaybuf, self.renderbuf)
             for i in range(self.bufsize):
                 db[w * (i % p) + (i // p)] = rb[i]
         if full_update:
-            pages_to_update = (1 << self.pages) - 1
+            self.pages_to_send |= (1 << self.pages) - 1
         else:
-            pages_to_update = self.pages_to_update
-        #print("Updating pages: {:08b}".format(pages_to_update))
-        for page in range(self.pages):
-            if (pages_to_update & (1 << page)):
-                self.write_cmd(_SET_PAGE_ADDRESS | page)
-                self.write_cmd(_LOW_COLUMN_ADDRESS | 2)
-                self.write_cmd(_HIGH_COLUMN_ADDRESS | 0)
-                self.write_data(db[(w*page):(w*page+w)])
+            self.pages_to_send |= self.pages_to_update
+        #print("Updating pages: {:08b}".format(self.pages_to_send))
         self.pages_to_update = 0
 
+    def show_step(self):
+        # Sends the next pending page. Returns True while pages remain.
+        pages_to_send = self.pages_to_send
+        if not pages_to_send:
+            return False
+        page = 0
+        while not pages_to_send & (1 << page):
+            page += 1
+        self.write_cmd(_SET_PAGE_ADDRESS | page)
+        self.write_cmd(_LOW_COLUMN_ADDRESS | 2)
+        self.write_cmd(_HIGH_COLUMN_ADDRESS | 0)
+        self.write_data(self.page_views[page])
+        self.pages_to_send = pages_to_send & ~(1 << page)
+        return self.pages_to_send != 0
+
     def pixel(self, x, y, color=None):
         if color is None:
             return super().pixel(x, y)
@@ -242,15 +266,16 @@ class SH1106(framebuf.FrameBuffer):
 
 class SH1106_I2C(SH1106):
     def __init__(self, width, height, i2c, res=None, addr=0x3c,
-                 rotate=0, external_vcc=False, delay=0):
+                 rotate=0, external_vcc=False, delay=0, buf=None):
         self.i2c = i2c
         self.addr = addr
         self.res = res
         self.temp = bytearray(2)
+        self.data_vector = [b'\x40', None]  # Co=0, D/C#=1 | data
         self.delay = delay
         if res is not None:
             res.init(res.OUT, value=1)
-        super().__init__(width, height, external_vcc, rotate)
+        super().__init__(width, height, external_vcc, rotate, buf)
 
     def write_cmd(self, cmd):
         self.temp[0] = 0x80  # Co=1, D/C#=0
@@ -258,7 +283,10 @@ class SH1106_I2C(SH1106):
         self.i2c.writeto(self.addr, self.temp)
 
     def write_data(self, buf):
-        self.i2c.writeto(self.addr, b'\x40'+buf)
+        # One transaction from two buffers instead of joining them (b'\x40'+buf)
+        vector = self.data_vector
+        vector[1] = buf
+        self.i2c.writevto(self.addr, vector)
 
     def reset(self):
         super().reset(self.res)
@@ -0,0 +1,391 @@
+# sim_hal.py
+# Simulated hardware abstraction layer: lets the MicroPython modules of the
+# mat (mqtt_connection, payload, trace_stream, ...) run unchanged under
+# CPython on the Raspberry Pi or a development machine.
+#
+# install() registers stand-ins for the MicroPython-only modules:
+#   network       - WLAN that is always connected
+#   umqtt.simple  - socket based MQTTClient with the umqtt API
+#   machine       - Pin, SPI (MCP3008 answering from `adc`), I2C (register
+#                   memory per address), PWM, lightsleep (timer wake only)
+#   neopixel, framebuf, micropython, utime
+# and adds the ticks_* helpers to the time module.
+import socket
+import sys
+import time
+import types
+import mqtt_wire
+
+_start = time.monotonic()
+
+
+def ticks_ms():
+    return int((time.monotonic() - _start) * 1000) & 0x3FFFFFFF
+
+
+def ticks_us():
+    return int((time.monotonic() - _start) * 1000000) & 0x3FFFFFFF
+
+
+def ticks_add(ticks, delta):
+    return (ticks + delta) & 0x3FFFFFFF
+
+
+def ticks_diff(a, b):
+    # Same wrap-around semantics as MicroPython's 30 bit ticks
+    return ((a - b + 0x20000000) & 0x3FFFFFFF) - 0x20000000
+
+
+def sleep_ms(ms):
+    time.sleep(ms / 1000)
+
+
+def sleep_us(us):
+    time.sleep(us / 1000000)
+
+
+class WLAN:
+
+    def __init__(self, interface=0):
+        self._active = False
+
+    def active(self, value=None):
+        if value is not None:
+            self._active = value
+        return self._active
+
+    def connect(self, ssid, password):
+        pass
+
+    def isconnected(self):
+        return True
+
+    def ifconfig(self):
+        return ("127.0.0.1", "255.0.0.0", "127.0.0.1", "127.0.0.1")
+
+
+class MQTTException(Exception):
+    pass
+
+
+class MQTTClient:
+    """Blocking MQTT client with the same interface as umqtt.simple."""
+
+    def __init__(self, client_id, server, port=0, user=None, password=None,
+                 keepalive=0, ssl=False, ssl_params=None):
+        self.client_id = client_id
+        self.server = server
+        self.port = port or 1883
+        self.user = user
+        self.pswd = password
+        self.keepalive = keepalive
+        self.sock = None
+        self.cb = None
+        self.pid = 0
+        self.lw = None
+
+    def set_callback(self, f):
+        self.cb = f
+
+    def set_last_will(self, topic, msg, retain=False, qos=0):
+        self.lw = (topic.decode() if isinstance(topic, bytes) else topic, msg, retain)
+
+    def connect(self, clean_session=True):
+        self.sock = socket.create_connection((self.server, self.port))
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.sock.sendall(mqtt_wire.connect(self.client_id, self.user, self.pswd,
+                                            self.keepalive, self.lw, clean_session))
+        ptype, _, body = mqtt_wire.read_packet_sock(self.sock)
+        if ptype != mqtt_wire.CONNACK or body[1]:
+            raise MQTTException(body[1] if len(body) > 1 else -1)
+        return False
+
+    def disconnect(self):
+        self.sock.sendall(mqtt_wire.packet(mqtt_wire.DISCONNECT))
+        self.sock.close()
+
+    def ping(self):
+        self.sock.sendall(mqtt_wire.packet(mqtt_wire.PINGREQ))
+
+    def publish(self, topic, msg, retain=False, qos=0):
+        if isinstance(topic, bytes):
+            topic = topic.decode()
+        if isinstance(msg, str):
+            msg = msg.encode()
+        self.sock.sendall(mqtt_wire.publish(topic, msg, retain))
+
+    def subscribe(self, topic, qos=0):
+        self.pid += 1
+        if isinstance(topic, bytes):
+            topic = topic.decode()
+        self.sock.sendall(mqtt_wire.subscribe(self.pid, [topic]))
+        while True:
+            if self.wait_msg() == mqtt_wire.SUBACK:
+                return
+
+    def wait_msg(self):
+        """Reads one packet, dispatching PUBLISH to the callback."""
+        self.sock.setblocking(True)
+        ptype, flags, body = mqtt_wire.read_packet_sock(self.sock)
+        if ptype == mqtt_wire.PUBLISH:
+            topic, msg, _, _, _ = mqtt_wire.parse_publish(flags, body)
+            if self.cb:
+                self.cb(topic.encode(), msg)
+            return None
+        return ptype
+
+    def check_msg(self):
+        """Dispatches a pending packet if there is one, without blocking."""
+        self.sock.setblocking(False)
+        try:
+            self.sock.recv(1, socket.MSG_PEEK)
+        except BlockingIOError:
+            return None
+        finally:
+            self.sock.setblocking(True)
+        return self.wait_msg()
+
+
+class Pin:
+    IN = 1
+    OUT = 3
+    PULL_UP = 1
+    PULL_DOWN = 2
+    IRQ_RISING = 1
+    IRQ_FALLING = 2
+    WAKE_LOW = 4
+    WAKE_HIGH = 5
+
+    def __init__(self, id, mode=-1, pull=-1, value=None):
+        self.id = id
+        self._value = value or 0
+        self._handler = None
+        self._trigger = 0
+
+    def init(self, mode=-1, pull=-1, value=None):
+        if value is not None:
+            self._value = value
+
+    def value(self, value=None):
+        if value is None:
+            return self._value
+        self.set(value)
+
+    __call__ = value
+
+    def irq(self, handler=None, trigger=3, wake=None, hard=False):
+        self._handler = handler
+        self._trigger = trigger
+
+    def set(self, value):
+        """Changes the level, calling the IRQ handler on a matching edge or level."""
+        old = self._value
+        self._value = 1 if value else 0
+        if not self._handler or old == self._value:
+            return
+        if self._trigger >= Pin.WAKE_LOW:
+            if self._trigger - Pin.WAKE_LOW == self._value:
+                self._handler(self)
+        elif self._trigger & (Pin.IRQ_RISING if self._value else Pin.IRQ_FALLING):
+            self._handler(self)
+
+
+class SPI:
+    """SPI bus with an MCP3008 on it: channel k answers adc[k]."""
+
+    def __init__(self, id=1, **kwargs):
+        self.adc = [0] * 8
+
+    def init(self, **kwargs):
+        pass
+
+    def write_readinto(self, tx, rx):
+        for i in range(0, len(tx) - 2, 3):
+            value = self.adc[(tx[i + 1] >> 4) & 0x07] & 0x3FF
+            rx[i] = 0
+            rx[i + 1] = value >> 8
+            rx[i + 2] = value & 0xFF
+
+    def write(self, buf):
+        pass
+
+
+class I2C:
+    """I2C bus whose devices are 256 byte register memories."""
+
+    def __init__(self, id=0, **kwargs):
+        self.mem = {}      # address -> bytearray(256)
+        self.written = 0   # bytes written with writeto/writevto
+
+    def add_device(self, addr, registers=None):
+        self.mem[addr] = bytearray(256) if registers is None else registers
+        return self.mem[addr]
+
+    def _device(self, addr):
+        try:
+            return self.mem[addr]
+        except KeyError:
+            raise OSError(19)  # ENODEV, as on the ESP32
+
+    def scan(self):
+        return sorted(self.mem)
+
+    def readfrom_mem(self, addr, memaddr, nbytes):
+        return bytes(self._device(addr)[memaddr:memaddr + nbytes])
+
+    def readfrom_mem_into(self, addr, memaddr, buf):
+        regs = self._device(addr)
+        for i in range(len(buf)):
+            buf[i] = regs[memaddr + i]
+
+    def writeto_mem(self, addr, memaddr, buf):
+        self._device(addr)[memaddr:memaddr + len(buf)] = buf
+
+    def readfrom_into(self, addr, buf):
+        self._device(addr)
+
+    def writeto(self, addr, buf):
+        self._device(addr)
+        self.written += len(buf)
+        return 1
+
+    def writevto(self, addr, vector):
+        self._device(addr)
+        for buf in vector:
+            self.written += len(buf)
+        return 1
+
+
+class PWM:
+
+    def __init__(self, pin, freq=0, duty=0):
+        self._freq = freq
+        self._duty = duty
+
+    def freq(self, value=None):
+        if value is None:
+            return self._freq
+        self._freq = value
+
+    def duty(self, value=None):
+        if value is None:
+            return self._duty
+        self._duty = value
+
+
+def lightsleep(ms=None):
+    if ms:
+        time.sleep(ms / 1000)
+
+
+class NeoPixel:
+    ORDER = (1, 0, 2, 3)
+
+    def __init__(self, pin, n, bpp=3):
+        self.pin = pin
+        self.n = n
+        self.bpp = bpp
+        self.buf = bytearray(n * bpp)
+        self.writes = 0
+
+    def __setitem__(self, index, value):
+        offset = index * self.bpp
+        for i in range(self.bpp):
+            self.buf[offset + self.ORDER[i]] = value[i]
+
+    def __getitem__(self, index):
+        offset = index * self.bpp
+        return tuple(self.buf[offset + self.ORDER[i]] for i in range(self.bpp))
+
+    def __len__(self):
+        return self.n
+
+    def write(self):
+        self.writes += 1
+
+
+class FrameBuffer:
+    """Keeps the buffer; drawing only fills and sets pixels."""
+
+    def __init__(self, buf, width, height, format, stride=None):
+        self.buf = buf
+
+    def fill(self, color):
+        value = 0xFF if color else 0
+        for i in range(len(self.buf)):
+            self.buf[i] = value
+
+    def pixel(self, x, y, color=None):
+        return 0
+
+    def text(self, s, x, y, color=1):
+        pass
+
+    def line(self, x0, y0, x1, y1, color):
+        pass
+
+    def hline(self, x, y, w, color):
+        pass
+
+    def vline(self, x, y, h, color):
+        pass
+
+    def fill_rect(self, x, y, w, h, color):
+        pass
+
+    def rect(self, x, y, w, h, color, fill=False):
+        pass
+
+    def blit(self, fbuf, x, y, key=-1, palette=None):
+        pass
+
+    def scroll(self, xstep, ystep):
+        pass
+
+
+def const(value):
+    return value
+
+
+def schedule(func, arg):
+    """Runs func(arg) at once; the real scheduler runs it after the ISR."""
+    func(arg)
+
+
+def _module(name, **attrs):
+    module = types.ModuleType(name)
+    for key, value in attrs.items():
+        setattr(module, key, value)
+    sys.modules[name] = module
+    return module
+
+
+def install():
+    """Registers the stand-in modules. Safe to call more than once."""
+    if "network" not in sys.modules:
+        network = types.ModuleType("network")
+        network.STA_IF = 0
+        network.AP_IF = 1
+        network.WLAN = WLAN
+        sys.modules["network"] = network
+    if "umqtt.simple" not in sys.modules:
+        umqtt = types.ModuleType("umqtt")
+        simple = types.ModuleType("umqtt.simple")
+        simple.MQTTClient = MQTTClient
+        simple.MQTTException = MQTTException
+        umqtt.simple = simple
+        sys.modules["umqtt"] = umqtt
+        sys.modules["umqtt.simple"] = simple
+    if "machine" not in sys.modules:
+        _module("machine", Pin=Pin, SPI=SPI, I2C=I2C, PWM=PWM, lightsleep=lightsleep,
+                SLEEP=2, DEEPSLEEP=4)
+    if "neopixel" not in sys.modules:
+        _module("neopixel", NeoPixel=NeoPixel)
+    if "framebuf" not in sys.modules:
+        _module("framebuf", FrameBuffer=FrameBuffer, MONO_VLSB=0, MONO_HLSB=3, MONO_HMSB=4)
+    if "micropython" not in sys.modules:
+        _module("micropython", const=const, schedule=schedule)
+    for f in (ticks_ms, ticks_us, ticks_add, ticks_diff, sleep_ms, sleep_us):
+        if not hasattr(time, f.__name__):
+            setattr(time, f.__name__, f)
+    sys.modules.setdefault("utime", time)
@@ -0,0 +1,13 @@
+# tests/conftest.py
+# The mat's modules are flat in the directory above; run from there:
+#   python3 -m pytest tests
+# sim_hal provides machine, utime's ticks functions and the other
+# MicroPython modules under CPython.
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import sim_hal  # noqa: E402
+
+sim_hal.install()
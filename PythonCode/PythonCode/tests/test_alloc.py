@@ -0,0 +1,32 @@
+# tests/test_alloc.py
+# The loop's hot paths must not allocate (alloc_check.py under sim_hal).
+import pytest
+
+import alloc_check
+
+HOT_PATHS = alloc_check.hot_paths()
+
+
+@pytest.mark.parametrize("name, fn", HOT_PATHS, ids=[name for name, _ in HOT_PATHS])
+def test_hot_path_does_not_allocate(name, fn):
+    findings, retained = alloc_check.inspect(fn)
+    assert findings == []
+    assert retained <= 4 * alloc_check.CALLS  # Growing with the calls would be a leak
+
+
+def test_long_step_keeps_small_ints():
+    # 31-bit small ints on the ESP32; anything larger is a heap-allocated big int
+    from array import array
+    from footstep import FootstepExtractor, IMPULSE_MAX
+    from sample_ring import SampleRing
+    extractor = FootstepExtractor(SampleRing(capacity=4, channels=4), 2, 2)
+    lopsided = array("H", (1023, 1023, 1023, 300))
+    for n in range(30000):  # 10 minutes at 50 Hz
+        extractor.update(n * 20, lopsided)
+        assert max(abs(extractor._wx), abs(extractor._wy), extractor._w,
+                   extractor.step.impulse) < 1 << 30
+    assert extractor.update(30000 * 20, array("H", (0, 0, 0, 0)))
+    step = extractor.step
+    assert step.impulse == IMPULSE_MAX
+    # (-1023 + 1023 - 1023 + 300) * 500 // 3369
+    assert abs(step.cop_x + 108) <= 1 and abs(step.cop_y + 108) <= 1
@@ -0,0 +1,87 @@
+# tests/test_bme280.py
+from struct import pack_into
+import time
+
+import machine
+import bme280
+
+# Calibration and raw reading of the datasheet's example (25.08 C, 100653 Pa)
+TEMP_PRESS = (27504, 26435, -1000, 36477, -10685, 3024, 2855, 140, -7, 15500, -14600, 6000)
+RAW_TEMP = 519888
+RAW_PRESS = 415148
+
+
+def _sensor(monkeypatch):
+    """A BME280 on a sim_hal bus, with a fake microsecond clock that sleeping advances."""
+    clock = [0]
+    sleeps = []
+
+    def sleep_us(us):
+        sleeps.append(us)
+        clock[0] += us
+
+    monkeypatch.setattr(time, "ticks_us", lambda: clock[0])
+    monkeypatch.setattr(time, "sleep_us", sleep_us)
+    i2c = machine.I2C(0)
+    regs = i2c.add_device(bme280.BME280_I2CADDR)
+    pack_into("<HhhHhhhhhhhh", regs, 0x88, *TEMP_PRESS)
+    regs[0xA1] = 75
+    pack_into("<hBBBBb", regs, 0xE1, 362, 0, 19, 0x29, 3, 30)
+    # Burst readout 0xF7..0xFE: pressure and temperature (20 bits each), humidity
+    regs[0xF7:0xFA] = (RAW_PRESS << 4).to_bytes(3, "big")
+    regs[0xFA:0xFD] = (RAW_TEMP << 4).to_bytes(3, "big")
+    pack_into(">H", regs, 0xFD, 0x6000)
+    return bme280.BME280(i2c=i2c), regs, clock, sleeps
+
+
+def _check(result):
+    assert result[0] == 2508
+    assert result[1] // 256 == 100653
+
+
+def test_forced_read_triggers_and_waits(monkeypatch):
+    bme, regs, clock, sleeps = _sensor(monkeypatch)
+    regs[bme280.BME280_REGISTER_CONTROL] = 0
+    _check(bme.read_into([0, 0, 0]))
+    assert regs[bme280.BME280_REGISTER_CONTROL] & 3 == bme280.BME280_FORCED
+    assert sleeps == [bme.measurement_time_us()]
+
+
+def test_split_phase_read(monkeypatch):
+    bme, regs, clock, sleeps = _sensor(monkeypatch)
+    conversion = bme.measurement_time_us()
+    bme.trigger()
+    assert regs[bme280.BME280_REGISTER_CONTROL] & 3 == bme280.BME280_FORCED
+    assert not bme.ready() and bme.remaining_us() == conversion
+    clock[0] += conversion - 1000  # Other work meanwhile
+    assert not bme.ready()
+    clock[0] += 1000
+    assert bme.ready()
+    _check(bme.collect())
+    assert sleeps == []
+
+    # Collected too early: waits for the rest of the conversion only
+    bme.trigger()
+    clock[0] += 1000
+    _check(bme.collect())
+    assert sleeps == [conversion - 1000]
+
+
+def test_normal_mode_reads_without_waiting(monkeypatch):
+    bme, regs, clock, sleeps = _sensor(monkeypatch)
+    bme.set_normal_mode(standby=bme280.BME280_STANDBY_1000, iir_filter=bme280.BME280_FILTER_4)
+    assert regs[bme280.BME280_REGISTER_CONTROL] & 3 == bme280.BME280_NORMAL
+    assert regs[bme280.BME280_REGISTER_CONFIG] == \
+        bme280.BME280_STANDBY_1000 << 5 | bme280.BME280_FILTER_4 << 2
+    del sleeps[:]
+    regs[bme280.BME280_REGISTER_CONTROL] = 0xFF  # A forced read would overwrite it
+    bme.trigger()
+    assert bme.ready()
+    _check(bme.read_into([0, 0, 0]))
+    _check(bme.collect())
+    assert sleeps == [] and regs[bme280.BME280_REGISTER_CONTROL] == 0xFF
+
+    bme.set_forced_mode()
+    assert regs[bme280.BME280_REGISTER_CONFIG] == bme280.BME280_STANDBY_0_5 << 5
+    bme.trigger()
+    assert not bme.ready()
@@ -0,0 +1,46 @@
+# tests/test_boot_stages.py
+import json
+import time
+
+from boot_stages import BootStages
+
+
+def test_stages_run_in_order_within_the_budget(monkeypatch):
+    clock = [0]
+    monkeypatch.setattr(time, "ticks_ms", lambda: clock[0])
+    ran = []
+    wifi_up = [False]
+
+    def stage(name, ms, result=True):
+        def step():
+            ran.append(name)
+            clock[0] += ms
+            if name == "broken":
+                raise OSError(19)
+            return result() if callable(result) else result
+        return step
+
+    stages = BootStages()
+    stages.add("display", stage("display", 60))
+    stages.add("broken", stage("broken", 10))
+    stages.add("model", stage("model", 50))
+    stages.add("wifi wait", stage("wifi wait", 5, lambda: wifi_up[0]))
+    stages.add("mqtt", stage("mqtt", 20))
+
+    clock[0] = 100
+    stages.sampled()
+    assert stages.run(100)  # Budget used up after "model"
+    assert ran == ["display", "broken", "model"]
+    assert stages.run(100)  # Waiting for WiFi: later stages stay queued
+    assert stages.run(100)
+    assert ran[-2:] == ["wifi wait", "wifi wait"]
+    wifi_up[0] = True
+    assert not stages.run(100)
+    assert stages.done()
+    assert ran[-2:] == ["wifi wait", "mqtt"]
+
+    report = json.loads(stages.report())
+    assert report["first_sample"] == 100
+    # done at, and time spent including the earlier waiting calls
+    assert report["stages"] == {"display": [160, 60], "broken": [170, 10], "model": [220, 50],
+                                "wifi wait": [235, 15], "mqtt": [255, 20]}
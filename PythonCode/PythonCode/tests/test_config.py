@@ -0,0 +1,72 @@
+# tests/test_config.py
+import json
+
+import pytest
+
+import config
+
+
+@pytest.fixture
+def mat_dir(tmp_path, monkeypatch):
+    """config.json in a fresh directory, no environment, no listeners."""
+    monkeypatch.chdir(tmp_path)
+    for _, var in config.ENVIRONMENT:
+        monkeypatch.delenv(var, raising=False)
+    monkeypatch.setattr(config, "_current", None)
+    monkeypatch.setattr(config, "_listeners", [])
+    return tmp_path
+
+
+def test_type_range_and_choice_errors_are_all_reported():
+    with pytest.raises(ValueError) as e:
+        config.validate({"threshold": "900", "mqtt_port": 0, "payload_format": "xml", "colour": 1})
+    message = str(e.value)
+    assert "unknown key colour" in message
+    assert "threshold must be int" in message
+    assert "mqtt_port must be within 1..65535" in message
+    assert "payload_format must be one of json, binary" in message
+
+
+@pytest.mark.parametrize("changes", [
+    {"mqtt_broker": "10.0.0.1"},
+    {"topic_prefix": "home/elsewhere"},
+    {"enable_mqtt": False},
+    {"pin_led": 9},
+])
+def test_local_keys_are_rejected_over_mqtt(mat_dir, changes):
+    status = config.handle_message(json.dumps(changes).encode())
+    assert status.startswith("rejected: only settable in config.json: ")
+    assert config.get() == config.load()
+    assert not (mat_dir / "config.json").exists()
+
+
+def test_hot_reload_reaches_the_listeners(mat_dir):
+    seen = []
+    config.on_change(lambda cfg, changed: seen.append((cfg.threshold, changed)))
+    assert config.handle_message(b'{"threshold": 850}') == "applied: threshold"
+    assert config.handle_message(b'{"threshold": 850}') == "unchanged"
+    assert config.handle_message(b'{"pattern_length": 5}') == \
+        "applied, reboot needed for pattern_length"
+    assert seen == [(850, ["threshold"]), (850, ["pattern_length"])]
+    assert config.get().threshold == 850
+    # Survives a reboot
+    assert config.load().threshold == 850
+    assert json.loads((mat_dir / "config.json").read_text()) == {"threshold": 850, "pattern_length": 5}
+
+
+def test_cache_is_used_until_the_source_changes(mat_dir):
+    (mat_dir / "config.json").write_text('{"threshold": 700}')
+    assert config.load(cache="config.cache").threshold == 700
+    signature, values = json.loads((mat_dir / "config.cache").read_text())
+    values[config.NAMES.index("threshold")] = 600
+    (mat_dir / "config.cache").write_text(json.dumps([signature, values]))
+    assert config.load(cache="config.cache").threshold == 600  # Not parsed again
+
+    (mat_dir / "config.json").write_text('{"threshold": 650, "display_period": 1000}')
+    cfg = config.load(cache="config.cache")
+    assert (cfg.threshold, cfg.display_period) == (650, 1000)
+
+
+def test_invalid_source_gives_the_defaults(mat_dir):
+    (mat_dir / "config.json").write_text('{"threshold": 5000}')
+    assert config.load() == config.validate({})
@@ -0,0 +1,66 @@
+# tests/test_event_log.py
+import os
+
+import event_log
+
+
+def _log(tmp_path, **args):
+    args.setdefault("segment_records", 4)
+    args.setdefault("max_segments", 2)
+    args.setdefault("batch_records", 2)
+    args.setdefault("upload_records", 4)
+    return event_log.EventLog(str(tmp_path / "events"), **args)
+
+
+def _drain(log):
+    records = []
+
+    def publish(msg):
+        records.extend(event_log.decode_upload(bytes(msg))[2])
+        return True
+
+    while log.upload(publish):
+        pass
+    return records
+
+
+def test_rotation_drops_the_oldest_segment(tmp_path):
+    log = _log(tmp_path)
+    for n in range(10):
+        log.append(event_log.KIND_MOTION, n, b"ON")
+    log.flush()
+    assert log.segments == [4, 8]
+    assert sorted(os.listdir(str(tmp_path / "events"))) == \
+        ["0000000004.seg", "0000000008.seg", "index"]
+    assert log.lost == 4
+    assert [seq for seq, *_ in _drain(log)] == [4, 5, 6, 7, 8, 9]
+    assert log.pending() == 0
+
+
+def test_reopen_continues_after_a_restart(tmp_path):
+    log = _log(tmp_path)
+    for n in range(3):
+        log.append(event_log.KIND_USER, n, b"alice")
+    log.upload(lambda msg: True, max_records=1)
+    log.close()
+    # A power loss in the middle of writing a record
+    with open(str(tmp_path / "events" / "0000000000.seg"), "ab") as f:
+        f.write(b"\x03\x00")
+
+    log = _log(tmp_path)
+    assert (log.boot, log.next_seq, log.cursor) == (2, 3, 1)
+    assert log.append(event_log.KIND_USER, 3, b"bob") == 3
+    records = _drain(log)
+    assert [(seq, boot, body) for seq, _, boot, _, body in records] == \
+        [(1, 1, b"alice"), (2, 1, b"alice"), (3, 2, b"bob")]
+
+
+def test_failed_upload_keeps_the_records(tmp_path):
+    log = _log(tmp_path)
+    for n in range(3):
+        log.append(event_log.KIND_PIN, n, b"deny")
+    assert log.upload(lambda msg: False) == 0
+    assert (log.cursor, log.pending(), log.uploaded) == (0, 3, 0)
+    assert [seq for seq, *_ in _drain(log)] == [0, 1, 2]
+    # The cursor was saved with the drain
+    assert _log(tmp_path).pending() == 0
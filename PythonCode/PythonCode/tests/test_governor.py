@@ -0,0 +1,63 @@
+# tests/test_governor.py
+import json
+import time
+
+from governor import Governor, ACTIVE_HOLD, TIER_IDLE, TIER_ARMED, TIER_ACTIVE
+
+IDLE = [0, 0, 0, 0]
+STEP = [950, 0, 0, 0]
+
+
+def test_tiers_step_down_after_their_hold_times(monkeypatch):
+    clock = [0]
+    monkeypatch.setattr(time, "ticks_ms", lambda: clock[0])
+    changes = []
+    governor = Governor(0, threshold=900, hold_ms=5000,
+                        on_change=lambda tier: changes.append((clock[0], tier)))
+
+    def run(until, values=IDLE):
+        while clock[0] < until:
+            clock[0] += 20
+            governor.sample(clock[0], values)
+            governor.update(clock[0])
+
+    run(4980)
+    assert governor.tier == TIER_ARMED  # Starts armed until the hold time has passed
+    run(5000)
+    assert governor.tier == TIER_IDLE and governor.period() == 1000
+
+    run(8000)
+    governor.motion(8000, 1)  # PIR edge
+    assert governor.tier == TIER_ARMED
+    run(8200, STEP)
+    assert governor.tier == TIER_ACTIVE and governor.period() == 20
+    run(8200 + ACTIVE_HOLD - 20)
+    assert governor.tier == TIER_ACTIVE
+    run(8200 + ACTIVE_HOLD + 200)  # The load average decays within a few samples
+    assert governor.tier == TIER_ARMED
+    left_active = changes[-1][0]
+    run(20000)
+    assert governor.tier == TIER_ARMED  # Motion still on
+    governor.motion(20000, 0)
+    run(24980)
+    assert governor.tier == TIER_ARMED
+    run(25000)
+    assert governor.tier == TIER_IDLE
+    assert [tier for _, tier in changes] == [TIER_IDLE, TIER_ARMED, TIER_ACTIVE, TIER_ARMED,
+                                             TIER_IDLE]
+
+    report = json.loads(governor.report(25000))
+    active = left_active - changes[2][0]
+    assert report["time_ms"] == {"idle": 3000, "armed": 22000 - active, "active": active}
+    assert report["transitions"] == 5
+
+
+def test_static_load_does_not_keep_the_mat_active(monkeypatch):
+    clock = [0]
+    monkeypatch.setattr(time, "ticks_ms", lambda: clock[0])
+    governor = Governor(0, threshold=900, hold_ms=5000)
+    for _ in range(400):
+        clock[0] += 20
+        governor.sample(clock[0], STEP, static=950)  # An object left on the mat
+        governor.update(clock[0])
+    assert governor.tier == TIER_IDLE
@@ -0,0 +1,74 @@
+# tests/test_i2c_arbiter.py
+import time
+
+import machine
+import sh1106
+from i2c_arbiter import I2CArbiter, PRIORITY_SENSOR, PRIORITY_DISPLAY
+
+
+def _bus(monkeypatch, us_per_byte):
+    """An arbiter whose writes take us_per_byte per byte, on a fake microsecond clock."""
+    clock = [0]
+    monkeypatch.setattr(time, "ticks_us", lambda: clock[0])
+    i2c = machine.I2C(0)
+    i2c.add_device(0x3C)
+    writeto = i2c.writeto
+    writevto = i2c.writevto
+
+    def slow_writeto(addr, buf):
+        clock[0] += us_per_byte * len(buf)
+        return writeto(addr, buf)
+
+    def slow_writevto(addr, vector):
+        for buf in vector:
+            clock[0] += us_per_byte * len(buf)
+        return writevto(addr, vector)
+
+    i2c.writeto = slow_writeto
+    i2c.writevto = slow_writevto
+    return I2CArbiter(i2c), clock
+
+
+def test_display_pages_are_split_by_the_budget(monkeypatch):
+    bus, clock = _bus(monkeypatch, 25)  # About 400 kHz: 135 bytes, 3.4 ms per page
+    oled = sh1106.SH1106_I2C(128, 64, bus.device("sh1106", PRIORITY_DISPLAY), addr=0x3C)
+    bus.reset_stats()
+    oled.start_show(True)
+    bus.submit(oled.show_step, PRIORITY_DISPLAY)
+    bus.submit(oled.show_step, PRIORITY_DISPLAY)  # Queued once
+    pages = []
+    while True:
+        steps = bus.steps
+        pending = bus.service(10000)
+        pages.append(bus.steps - steps)
+        if not pending:
+            break
+    # A page starts while budget is left, so a service may overrun by one page
+    assert pages == [3, 3, 2]
+    assert bus.deferred == 2
+    calls, nbytes, bus_us, max_us = bus.stats()["sh1106"]
+    assert (calls, nbytes, bus_us, max_us) == (32, 8 * 135, 8 * 135 * 25, 129 * 25)
+
+
+def test_sensor_jobs_run_before_display_pages(monkeypatch):
+    bus, clock = _bus(monkeypatch, 0)
+    order = []
+
+    def job(name, steps):
+        left = [steps]
+
+        def step():
+            order.append(name)
+            clock[0] += 3000
+            left[0] -= 1
+            return left[0] > 0
+        return step
+
+    bus.submit(job("page", 3), PRIORITY_DISPLAY)
+    bus.submit(job("sensor", 2), PRIORITY_SENSOR)
+    assert bus.service(5000)
+    assert order == ["sensor", "sensor"]
+    assert bus.service(5000)
+    bus.submit(job("sensor", 1), PRIORITY_SENSOR)
+    assert not bus.service()
+    assert order == ["sensor", "sensor", "page", "page", "sensor", "page"]
@@ -0,0 +1,26 @@
+# tests/test_identify.py
+import identify
+
+
+def _reference(x, offsets, scales, shift=identify.SHIFT):
+    return [max(-identify.Q_MAX, min(identify.Q_MAX, ((v - o) * s) >> shift))
+            for v, o, s in zip(x, offsets, scales)]
+
+
+def test_quantise_clamps_without_big_products():
+    offsets = [0, 500, -500, 10]
+    scales = [1 << 20, 131072, 4096, 0]
+    model = identify.Model(["a"], offsets, scales, [0] * 4)
+    for x in ([0, 0, 0, 0], [1, 501, -499, 99], [8, 516, 1547, 5], [9, 515, 1548, -5],
+              [-8, 484, -2547, 0], [-9, 484, -2548, 0], [10 ** 6, -10 ** 6, 10 ** 6, 10 ** 6]):
+        assert list(model.quantise(x)) == _reference(x, offsets, scales)
+        for i, v in enumerate(x):
+            d = max(-model.limits[i], min(model.limits[i], v - offsets[i]))
+            assert abs(d * scales[i]) < 1 << 30  # Small int on the ESP32
+
+
+def test_classify_rejects_far_steps():
+    model = identify.Model(["a", "b"], [0, 0], [4096, 4096], [0, 0, 100, 100], reject=50)
+    assert model.classify([1, 1]) == 0
+    assert model.distance == 2
+    assert model.classify([60, 60]) == identify.UNKNOWN
@@ -0,0 +1,32 @@
+# tests/test_link.py
+import socket
+
+import config
+from app.link import Link, TOPIC_STATE
+from umqtt.simple import MQTTClient
+
+
+def _connected_link():
+    link = Link(config.load(source="missing.json", cache=None))
+    link.client = MQTTClient("mat", "broker")
+    link.client.sock, peer = socket.socketpair()
+    return link, peer
+
+
+def test_lost_connection_closes_the_socket():
+    link, peer = _connected_link()
+    sock = link.client.sock
+    peer.close()  # check_msg() raises OSError on the closed connection
+    link.poll(0)
+    assert link.client is None
+    assert sock.fileno() == -1
+
+
+def test_failed_publish_closes_the_socket():
+    link, peer = _connected_link()
+    sock = link.client.sock
+    peer.close()
+    sock.shutdown(socket.SHUT_WR)  # publish() raises OSError
+    link.publish(TOPIC_STATE, b"{}")
+    assert link.client is None
+    assert sock.fileno() == -1
@@ -0,0 +1,45 @@
+# tests/test_motion.py
+import machine
+
+from motion import MotionSensor, QUEUE
+
+
+def test_edges_are_queued_in_order():
+    pin = machine.Pin(22, machine.Pin.IN)
+    seen = []
+    sensor = MotionSensor(pin, on_edge=seen.append)
+    pin.set(1)
+    pin.set(1)  # No edge
+    pin.set(0)
+    pin.set(1)
+    assert seen == [1, 0, 1]
+    assert sensor.pending() == 3
+    levels = []
+    while sensor.pending():
+        levels.append(sensor.pop())
+    assert levels == [1, 0, 1]
+    assert (sensor.edges, sensor.dropped) == (3, 0)
+
+
+def test_full_queue_drops_the_newest_edges():
+    pin = machine.Pin(22, machine.Pin.IN)
+    sensor = MotionSensor(pin)
+    for n in range(QUEUE + 2):
+        pin.set(1 - n % 2)  # 1, 0, 1, ...: every call is an edge
+    assert (sensor.pending(), sensor.edges, sensor.dropped) == (QUEUE, QUEUE + 2, 2)
+    assert [sensor.pop() for _ in range(QUEUE)] == [1, 0] * (QUEUE // 2)
+    assert sensor.level == 0  # The level still follows the pin
+    pin.set(1)
+    assert sensor.pending() == 1 and sensor.pop() == 1
+
+
+def test_motion_at_start_up_and_during_sleep():
+    pin = machine.Pin(22, machine.Pin.IN, value=1)
+    sensor = MotionSensor(pin)
+    assert sensor.pending() == 1 and sensor.pop() == 1
+    pin.set(0)
+    sensor.pop()
+    pin._value = 1  # Edge without an interrupt, as in a light sleep without wake source
+    assert sensor.sleep(1)
+    assert sensor.wakes == 1
+    assert sensor.pending() == 1 and sensor.pop() == 1
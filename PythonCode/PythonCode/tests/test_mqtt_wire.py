@@ -0,0 +1,20 @@
+# tests/test_mqtt_wire.py
+import mqtt_wire
+
+
+def _body(data):
+    # Fixed header: type and flags, then a one-byte remaining length for these short packets
+    assert data[1] == len(data) - 2
+    return data[2:]
+
+
+def test_subscribe_round_trip():
+    data = mqtt_wire.subscribe(7, ["home/+/state", "home/esp32/config"])
+    assert mqtt_wire.parse_subscribe(_body(data)) == (7, ["home/+/state", "home/esp32/config"])
+
+
+def test_unsubscribe_round_trip():
+    # No QoS byte after each filter: parse_subscribe would lose the second one
+    data = mqtt_wire.unsubscribe(8, ["home/+/state", "home/esp32/config"])
+    assert data[0] >> 4 == mqtt_wire.UNSUBSCRIBE
+    assert mqtt_wire.parse_unsubscribe(_body(data)) == (8, ["home/+/state", "home/esp32/config"])
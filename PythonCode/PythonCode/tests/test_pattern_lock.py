@@ -0,0 +1,78 @@
+# tests/test_pattern_lock.py
+import pattern_lock
+from pattern_lock import (PatternLock, READY, UNLOCK, DENY, LOCKED, ENROLL, CONFIRM, ENROLLED,
+                          LOCKOUT_MS, MAX_FAILURES)
+
+# Centres of pressure of the four cells of a 2 x 2 mat
+CELLS = ((-500, -500), (500, -500), (-500, 500), (500, 500))
+PATTERN = (0, 3, 1, 2)
+WRONG = (3, 3, 3, 3)
+
+
+def _steps(lock, now, cells):
+    """Steps on the cells one second apart. Returns (last result, time after the steps)."""
+    result = None
+    for cell in cells:
+        now += 1000
+        result = lock.step(now, CELLS[cell][0], CELLS[cell][1], 200)
+    return result, now
+
+
+def _attempt(lock, now, cells):
+    """A long press, then the steps."""
+    now += 1000
+    ready = lock.step(now, 0, 0, pattern_lock.LONG_PRESS_MS)
+    if ready != READY:
+        return ready, now
+    return _steps(lock, now, cells)
+
+
+def _enrolled(now, path=None):
+    lock = PatternLock(now, path=path)
+    assert lock.step(now, 0, 0, pattern_lock.LONG_PRESS_MS) == ENROLL
+    assert _steps(lock, now, PATTERN)[0] == CONFIRM
+    result, now = _steps(lock, now + 4000, PATTERN)
+    assert result == ENROLLED
+    return lock, now + pattern_lock.ENROLL_WINDOW_MS
+
+
+def test_steps_without_a_long_press_are_ignored():
+    lock, now = _enrolled(0)
+    assert _steps(lock, now, PATTERN)[0] is None
+    assert _steps(lock, now, WRONG)[0] is None
+    assert lock.failures == 0
+    assert _attempt(lock, now, PATTERN)[0] == UNLOCK
+
+
+def test_lockout_after_repeated_failures(tmp_path):
+    path = str(tmp_path / "patterns.bin")
+    lock, now = _enrolled(0, path)
+    for _ in range(MAX_FAILURES):
+        now += pattern_lock.RETRY_MS
+        result, now = _attempt(lock, now, WRONG)
+        assert result == DENY
+    locked_at = now
+    # Locked, even for the right pattern and after a reboot
+    assert _attempt(lock, now + 1000, PATTERN)[0] == LOCKED
+    lock = PatternLock(now, path=path)
+    assert lock.failures == MAX_FAILURES
+    assert _attempt(lock, now + 1000, PATTERN)[0] == LOCKED
+
+    # The next lockout lasts twice as long
+    now = locked_at + LOCKOUT_MS
+    for _ in range(MAX_FAILURES):
+        now += pattern_lock.RETRY_MS
+        result, now = _attempt(lock, now, WRONG)
+        assert result == DENY
+    assert _attempt(lock, now + LOCKOUT_MS, PATTERN)[0] == LOCKED
+    result, now = _attempt(lock, now + 2 * LOCKOUT_MS, PATTERN)
+    assert result == UNLOCK
+    assert (lock.failures, lock.lockouts) == (0, 0)
+
+
+def test_steps_right_after_a_failure_are_ignored():
+    lock, now = _enrolled(0)
+    result, now = _attempt(lock, now, WRONG)
+    assert result == DENY
+    assert lock.step(now + 500, 0, 0, pattern_lock.LONG_PRESS_MS) is None
+    assert _attempt(lock, now + pattern_lock.RETRY_MS, PATTERN)[0] == UNLOCK
@@ -0,0 +1,19 @@
+# tests/test_payload.py
+import struct
+
+import payload
+
+
+def test_footstep_keeps_zones_above_8():
+    buf = bytearray(payload.FOOTSTEP_SIZE)
+    mask = (1 << 29) | (1 << 8) | 1
+    payload.encode_footstep(buf, 3, 1000, mask, 900, 250, 40000, -120, 640)
+    msg_type, seq, timestamp, fields = payload.decode(buf)
+    assert (msg_type, seq, timestamp) == (payload.TYPE_FOOTSTEP, 3, 1000)
+    assert fields == (mask, 900, 250, 40000, -120, 640)
+
+
+def test_version_1_footstep_still_decodes():
+    msg = struct.pack("<BBHI", 1, payload.TYPE_FOOTSTEP, 4, 2000) + struct.pack(
+        "<BHHIhh", 0x0F, 800, 300, 5000, 10, -10)
+    assert payload.decode_any(msg)["mask"] == 0x0F
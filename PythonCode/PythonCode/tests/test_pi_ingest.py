@@ -0,0 +1,40 @@
+# tests/test_pi_ingest.py
+import asyncio
+
+import event_log
+import pi_ingest
+
+
+class ListPipeline:
+    def __init__(self):
+        self.items = []
+
+    async def put(self, item):
+        self.items.append(item)
+
+
+def test_bad_record_does_not_drop_the_upload(tmp_path):
+    log = event_log.EventLog(str(tmp_path / "events"))
+    log.append(event_log.KIND_USER, 100, b"alice")
+    log.append(event_log.KIND_ROUTINE, 200, b"\xff\xfe")
+    log.append(event_log.KIND_MOTION, 300, b"ON")
+    sent = []
+    log.upload(lambda msg: sent.append(bytes(msg)) or True)
+    events = pi_ingest.log_events(sent[0])
+    assert [e.get("value") for e in events] == ["alice", None, "ON"]
+    assert events[1]["raw"] == "fffe"
+
+
+def test_text_topics_are_routed_to_events():
+    service = pi_ingest.IngestService("localhost")
+    events = service.add_pipeline("events", ListPipeline())
+
+    async def feed():
+        await service.route("home/mat1/routine", b"enter")
+        await service.route("home/mat1/pattern", b"unlock")
+        await service.route("home/mat1/user", b"\xff")
+
+    asyncio.run(feed())
+    assert events.items == [("mat1", {"kind": "routine", "value": "enter"}),
+                            ("mat1", {"kind": "pin", "value": "unlock"})]
+    assert service.decode_errors == 1
@@ -0,0 +1,41 @@
+# tests/test_replay.py
+import json
+
+import recorder
+import replay
+from app.link import TOPIC_CONFIG
+from governor import TIER_ARMED, TIER_ACTIVE
+
+
+def _record(actions):
+    """A recording of (timestamp, method, *args) Recorder calls, with a loop every 100 ms."""
+    chunks = []
+    rec = recorder.Recorder(lambda chunk: chunks.append(bytes(chunk)), 4)
+    actions = sorted(actions + [(t, "tick") for t in range(0, 30000, 100)],
+                     key=lambda action: (action[0], action[1] == "tick"))
+    for timestamp, method, *args in actions:
+        getattr(rec, method)(timestamp, *args)
+    rec.flush()
+    return recorder.read(b"".join(chunks))
+
+
+def _show_times(actions):
+    channels, records = _record(actions)
+    out = replay.CaptureOutputs()
+    replay.replay(records, channels, out, display_period=500)
+    return [int(line.split()[0]) for line in out.lines if line.split()[1] == "show"]
+
+
+def test_tier_and_config_changes_set_the_display_period():
+    shows = _show_times([
+        (0, "pir", 1),
+        (0, "tier", TIER_ARMED),  # display_period from the config
+        (2000, "mqtt", TOPIC_CONFIG, json.dumps({"display_period": 1000}).encode()),
+        (6000, "tier", TIER_ACTIVE),  # fixed period of the active tier
+    ])
+    assert shows == [500, 1000, 1500, 2500, 3500, 4500, 5500, 15500, 25500]
+
+
+def test_recordings_without_tiers_keep_the_configured_period():
+    shows = _show_times([(0, "pir", 1)])
+    assert shows == list(range(500, 30000, 500))
@@ -0,0 +1,51 @@
+# tests/test_routine.py
+import governor
+import mat_logic
+import routine
+
+
+class Events:
+    def __init__(self):
+        self.events = []
+
+    def publish(self, topic, msg):
+        if topic == mat_logic.TOPIC_ROUTINE:
+            self.events.append(msg)
+
+
+def _run(logic, clock, ms, values, gov=None):
+    for _ in range(ms // 20):
+        clock[0] += 20
+        now = clock[0]
+        if gov:
+            gov.sample(now, values, logic.routines.object_total)
+            gov.update(now)
+        logic.sample(now, values)
+        logic.tick(now)
+
+
+def test_object_is_left_out_of_steps_and_governor():
+    out = Events()
+    logic = mat_logic.MatLogic(out, 0, 2, 2)
+    gov = governor.Governor(0)
+    clock = [0]
+    _run(logic, clock, 8000, [1000, 0, 0, 0], gov)
+    assert out.events == [routine.OBJECT]
+    assert gov.tier != governor.TIER_ACTIVE
+    steps = logic.footsteps.steps
+    for _ in range(4):
+        _run(logic, clock, 300, [1000, 0, 0, 1000], gov)
+        _run(logic, clock, 300, [1000, 0, 0, 0], gov)
+    assert logic.footsteps.steps - steps == 4
+
+
+def test_linger_needs_a_still_centre_of_pressure():
+    out = Events()
+    logic = mat_logic.MatLogic(out, 0, 2, 2)
+    clock = [0]
+    logic.motion(0, 1)
+    for i in range(100):  # 30 s of walking about the mat
+        _run(logic, clock, 300, [[900, 0, 0, 0], [0, 900, 0, 0], [0, 0, 0, 900]][i % 3])
+    assert routine.LINGER not in out.events
+    _run(logic, clock, 21000, [600, 600, 700, 600])  # Standing in one spot
+    assert routine.LINGER in out.events
@@ -0,0 +1,42 @@
+# tests/test_trace_receiver.py
+import os
+import trace_stream
+from sample_ring import SampleRing
+from trace_receiver import TraceAssembler
+
+
+def _chunks(ring, seq, first, count, size=4):
+    buf = bytearray(trace_stream.max_chunk_size(size, ring.channels))
+    for start in range(first, first + count, size):
+        n = trace_stream.encode_chunk(buf, seq, ring, start, size)
+        yield bytes(buf[:n])
+        seq += 1
+
+
+def _rows(path):
+    with open(path) as f:
+        return f.read().splitlines()[1:]
+
+
+def test_reboot_starts_a_new_file(tmp_path):
+    assembler = TraceAssembler(str(tmp_path))
+    before = SampleRing(capacity=16, channels=1)
+    for n in range(12):
+        before.push(1000 + n * 10, [n])
+    for chunk in _chunks(before, 0, 0, 12):
+        assembler.feed("mat", chunk)
+
+    # After a reboot the ring, the sample index and seq start again at 0
+    after = SampleRing(capacity=16, channels=1)
+    for n in range(8):
+        after.push(50 + n * 10, [100 + n])
+    chunks = list(_chunks(after, 0, 0, 8))
+    assert sum(assembler.feed("mat", chunk) for chunk in chunks) == 8
+    assert assembler.feed("mat", chunks[-1]) == 0  # repeated chunk
+    assembler.close()
+
+    files = sorted(os.listdir(str(tmp_path / "mat")), key=lambda name: int(name.split("_")[2]))
+    assert len(files) == 2
+    first, second = (_rows(str(tmp_path / "mat" / name)) for name in files)
+    assert first == ["{},{}".format(1000 + n * 10, n) for n in range(12)]
+    assert second == ["{},{}".format(50 + n * 10, 100 + n) for n in range(8)]
@@ -0,0 +1,38 @@
+# tests/test_trace_stream.py
+import trace_stream
+from sample_ring import SampleRing
+
+
+def test_long_gaps_keep_their_length():
+    ring = SampleRing(capacity=8, channels=2)
+    stamps = [1000, 1020, 1500, 61500, 200000, 200020]
+    for n, t in enumerate(stamps):
+        ring.push(t, [n * 300, 1023 - n])
+    buf = bytearray(trace_stream.max_chunk_size(len(stamps), 2))
+    size = trace_stream.encode_chunk(buf, 1, ring, 0, len(stamps))
+    seq, first, channels, samples = trace_stream.decode_chunk(buf[:size])
+    assert (seq, first, channels) == (1, 0, 2)
+    assert [t for t, _ in samples] == stamps
+    assert [values for _, values in samples] == [(n * 300, 1023 - n) for n in range(len(stamps))]
+
+
+def test_failed_send_is_retried():
+    ring = SampleRing(capacity=16, channels=1)
+    results = [False, True]
+    sent = []
+
+    def send(msg):
+        sent.append(trace_stream.decode_chunk(bytes(msg))[:2])
+        return results.pop(0)
+
+    streamer = trace_stream.TraceStreamer(ring, send, chunk_samples=4)
+    streamer.start()
+    for n in range(4):
+        ring.push(n * 10, [n])
+    now = streamer.last_refill
+    assert not streamer.poll(now, busy=True)  # control traffic first
+    assert sent == []
+    assert not streamer.poll(now)
+    assert streamer.poll(now)
+    assert sent == [(0, 0), (0, 0)]  # same seq and samples again
+    assert (streamer.seq, streamer.cursor, streamer.sent) == (1, 4, 1)
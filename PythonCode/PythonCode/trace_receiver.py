@@ -0,0 +1,112 @@
+# trace_receiver.py
+# Runs on the Raspberry Pi: collects raw pressure trace chunks from the mats
+# and reassembles them into one CSV file per continuous recording.
+#
+# Usage: python3 trace_receiver.py --broker 192.168.178.113 --out traces
+import os
+import time
+import trace_stream
+
+
+class TraceAssembler:
+    """
+    Reassembles trace chunks per device. A new file is started whenever the
+    sample index jumps (lost chunks, ring overruns on the device or a
+    reboot, after which the index starts again near 0), so every file holds
+    a gap-free recording. Only a repeat of the last chunk (same seq and
+    first sample) is dropped as a duplicate.
+    """
+
+    def __init__(self, out_dir):
+        self.out_dir = out_dir
+        self.files = {}     # device -> open file
+        self.expected = {}  # device -> next expected sample index
+        self.last = {}      # device -> (seq, first sample) of the last chunk
+        self.gaps = 0
+        self.samples = 0
+        self.recordings = 0  # files opened, keeps names unique within a second
+
+    def feed(self, device, msg):
+        """Processes one chunk. Returns the number of samples written."""
+        seq, first, channels, samples = trace_stream.decode_chunk(msg)
+        expected = self.expected.get(device)
+        if self.last.get(device) == (seq, first):
+            return 0  # duplicate chunk
+        self.last[device] = (seq, first)
+        if expected is None or first != expected:
+            if expected is not None:
+                self.gaps += 1
+                print("Trace {} on {}: expected sample {}, got {}".format(
+                    "restart" if first < expected else "gap", device, expected, first))
+            self._open(device, first, channels)
+        f = self.files[device]
+        for t, values in samples:
+            f.write("{},{}\n".format(t, ",".join(str(v) for v in values)))
+        self.expected[device] = first + len(samples)
+        self.samples += len(samples)
+        return len(samples)
+
+    def _open(self, device, first, channels):
+        self.close(device)
+        directory = os.path.join(self.out_dir, device)
+        os.makedirs(directory, exist_ok=True)
+        self.recordings += 1
+        name = "trace_{}_{}_{}.csv".format(time.strftime("%Y%m%d-%H%M%S"), self.recordings, first)
+        f = open(os.path.join(directory, name), "w")
+        f.write("timestamp_ms,{}\n".format(
+            ",".join("ch{}".format(i) for i in range(channels))))
+        self.files[device] = f
+
+    def close(self, device=None):
+        devices = list(self.files) if device is None else [device]
+        for d in devices:
+            f = self.files.pop(d, None)
+            if f:
+                f.close()
+
+
+def device_from_topic(topic):
+    """home/<device>/trace -> <device>"""
+    parts = topic.split("/")
+    return parts[1] if len(parts) > 2 else topic
+
+
+def main():
+    import argparse
+    import paho.mqtt.client as mqtt  # pip install paho-mqtt
+
+    parser = argparse.ArgumentParser(description="Record raw pressure traces")
+    parser.add_argument("--broker", default="192.168.178.113")
+    parser.add_argument("--port", type=int, default=1883)
+    parser.add_argument("--user", default=os.environ.get("MQTT_USER"))
+    parser.add_argument("--password", default=os.environ.get("MQTT_PASS"))
+    parser.add_argument("--topic", default="home/+/trace")
+    parser.add_argument("--out", default="traces")
+    args = parser.parse_args()
+
+    assembler = TraceAssembler(args.out)
+
+    def on_message(client, userdata, message):
+        try:
+            assembler.feed(device_from_topic(message.topic), message.payload)
+        except ValueError as e:
+            print("Dropping bad chunk:", e)
+
+    client = mqtt.Client()
+    if args.user:
+        client.username_pw_set(args.user, args.password)
+    client.on_message = on_message
+    client.connect(args.broker, args.port)
+    client.subscribe(args.topic)
+    print("Recording traces from", args.topic, "into", args.out)
+    try:
+        client.loop_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        assembler.close()
+        print("Samples written:", assembler.samples, "gaps:", assembler.gaps)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+# trace_stream.py
+# Opt-in streaming of raw pressure traces over MQTT for offline analysis.
+#
+# Chunks of the sample ring are packed into one message each:
+#
+#   payload header (type TYPE_TRACE, chunk seq, timestamp of first sample)
+#   channels (B) | flags (B) | sample count (H) | index of first sample (I)
+#   per sample: time delta in ms (B, 0xFF = escape + H, H 0xFFFF = escape + I)
+#               per channel: value delta (b, -128 = escape + absolute H)
+#
+# Steady 10-bit signals mostly need one byte per channel instead of the
+# dozen characters a printed value costs.
+try:
+    from ustruct import pack_into, unpack_from
+except ImportError:
+    from struct import pack_into, unpack_from
+import time
+import payload
+
+_CHUNK = "<BBHI"
+CHUNK_HEADER_SIZE = payload.HEADER_SIZE + 8
+
+
+def max_chunk_size(samples, channels):
+    """Worst case encoded size of a chunk."""
+    return CHUNK_HEADER_SIZE + samples * (7 + channels * 3)
+
+
+def encode_chunk(buf, seq, ring, first, count):
+    """
+    Packs `count` samples of `ring` starting at sample index `first` into
+    buf. Returns the number of bytes written.
+    """
+    channels = ring.channels
+    values = ring.values
+    stamps = ring.timestamps
+    capacity = ring.capacity
+    t0 = stamps[first % capacity]
+    payload.encode_header(buf, payload.TYPE_TRACE, seq, t0)
+    pack_into(_CHUNK, buf, payload.HEADER_SIZE, channels, 0, count, first)
+    pos = CHUNK_HEADER_SIZE
+    prev_t = t0
+    base = (first % capacity) * channels
+    for i in range(channels):
+        buf[pos] = 0x80  # escape: first sample is stored absolute
+        buf[pos + 1] = values[base + i] & 0xFF
+        buf[pos + 2] = values[base + i] >> 8
+        pos += 3
+    # The first sample's time delta is implicit (zero), so its channel
+    # values directly follow the chunk header.
+    for index in range(first + 1, first + count):
+        slot = index % capacity
+        t = stamps[slot]
+        dt = time.ticks_diff(t, prev_t)
+        prev_t = t
+        if dt < 0xFF:
+            buf[pos] = dt
+            pos += 1
+        elif dt < 0xFFFF:
+            buf[pos] = 0xFF
+            buf[pos + 1] = dt & 0xFF
+            buf[pos + 2] = dt >> 8
+            pos += 3
+        else:  # A pause of a minute or more, e.g. while the mat slept
+            buf[pos] = 0xFF
+            buf[pos + 1] = 0xFF
+            buf[pos + 2] = 0xFF
+            pack_into("<I", buf, pos + 3, dt)
+            pos += 7
+        prev = ((index - 1) % capacity) * channels
+        cur = slot * channels
+        for i in range(channels):
+            v = values[cur + i]
+            d = v - values[prev + i]
+            if -128 < d < 128:
+                buf[pos] = d & 0xFF
+                pos += 1
+            else:
+                buf[pos] = 0x80
+                buf[pos + 1] = v & 0xFF
+                buf[pos + 2] = v >> 8
+                pos += 3
+    return pos
+
+
+def decode_chunk(msg):
+    """
+    Decodes a trace chunk.
+    Returns (seq, first_index, channels, samples) where samples is a list of
+    (timestamp, values) tuples.
+    Raises ValueError for messages that are not trace chunks.
+    """
+    msg_type, seq, t = payload.decode_header(msg)
+    if msg_type != payload.TYPE_TRACE:
+        raise ValueError("Not a trace chunk")
+    if len(msg) < CHUNK_HEADER_SIZE:
+        raise ValueError("Truncated trace chunk")
+    channels, _, count, first = unpack_from(_CHUNK, msg, payload.HEADER_SIZE)
+    pos = CHUNK_HEADER_SIZE
+    prev = [0] * channels
+    samples = []
+    try:
+        for n in range(count):
+            if n:
+                dt = msg[pos]
+                pos += 1
+                if dt == 0xFF:
+                    dt = msg[pos] | msg[pos + 1] << 8
+                    pos += 2
+                    if dt == 0xFFFF:
+                        if pos + 4 > len(msg):
+                            raise IndexError
+                        dt = unpack_from("<I", msg, pos)[0]
+                        pos += 4
+                t = (t + dt) & 0xFFFFFFFF
+            for i in range(channels):
+                d = msg[pos]
+                pos += 1
+                if d == 0x80:
+                    prev[i] = msg[pos] | msg[pos + 1] << 8
+                    pos += 2
+                else:
+                    prev[i] += d - 256 if d > 127 else d
+            samples.append((t, tuple(prev)))
+    except IndexError:
+        raise ValueError("Truncated trace chunk")
+    return seq, first, channels, samples
+
+
+class TraceStreamer:
+    """
+    Streams the sample ring in chunks of `chunk_samples` samples.
+
+    Flow control: a token bucket limits the stream to `max_rate` bytes per
+    second, at most one chunk is sent per poll() and nothing is sent while
+    the caller reports pending control traffic. If the stream falls behind
+    by more than the ring holds, the lost samples are skipped and counted
+    in `dropped`; the receiver sees the gap through the sample index.
+    """
+
+    def __init__(self, ring, send, chunk_samples=32, max_rate=2000):
+        self.ring = ring
+        self.send = send  # callable taking the encoded chunk, True if it was sent
+        self.chunk_samples = min(chunk_samples, ring.capacity)
+        self.max_rate = max_rate
+        self.burst = max_chunk_size(self.chunk_samples, ring.channels)
+        self.buf = bytearray(self.burst)
+        self.enabled = False
+        self.cursor = 0
+        self.seq = 0
+        self.tokens = 0
+        self.last_refill = time.ticks_ms()
+        self.sent = 0      # chunks sent
+        self.dropped = 0   # samples lost to ring overruns
+
+    def start(self):
+        """Starts streaming with the next sample pushed to the ring."""
+        self.cursor = self.ring.written
+        self.tokens = self.burst
+        self.last_refill = time.ticks_ms()
+        self.enabled = True
+
+    def stop(self):
+        self.enabled = False
+
+    def handle_command(self, msg):
+        """MQTT control message: b"on" or b"off"."""
+        if msg == b"on":
+            if not self.enabled:
+                self.start()
+        elif msg == b"off":
+            self.stop()
+
+    def poll(self, now, busy=False):
+        """
+        Sends at most one chunk if enough samples are buffered and the rate
+        limit allows. Returns True if a chunk was sent.
+        """
+        if not self.enabled:
+            return False
+        elapsed = time.ticks_diff(now, self.last_refill)
+        if elapsed > 0:
+            self.tokens = min(self.burst,
+                              self.tokens + self.max_rate * elapsed // 1000)
+            self.last_refill = now
+        ring = self.ring
+        if ring.available(self.cursor) > ring.capacity:
+            oldest = ring.oldest()
+            self.dropped += oldest - self.cursor
+            self.cursor = oldest
+        if busy or self.tokens <= 0:
+            return False
+        if ring.available(self.cursor) < self.chunk_samples:
+            return False
+        size = encode_chunk(self.buf, self.seq, ring, self.cursor,
+                            self.chunk_samples)
+        if not self.send(memoryview(self.buf)[:size]):
+            return False  # Sent again by a later poll()
+        self.tokens -= size
+        self.cursor += self.chunk_samples
+        self.seq = (self.seq + 1) & 0xFFFF
+        self.sent += 1
+        return True